@@ -3,7 +3,6 @@ import os
 
 import requests
 from dotenv import load_dotenv
-from fastapi.responses import FileResponse
 from flask import (
     Flask,
     Response,
@@ -11,15 +10,20 @@ from flask import (
     render_template,
     request,
     session,
+    stream_with_context,
     url_for,
 )
 
+from mirror import Mirror
+
 app = Flask(__name__, template_folder="templates", static_folder="static")
 
 load_dotenv("../.env")
 app.secret_key = os.getenv("SECRET_KEY")
 
 API_BASE = "http://localhost:8000"
+QUESTIONS = Mirror(API_BASE, "questions")
+QUIZS = Mirror(API_BASE, "quizs")
 
 
 @app.before_request
@@ -101,16 +105,14 @@ def dashboard() -> str:
 @app.route("/questions/")
 def questions() -> str:
     """Get questions."""
-    res = requests.get(f"{API_BASE}/questions/", headers=api_headers())
-    questions = res.json().get("questions", []) if res.ok else []
+    questions = QUESTIONS.sync(api_headers())
     return render_template("questions.html", questions=questions)
 
 
 @app.route("/quizs/")
 def quizs() -> str:
     """Get quizs."""
-    res = requests.get(f"{API_BASE}/quizs/", headers=api_headers())
-    quizs = res.json().get("quizs", []) if res.ok else []
+    quizs = QUIZS.sync(api_headers())
     return render_template("quizs.html", quizs=quizs)
 
 
@@ -126,23 +128,48 @@ def etl_import() -> str:
     res = requests.post(f"{API_BASE}/etl/import", headers=api_headers(), files=files)
     if res.ok:
         payload = res.json()
-        stats = payload.get("stats")
-        rapport = payload.get("file")
-        return render_template("etl_import.html", stats=stats, rapport=rapport)
+        return render_template("etl_import.html", job_id=payload.get("job_id"))
     msg = res.json().get("message", "Erreur import")
     return render_template("etl_import.html", error=msg), res.status_code
 
 
+@app.route("/etl/jobs/<job_id>")
+def etl_import_get_job(job_id: str) -> Response:
+    """Get import job state."""
+    res = requests.get(f"{API_BASE}/etl/jobs/{job_id}", headers=api_headers())
+    return Response(
+        res.content, status=res.status_code, content_type="application/json"
+    )
+
+
+@app.route("/etl/jobs/<job_id>/events")
+def etl_import_job_events(job_id: str) -> Response:
+    """Relay import progress events."""
+    res = requests.get(
+        f"{API_BASE}/etl/jobs/{job_id}/events", headers=api_headers(), stream=True
+    )
+    if not res.ok:
+        return Response(res.content, status=res.status_code)
+    return Response(
+        stream_with_context(res.iter_content(chunk_size=None)),
+        content_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.route("/etl/rapport/<rapport>")
 def etl_import_get_rapport(rapport):
     """Get rapport."""
-    res: FileResponse = requests.get(
-        f"{API_BASE}/etl/rapport/{rapport}", headers=api_headers()
+    res = requests.get(
+        f"{API_BASE}/etl/rapport/{rapport}/export",
+        headers=api_headers(),
+        params=request.args,
+        stream=True,
     )
     if res.status_code == 200:
         response = Response(
-            res.content,
-            content_type="test/csv",
+            stream_with_context(res.iter_content(chunk_size=None)),
+            content_type="text/csv",
         )
         response.headers["Content-Disposition"] = f"attachment; filename={rapport}"
         return response
@@ -0,0 +1,38 @@
+"""Local copies of API collections, kept up to date through their /changes endpoint."""
+
+import threading
+
+import requests
+
+
+class Mirror:
+    """Documents of one collection by id, and the token of the last change read."""
+
+    def __init__(self, api_base: str, name: str) -> None:
+        self.url = f"{api_base}/{name}/changes"
+        self.name = name
+        self.docs: dict[str, dict] = {}
+        self.token = 0
+        self.lock = threading.Lock()
+
+    def sync(self, headers: dict) -> list[dict]:
+        """Apply the changes made since the last sync, get every document.
+
+        When the API cannot be reached, the documents of the last sync are returned.
+        """
+        with self.lock:
+            more = True
+            while more:
+                try:
+                    res = requests.get(
+                        self.url, params={"since": self.token}, headers=headers, timeout=10
+                    )
+                except requests.RequestException:
+                    break
+                if not res.ok:
+                    break
+                data = res.json()
+                for doc in data[self.name]:
+                    self.docs[doc["id"]] = doc
+                self.token, more = data["token"], data["more"]
+            return list(self.docs.values())
@@ -0,0 +1,225 @@
+"""Benchmark of the ETL pipeline: time and peak memory of each stage.
+
+Usage (from src/):
+    python -m benchmarks.etl --sizes 1000,10000 --output etl.json
+    python -m benchmarks.etl --mongo-uri mongodb://localhost:27017 --baseline etl.json
+
+Stages are the ones of services/etl_quiz.py: read (read_csv), fuzzy
+(transform_fuzzy), expand (expand_responses_with_flags), build (dedupe,
+validation and build_question_object of every group) and export (MongoSink,
+i.e. ServiceQuestion.exists then batched inserts).
+Without --mongo-uri, Mongo is replaced by mongomock (pip install mongomock).
+With a real server, the benchmark works on its own database, dropped at start.
+Each size runs in a fresh process and a temporary folder for data/.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+
+from benchmarks.generator import write_csv
+from services.metrics import peak_rss_mb, reset_peak_rss
+
+SIZES = [1_000, 10_000, 100_000, 1_000_000]
+DATABASE_NAME = "miskatonic_bench"
+STAGES = ["read", "fuzzy", "expand", "build", "export"]
+
+
+def _connect(mongo_uri: str | None) -> None:
+    """Point ServiceMongo to {mongo_uri}, or to an in-memory stand-in."""
+    from services import mongo  # noqa: PLC0415
+
+    if mongo_uri:
+        from pymongo import MongoClient  # noqa: PLC0415
+
+        mongo.ServiceMongo.client = MongoClient(mongo_uri)
+    else:
+        import mongomock  # noqa: PLC0415
+
+        mongo.ServiceMongo.client = mongomock.MongoClient()
+    mongo.DATABASE_NAME = DATABASE_NAME
+    mongo.ServiceMongo.client.drop_database(DATABASE_NAME)
+
+
+def _measure(params: dict, queue: multiprocessing.Queue) -> None:
+    """Run every stage on a generated file, report time and memory per stage."""
+    from services import etl_quiz  # noqa: PLC0415
+    from services.etl_sinks import MongoSink  # noqa: PLC0415
+
+    _connect(params["mongo_uri"])
+    os.chdir(params["workdir"])
+    csv_path = write_csv(
+        etl_quiz.DATA_IN / "questions.csv",
+        params["rows"],
+        subjects=params["subjects"],
+        seed=params["seed"],
+        typo_rate=params["typo_rate"],
+        duplicate_rate=params["duplicate_rate"],
+        empty_rate=params["empty_rate"],
+    )
+    stages: dict[str, dict] = {}
+
+    def stage(name, fn, *args):
+        reset_peak_rss()
+        rss_before = peak_rss_mb()
+        start = time.perf_counter()
+        result = fn(*args)
+        stages[name] = {
+            "s": round(time.perf_counter() - start, 4),
+            "peak_rss_delta_mb": round(peak_rss_mb() - rss_before, 1),
+        }
+        return result
+
+    def build(responses_df):
+        built = []
+        for (_, subj, use), question_df in responses_df.groupby(
+            ["question_key", "subject", "use"], sort=False, observed=True
+        ):
+            question = question_df.loc[question_df["question"].str.len().idxmax(), "question"]
+            obj = etl_quiz.build_question_object(
+                question, subj, question_df, csv_path.name, None, use=use
+            )
+            if obj is not None:
+                built.append((obj, int(question_df["source_idx"].min())))
+        return built
+
+    def export(built):
+        sink = MongoSink(etl_quiz.rapport_etl)
+        sink.open(csv_path.name)
+        for obj, line in built:
+            sink.write(obj, line)
+        sink.close()
+        return sink
+
+    etl_quiz.DATA_TREATED.mkdir(parents=True, exist_ok=True)
+    df = stage(
+        "read",
+        etl_quiz.read_csv,
+        etl_quiz.DATA_IN,
+        etl_quiz.DATA_TREATED,
+        params["engine"],
+    )
+    df = stage("fuzzy", etl_quiz.transform_fuzzy, df, etl_quiz.rapport_etl)
+    responses_df = stage("expand", etl_quiz.expand_responses_with_flags, df)
+    built = stage("build", build, responses_df)
+    sink = stage("export", export, built)
+    queue.put(
+        {
+            "rows": params["rows"],
+            "stages": stages,
+            "total_s": round(sum(s["s"] for s in stages.values()), 4),
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+            "built": len(built),
+            "accepted": sink.accepted,
+            "rejected": sink.rejected,
+        }
+    )
+
+
+def run(sizes: list[int], **params) -> list[dict]:
+    """Benchmark the pipeline on a synthetic file of each size in {sizes}."""
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+    for rows in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            queue = ctx.Queue()
+            proc = ctx.Process(
+                target=_measure, args=({**params, "rows": rows, "workdir": tmp}, queue)
+            )
+            proc.start()
+            results.append(queue.get())
+            proc.join()
+    return results
+
+
+def metadata(params: dict) -> dict:
+    """Describe the commit, the environment and the parameters of a run."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],  # noqa: S607
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "date": datetime.now(tz=timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "mongo": "server" if params["mongo_uri"] else "mongomock",
+        "params": {k: v for k, v in params.items() if k != "mongo_uri"},
+    }
+
+
+def compare(results: list[dict], baseline: dict) -> list[str]:
+    """Lines comparing the time of each stage with a {baseline} run."""
+    previous = {r["rows"]: r for r in baseline["results"]}
+    lines = [f"baseline: {baseline['meta'].get('commit')}"]
+    for result in results:
+        old = previous.get(result["rows"])
+        if old is None:
+            continue
+        for name in [*STAGES, "total"]:
+            new_s = result["total_s"] if name == "total" else result["stages"][name]["s"]
+            old_s = old["total_s"] if name == "total" else old["stages"][name]["s"]
+            ratio = new_s / old_s if old_s else float("inf")
+            lines.append(
+                f"{result['rows']:>9} {name:<7} {old_s:>9.3f}s -> {new_s:>9.3f}s  x{ratio:.2f}"
+            )
+    return lines
+
+
+def main() -> None:
+    """Parse arguments, run the benchmark, write JSON results."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--sizes", default=",".join(map(str, SIZES)))
+    parser.add_argument("--subjects", type=int, default=12)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--typo-rate", type=float, default=0.02)
+    parser.add_argument("--duplicate-rate", type=float, default=0.05)
+    parser.add_argument("--empty-rate", type=float, default=0.02)
+    parser.add_argument("--engine", default="c")
+    parser.add_argument("--mongo-uri", default=None)
+    parser.add_argument("--output", type=Path, default=None, help="JSON file, stdout by default")
+    parser.add_argument("--baseline", type=Path, default=None, help="JSON file of a previous run")
+    args = parser.parse_args()
+
+    params = {
+        "subjects": args.subjects,
+        "seed": args.seed,
+        "typo_rate": args.typo_rate,
+        "duplicate_rate": args.duplicate_rate,
+        "empty_rate": args.empty_rate,
+        "engine": args.engine,
+        "mongo_uri": args.mongo_uri,
+    }
+    sizes = [int(n) for n in args.sizes.split(",")]
+    report = {"meta": metadata(params), "results": run(sizes, **params)}
+
+    if args.output is None:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+    if args.baseline is not None:
+        baseline = json.loads(args.baseline.read_text())
+        sys.stderr.write("\n".join(compare(report["results"], baseline)) + "\n")
+
+
+if __name__ == "__main__":
+    main()
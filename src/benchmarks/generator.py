@@ -0,0 +1,96 @@
+"""Seeded generator of synthetic question files for the benchmarks."""
+
+import csv
+import random
+from pathlib import Path
+
+HEADER = [
+    "question",
+    "subject",
+    "use",
+    "correct",
+    "responseA",
+    "responseB",
+    "responseC",
+    "responseD",
+    "remark",
+]
+USES = ["Test de positionnement", "Test de validation", "Total Bootcamp"]
+WORDS = (
+    "base donnees index requete cluster noeud schema modele classification "
+    "regression docker conteneur image reseau stockage cache latence debit "
+    "partition replica transaction journal serveur client protocole"
+).split()
+
+
+def _sentence(rng: random.Random, n_words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(n_words)).capitalize()
+
+
+def _subject_names(rng: random.Random, subjects: int) -> list[str]:
+    return [f"Sujet {i:02d} {_sentence(rng, 2)}" for i in range(subjects)]
+
+
+def subject_names(subjects: int = 12, seed: int = 42) -> list[str]:
+    """Subjects used by generate_rows for the same {subjects} and {seed}."""
+    return _subject_names(random.Random(seed), subjects)
+
+
+def _typo(rng: random.Random, value: str) -> str:
+    """Swap two neighbouring letters, like a typo the fuzzy stage should fix."""
+    i = rng.randrange(len(value) - 1)
+    return value[:i] + value[i + 1] + value[i] + value[i + 2 :]
+
+
+def generate_rows(  # noqa: PLR0913
+    rows: int,
+    subjects: int = 12,
+    seed: int = 42,
+    typo_rate: float = 0.0,
+    duplicate_rate: float = 0.0,
+    empty_rate: float = 0.0,
+):
+    """Yield {rows} synthetic CSV rows over {subjects} subjects.
+
+    {typo_rate} of the rows misspell their subject or use, {duplicate_rate}
+    repeat the question of an earlier row (same subject and use), and each
+    answer is left empty with probability {empty_rate}.
+    """
+    rng = random.Random(seed)
+    names = _subject_names(rng, subjects)
+    previous: list[tuple[str, str, str]] = []
+    for i in range(rows):
+        if previous and rng.random() < duplicate_rate:
+            question, subject, use = rng.choice(previous)
+        else:
+            question = f"{_sentence(rng, rng.randint(5, 14))} {i} ?"
+            subject, use = rng.choice(names), rng.choice(USES)
+            if len(previous) < 10_000:
+                previous.append((question, subject, use))
+        if rng.random() < typo_rate:
+            if rng.random() < 0.5:
+                subject = _typo(rng, subject)
+            else:
+                use = _typo(rng, use)
+        answers = [
+            "" if rng.random() < empty_rate else _sentence(rng, rng.randint(2, 6))
+            for _ in range(4)
+        ]
+        yield [
+            question,
+            subject,
+            use,
+            rng.choice("ABCD"),
+            *answers,
+            _sentence(rng, 6) if rng.random() < 0.2 else "",
+        ]
+
+
+def write_csv(path: Path, rows: int, **kwargs) -> Path:
+    """Write a synthetic question CSV of {rows} rows to {path}."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        writer.writerows(generate_rows(rows, **kwargs))
+    return path
@@ -0,0 +1,430 @@
+"""Load test of the FastAPI backend: throughput and latency per route.
+
+Usage (from src/):
+    python -m benchmarks.load_http --questions 5000 --concurrency 50 --duration 20
+    python -m benchmarks.load_http --scenarios login,import --mongo-uri mongodb://localhost:27017
+
+main.app runs under uvicorn in a separate process, with its users database,
+logs and data/ folders in a temporary directory. Mongo is mongomock seeded
+with --questions questions and --quizzes quizzes, or the server given with
+--mongo-uri (on its own database, dropped at start). With mongomock, ETL jobs
+run on threads of the server process, since worker processes could not see
+the in-memory data.
+
+Scenarios run one after the other, each with --concurrency clients during
+--duration seconds:
+    login      login storm on /login/connect (bcrypt verification)
+    questions  GET /questions/, then every page of it with ?skip&limit
+    generate   POST /quizs/generate, then GET /quizs/
+    import     POST /etl/import of a generated CSV, then poll /etl/jobs/{id}
+    attempts   POST /quizs/{id}/attempts with random answers, as a student
+    paper      GET /quizs/{id}/paper of one quiz by every client, as a class opening it
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+from benchmarks.etl import DATABASE_NAME, metadata
+from benchmarks.generator import USES, generate_rows, subject_names, write_csv
+
+SCENARIOS = ["login", "questions", "generate", "import", "attempts", "paper"]
+ADMIN = {"x-user-id": "1", "x-username": "admin"}
+STUDENT = {"x-user-id": "3", "x-username": "student1"}
+LOGINS = [("admin", "admin123"), ("teacher1", "teach123"), ("student1", "stud123")]
+JOB_POLL_INTERVAL = 0.2
+PAGE_SIZE = 100
+SUBJECTS = subject_names()  # the seeded questions use the generator defaults
+
+
+# ------------------ Server ------------------
+def _seed(questions: int, quizzes: int, seed: int) -> None:
+    """Insert {questions} generated questions and {quizzes} quizzes sampled with {seed}."""
+    from services.mongo import ServiceMongo  # noqa: PLC0415
+
+    rng = random.Random(seed)
+    now = datetime.now(tz=timezone.utc)
+    docs = []
+    for row in generate_rows(questions):
+        question, subject, use, correct, *answers, remark = row
+        docs.append(
+            {
+                "question": question,
+                "subject": subject,
+                "use": use,
+                "responses": [
+                    {"answer": a, "isCorrect": "ABCD"[i] == correct}
+                    for i, a in enumerate(answers)
+                ],
+                "remark": remark or None,
+                "metadata": {},
+                "date_creation": now,
+                "date_modification": None,
+                "active": True,
+            }
+        )
+    if docs:
+        ServiceMongo.get_collection("questions").insert_many(docs)
+    quiz_docs = []
+    for _ in range(quizzes if docs else 0):
+        sample = rng.sample(docs, min(20, len(docs)))
+        quiz_docs.append(
+            {
+                "questions": [{k: v for k, v in q.items() if k != "_id"} for q in sample],
+                "subjects": sorted({q["subject"] for q in sample}),
+                "use": sample[0]["use"],
+                "metadata": {},
+                "date_creation": now,
+                "date_modification": None,
+                "active": True,
+            }
+        )
+    if quiz_docs:
+        ServiceMongo.get_collection("quizs").insert_many(quiz_docs)
+
+
+def _serve(params: dict) -> None:
+    """Run main.app under uvicorn, in a temporary folder, on a seeded Mongo."""
+    import uvicorn  # noqa: PLC0415
+
+    from services import authentification, db_users, mongo  # noqa: PLC0415
+    from services.etl_jobs import ServiceEtlJob  # noqa: PLC0415
+    from services.log import ServiceLog  # noqa: PLC0415
+
+    workdir = Path(params["workdir"])
+    os.chdir(workdir)
+    # no .env in the temporary folder
+    os.environ.setdefault("QUIZ_VARIANT_SECRET", "benchmark")
+    db_users.DB_PATH = authentification.DB_PATH = workdir / "quiz_users.sqlite"
+    ServiceLog.dir = str(workdir / "log")
+
+    if params["mongo_uri"]:
+        from pymongo import MongoClient  # noqa: PLC0415
+
+        client = MongoClient(params["mongo_uri"])
+    else:
+        import mongomock  # noqa: PLC0415
+        from concurrent.futures import ThreadPoolExecutor  # noqa: PLC0415
+
+        client = mongomock.MongoClient()
+
+        def start_on_threads(cls) -> None:
+            cls.executor = ThreadPoolExecutor(max_workers=os.cpu_count())
+            cls.resume()
+
+        ServiceEtlJob.start = classmethod(start_on_threads)
+    mongo.DATABASE_NAME = DATABASE_NAME
+    client.drop_database(DATABASE_NAME)
+    mongo.ServiceMongo.connect = classmethod(lambda cls: setattr(cls, "client", client))
+    mongo.ServiceMongo.disconnect = classmethod(lambda cls: None)
+    mongo.ServiceMongo.connect()
+    _seed(params["questions"], params["quizzes"], params["seed"])
+
+    import main  # noqa: PLC0415
+
+    uvicorn.run(main.app, host="127.0.0.1", port=params["port"], log_level="warning")
+
+
+# ------------------ Clients ------------------
+class Recorder:
+    """Latencies and status codes per route.
+
+    Errors are transport failures and 5xx answers; 4xx answers are expected
+    by some scenarios (wrong passwords), they only show in the status counts.
+    """
+
+    def __init__(self) -> None:
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.statuses: dict[str, Counter[int]] = defaultdict(Counter)
+        self.errors: dict[str, int] = defaultdict(int)
+
+    async def request(
+        self, client: httpx.AsyncClient, route: str, method: str, url: str, **kwargs
+    ) -> httpx.Response | None:
+        """Send one request and record it under {route}."""
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.errors[route] += 1
+            return None
+        self.latencies[route].append(time.perf_counter() - start)
+        self.statuses[route][response.status_code] += 1
+        if response.status_code >= 500:  # noqa: PLR2004
+            self.errors[route] += 1
+        return response
+
+    def record(self, route: str, seconds: float) -> None:
+        """Record a latency measured by the caller."""
+        self.latencies[route].append(seconds)
+
+
+async def scenario_login(client, recorder, rng) -> None:
+    """Log in with a random account, sometimes with a wrong password."""
+    username, password = rng.choice(LOGINS)
+    if rng.random() < 0.1:
+        password += "-wrong"
+    await recorder.request(
+        client,
+        "POST /login/connect",
+        "POST",
+        "/login/connect",
+        json={"username": username, "password": password},
+    )
+
+
+async def scenario_questions(client, recorder, rng) -> None:  # noqa: ARG001
+    """List the questions, then read them page by page."""
+    await recorder.request(client, "GET /questions/", "GET", "/questions/")
+    skip = 0
+    while True:
+        response = await recorder.request(
+            client,
+            "GET /questions/?skip&limit",
+            "GET",
+            "/questions/",
+            params={"skip": skip, "limit": PAGE_SIZE},
+        )
+        if response is None or len(response.json()["questions"]) < PAGE_SIZE:
+            break
+        skip += PAGE_SIZE
+
+
+async def scenario_generate(client, recorder, rng) -> None:
+    """Generate a quiz, then list the quizzes."""
+    subjects = rng.sample(SUBJECTS, 3)
+    await recorder.request(
+        client,
+        "POST /quizs/generate",
+        "POST",
+        "/quizs/generate",
+        json={"total_questions": 20, "subjects": subjects, "use": rng.choice(USES)},
+    )
+    await recorder.request(client, "GET /quizs/", "GET", "/quizs/", headers=ADMIN)
+
+
+async def scenario_import(client, recorder, rng, upload_rows: int) -> None:
+    """Upload a CSV, then poll its job until it ends."""
+    with tempfile.TemporaryDirectory() as tmp:
+        # a new seed per upload, identical files would be skipped by the import ledger
+        path = write_csv(Path(tmp) / "questions.csv", upload_rows, seed=rng.randrange(2**32))
+        data = path.read_bytes()
+    start = time.perf_counter()
+    response = await recorder.request(
+        client,
+        "POST /etl/import",
+        "POST",
+        "/etl/import",
+        files={"file": ("questions.csv", data, "text/csv")},
+        headers=ADMIN,
+    )
+    if response is None or response.status_code != 202:  # noqa: PLR2004
+        return
+    job_id = response.json()["job_id"]
+    while True:
+        response = await recorder.request(
+            client, "GET /etl/jobs/{id}", "GET", f"/etl/jobs/{job_id}", headers=ADMIN
+        )
+        if response is None or response.json().get("state") in {"done", "failed"}:
+            break
+        await asyncio.sleep(JOB_POLL_INTERVAL)
+    recorder.record("etl job (upload to done)", time.perf_counter() - start)
+
+
+async def scenario_attempts(client, recorder, rng, quizzes: list[dict]) -> None:
+    """Submit random answers to a random quiz."""
+    quiz = rng.choice(quizzes)
+    answers = [
+        rng.sample(range(len(q["responses"])), rng.randint(1, 2)) for q in quiz["questions"]
+    ]
+    await recorder.request(
+        client,
+        "POST /quizs/{id}/attempts",
+        "POST",
+        f"/quizs/{quiz['id']}/attempts",
+        json={"answers": answers},
+        headers=STUDENT,
+    )
+
+
+async def scenario_paper(client, recorder, rng, quizzes: list[dict]) -> None:  # noqa: ARG001
+    """Open the student paper of the first quiz."""
+    await recorder.request(
+        client,
+        "GET /quizs/{id}/paper",
+        "GET",
+        f"/quizs/{quizzes[0]['id']}/paper",
+        headers=STUDENT,
+    )
+
+
+async def run_scenario(
+    base_url: str, name: str, concurrency: int, duration: float, upload_rows: int
+) -> Recorder:
+    """Run scenario {name} with {concurrency} clients during {duration} seconds."""
+    recorder = Recorder()
+    quizzes: list[dict] = []
+    step = {
+        "login": scenario_login,
+        "questions": scenario_questions,
+        "generate": scenario_generate,
+        "import": lambda c, r, g: scenario_import(c, r, g, upload_rows),
+        "attempts": lambda c, r, g: scenario_attempts(c, r, g, quizzes),
+        "paper": lambda c, r, g: scenario_paper(c, r, g, quizzes),
+    }[name]
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        if name in ("attempts", "paper"):
+            quizzes.extend((await client.get("/quizs/", headers=ADMIN)).json()["quizs"])
+            deadline = time.perf_counter() + duration
+
+        async def worker(n: int) -> None:
+            rng = random.Random(n)
+            while time.perf_counter() < deadline:
+                await step(client, recorder, rng)
+
+        await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    return recorder
+
+
+def percentile(values: list[float], p: float) -> float:
+    """Nearest-rank percentile {p} of sorted {values}."""
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+def summarize(recorder: Recorder, duration: float) -> dict:
+    """Throughput and latency percentiles (ms) of every route."""
+    routes = {}
+    for route in sorted(set(recorder.latencies) | set(recorder.errors)):
+        values = sorted(recorder.latencies[route])
+        routes[route] = {
+            "requests": len(values),
+            "errors": recorder.errors[route],
+            "status": {str(k): v for k, v in sorted(recorder.statuses[route].items())},
+            "rps": round(len(values) / duration, 1),
+            **{
+                f"p{p}_ms": round(percentile(values, p) * 1000, 1) if values else None
+                for p in (50, 95, 99)
+            },
+            "max_ms": round(values[-1] * 1000, 1) if values else None,
+        }
+    return routes
+
+
+async def wait_ready(
+    base_url: str, server: multiprocessing.Process | None = None, timeout: float = 60
+) -> None:
+    """Wait until the server answers on /, failing as soon as its {server} process exits."""
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while True:
+            try:
+                if (await client.get("/")).status_code == 200:  # noqa: PLR2004
+                    return
+            except httpx.HTTPError:
+                pass
+            if server is not None and not server.is_alive():
+                raise RuntimeError(f"Server exited during startup (code {server.exitcode})")
+            if time.perf_counter() > deadline:
+                raise RuntimeError("Server did not start")
+            await asyncio.sleep(0.2)
+
+
+def run(scenarios: list[str], concurrency: int, duration: float, upload_rows: int, **params) -> dict:
+    """Start the server, run every scenario, return the results per scenario and route."""
+    ctx = multiprocessing.get_context("spawn")
+    base_url = f"http://127.0.0.1:{params['port']}"
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        server = ctx.Process(target=_serve, args=({**params, "workdir": tmp},))
+        server.start()
+        try:
+            asyncio.run(wait_ready(base_url, server))
+            for name in scenarios:
+                recorder = asyncio.run(
+                    run_scenario(base_url, name, concurrency, duration, upload_rows)
+                )
+                results[name] = summarize(recorder, duration)
+        finally:
+            server.terminate()
+            server.join()
+    return results
+
+
+def table(results: dict) -> list[str]:
+    """Lines of a readable table of {results}."""
+    lines = [
+        f"{'scenario':<10} {'route':<26} {'req':>7} {'err':>5} {'rps':>8} "
+        f"{'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}"
+    ]
+    for name, routes in results.items():
+        for route, r in routes.items():
+            cells = [r[k] if r[k] is not None else "-" for k in ("p50_ms", "p95_ms", "p99_ms", "max_ms")]
+            lines.append(
+                f"{name:<10} {route:<26} {r['requests']:>7} {r['errors']:>5} {r['rps']:>8} "
+                + " ".join(f"{c:>8}" for c in cells)
+            )
+    return lines
+
+
+def main() -> None:
+    """Parse arguments, run the load test, write JSON results."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per scenario")
+    parser.add_argument("--questions", type=int, default=2000)
+    parser.add_argument("--quizzes", type=int, default=100)
+    parser.add_argument("--upload-rows", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--mongo-uri", default=None)
+    parser.add_argument("--output", type=Path, default=None, help="JSON file, stdout by default")
+    args = parser.parse_args()
+
+    scenarios = args.scenarios.split(",")
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {sorted(unknown)}")
+    params = {
+        "questions": args.questions,
+        "quizzes": args.quizzes,
+        "seed": args.seed,
+        "port": args.port,
+        "mongo_uri": args.mongo_uri,
+    }
+    results = run(scenarios, args.concurrency, args.duration, args.upload_rows, **params)
+    meta = metadata(params)
+    meta["params"].update(
+        scenarios=scenarios,
+        concurrency=args.concurrency,
+        duration=args.duration,
+        upload_rows=args.upload_rows,
+    )
+    report = {"meta": meta, "results": results}
+    sys.stderr.write("\n".join(table(results)) + "\n")
+    if args.output is None:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""Load test of live sessions: fan-out of questions to many websockets.
+
+Usage (from src/):
+    python -m benchmarks.load_ws --sockets 1000 --rounds 5
+    python -m benchmarks.load_ws --sockets 2000 --mongo-uri mongodb://localhost:27017
+
+main.app runs under uvicorn in a separate process, on one worker, as in
+load_http. A teacher opens a session on a seeded quiz and --sockets students
+connect. For each of --rounds questions, the teacher pushes the question,
+every student answers once it receives it, and the run measures the time
+for the question to reach every socket (fan-out) and for the teacher to see
+every answer counted.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+import websockets
+
+from benchmarks.etl import metadata
+from benchmarks.load_http import ADMIN, _serve, percentile, wait_ready
+
+CONNECT_BATCH = 100  # sockets opened at once
+ROUND_TIMEOUT = 60  # seconds
+
+
+def _ms(values: list[float]) -> dict:
+    values = sorted(values)
+    return {
+        **{f"p{p}_ms": round(percentile(values, p) * 1000, 1) for p in (50, 95, 99)},
+        "max_ms": round(values[-1] * 1000, 1),
+    }
+
+
+class Student:
+    """One student socket: answers each question with a random response."""
+
+    def __init__(self, n: int, rng: random.Random) -> None:
+        self.n = n
+        self.rng = rng
+        self.received: dict[int, float] = {}
+        self.errors = 0
+
+    async def run(self, url: str, ready: asyncio.Event, done: "Round") -> None:
+        """Connect, then answer every question until the session ends."""
+        headers = {"x-user-id": str(1000 + self.n), "x-username": f"load{self.n}"}
+        async with websockets.connect(url, additional_headers=headers) as ws:
+            ready.set()
+            async for text in ws:
+                frame = json.loads(text)
+                if frame["type"] == "end":
+                    return
+                if frame["type"] == "error":
+                    self.errors += 1
+                    continue
+                self.received[frame["index"]] = time.perf_counter()
+                done.arrived()
+                responses = len(frame["question"]["responses"])
+                await ws.send(
+                    json.dumps({"index": frame["index"], "answer": [self.rng.randrange(responses)]})
+                )
+
+
+class Round:
+    """Counts the students that received the current question."""
+
+    def __init__(self, sockets: int) -> None:
+        self.sockets = sockets
+        self.count = 0
+        self.all_arrived = asyncio.Event()
+
+    def reset(self) -> None:
+        """Start a new question."""
+        self.count = 0
+        self.all_arrived.clear()
+
+    def arrived(self) -> None:
+        """One more student received the question."""
+        self.count += 1
+        if self.count >= self.sockets:
+            self.all_arrived.set()
+
+
+async def run_session(base_url: str, sockets: int, rounds: int, seed: int) -> dict:
+    """Open a session with {sockets} students and push {rounds} questions."""
+    ws_url = base_url.replace("http", "ws", 1)
+    rng = random.Random(seed)
+    async with httpx.AsyncClient(base_url=base_url, headers=ADMIN, timeout=60) as client:
+        quiz = (await client.get("/quizs/")).json()["quizs"][0]["id"]
+        session = (await client.post("/live/sessions", json={"quiz_id": quiz})).json()["session"]
+        rounds = min(rounds, len((await client.get(f"/quizs/{quiz}/paper")).json()["questions"]))
+
+        teacher_frames: asyncio.Queue[dict] = asyncio.Queue()
+
+        async def teacher() -> None:
+            async with websockets.connect(
+                f"{ws_url}/live/{session}/teacher", additional_headers=ADMIN
+            ) as ws:
+                async for text in ws:
+                    await teacher_frames.put(json.loads(text))
+
+        teacher_task = asyncio.create_task(teacher())
+        progress = Round(sockets)
+        students = [Student(n, random.Random(rng.random())) for n in range(sockets)]
+        tasks = []
+        start = time.perf_counter()
+        for first in range(0, sockets, CONNECT_BATCH):
+            batch = students[first : first + CONNECT_BATCH]
+            ready = [asyncio.Event() for _ in batch]
+            tasks += [
+                asyncio.create_task(s.run(f"{ws_url}/live/{session}/ws", r, progress))
+                for s, r in zip(batch, ready, strict=True)
+            ]
+            await asyncio.wait_for(asyncio.gather(*(r.wait() for r in ready)), ROUND_TIMEOUT)
+        connect_seconds = time.perf_counter() - start
+
+        results = []
+        for index in range(rounds):
+            progress.reset()
+            pushed = time.perf_counter()
+            await client.post(f"/live/{session}/next")
+            await asyncio.wait_for(progress.all_arrived.wait(), ROUND_TIMEOUT)
+            fanned_out = time.perf_counter()
+            while True:
+                frame = await asyncio.wait_for(teacher_frames.get(), ROUND_TIMEOUT)
+                if frame["index"] == index and frame["answered"] >= sockets:
+                    break
+            counted = time.perf_counter()
+            results.append(
+                {
+                    "index": index,
+                    "fan_out": _ms([s.received[index] - pushed for s in students]),
+                    "all_received_ms": round((fanned_out - pushed) * 1000, 1),
+                    "all_counted_ms": round((counted - pushed) * 1000, 1),
+                    "counts": frame["counts"],
+                }
+            )
+        final = (await client.post(f"/live/{session}/close")).json()
+        await asyncio.wait_for(asyncio.gather(*tasks, return_exceptions=True), ROUND_TIMEOUT)
+        teacher_task.cancel()
+    return {
+        "sockets": sockets,
+        "connected_students": final["students"],
+        "connect_seconds": round(connect_seconds, 2),
+        "student_errors": sum(s.errors for s in students),
+        "rounds": results,
+    }
+
+
+def run(sockets: int, rounds: int, **params) -> dict:
+    """Start the server, run the session, return its results."""
+    ctx = multiprocessing.get_context("spawn")
+    base_url = f"http://127.0.0.1:{params['port']}"
+    with tempfile.TemporaryDirectory() as tmp:
+        server = ctx.Process(target=_serve, args=({**params, "workdir": tmp},))
+        server.start()
+        try:
+            asyncio.run(wait_ready(base_url, server))
+            return asyncio.run(run_session(base_url, sockets, rounds, params["seed"]))
+        finally:
+            server.terminate()
+            server.join()
+
+
+def table(results: dict) -> list[str]:
+    """Lines of a readable table of {results}."""
+    lines = [
+        f"sockets {results['connected_students']}/{results['sockets']} connected "
+        f"in {results['connect_seconds']} s, {results['student_errors']} errors",
+        f"{'question':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} {'counted':>8}",
+    ]
+    for r in results["rounds"]:
+        cells = [r["fan_out"][k] for k in ("p50_ms", "p95_ms", "p99_ms", "max_ms")]
+        lines.append(
+            f"{r['index']:>8} " + " ".join(f"{c:>8}" for c in cells) + f" {r['all_counted_ms']:>8}"
+        )
+    return lines
+
+
+def main() -> None:
+    """Parse arguments, run the load test, write JSON results."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--sockets", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=5, help="questions pushed")
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--quizzes", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--mongo-uri", default=None)
+    parser.add_argument("--output", type=Path, default=None, help="JSON file, stdout by default")
+    args = parser.parse_args()
+
+    params = {
+        "questions": args.questions,
+        "quizzes": args.quizzes,
+        "seed": args.seed,
+        "port": args.port,
+        "mongo_uri": args.mongo_uri,
+    }
+    results = run(args.sockets, args.rounds, **params)
+    meta = metadata(params)
+    meta["params"].update(sockets=args.sockets, rounds=args.rounds)
+    report = {"meta": meta, "results": results}
+    sys.stderr.write("\n".join(table(results)) + "\n")
+    if args.output is None:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Benchmark of the ETL readers: parse time and peak memory per engine.
+
+Usage (from src/): python -m benchmarks.reader --rows 200000
+Each measure runs in a fresh process, so peak RSS is not polluted by the others.
+Peak RSS is taken from the kernel (VmHWM), so it includes Arrow buffers that
+tracemalloc does not see.
+"""
+
+import argparse
+import json
+import multiprocessing
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from benchmarks.generator import write_csv
+from services.etl_quiz import clean_frame, map_columns, read_frame
+from services.metrics import peak_rss_mb, reset_peak_rss
+
+
+def _measure(path: str, engine: str, queue: multiprocessing.Queue) -> None:
+    """Read, map and clean {path} with {engine}, report time and memory."""
+    reset_peak_rss()
+    rss_before = peak_rss_mb()
+    start = time.perf_counter()
+    df = read_frame(Path(path), engine)
+    parsed = time.perf_counter()
+    df = clean_frame(map_columns(df), Path(path).name)
+    done = time.perf_counter()
+    rss_after = peak_rss_mb()
+    queue.put(
+        {
+            "file": Path(path).suffix.lstrip("."),
+            "engine": engine,
+            "rows": len(df),
+            "parse_s": round(parsed - start, 4),
+            "parse_clean_s": round(done - start, 4),
+            "peak_rss_delta_mb": round(rss_after - rss_before, 1),
+            "frame_mb": round(df.memory_usage(deep=True).sum() / 2**20, 1),
+        }
+    )
+
+
+def run(rows: int, formats: list[str], engines: list[str]) -> list[dict]:
+    """Benchmark every (format, engine) pair on a synthetic file of {rows} rows."""
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = write_csv(Path(tmp) / "questions.csv", rows)
+        paths = {"csv": csv_path}
+        if "parquet" in formats:
+            paths["parquet"] = Path(tmp) / "questions.parquet"
+            pd.read_csv(csv_path).to_parquet(paths["parquet"])
+        for fmt in formats:
+            for engine in engines:
+                queue = ctx.Queue()
+                proc = ctx.Process(target=_measure, args=(str(paths[fmt]), engine, queue))
+                proc.start()
+                results.append(queue.get())
+                proc.join()
+    return results
+
+
+def main() -> None:
+    """Parse arguments, run the benchmark, print JSON results."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--formats", default="csv,parquet")
+    parser.add_argument("--engines", default="c,pyarrow")
+    args = parser.parse_args()
+    results = run(args.rows, args.formats.split(","), args.engines.split(","))
+    json.dump(results, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
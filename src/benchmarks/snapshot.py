@@ -0,0 +1,116 @@
+"""Benchmark of loading a question bank: CSV ETL against a Parquet snapshot restore.
+
+Usage (from src/):
+    python -m benchmarks.snapshot --sizes 1000,10000
+    python -m benchmarks.snapshot --mongo-uri mongodb://localhost:27017 --output snapshot.json
+
+For each size, a synthetic CSV is imported with the ETL (process_and_export_csv,
+into an empty database), the bank is exported as a full snapshot, the
+database is dropped and the snapshot restored. Both loads end with the same
+questions in Mongo. Without --mongo-uri, Mongo is replaced by mongomock, as
+in benchmarks.etl. Each size runs in a fresh process and a temporary folder.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.etl import DATABASE_NAME, _connect, metadata
+from benchmarks.generator import write_csv
+
+SIZES = [1_000, 10_000, 100_000]
+
+
+def _measure(params: dict, queue: multiprocessing.Queue) -> None:
+    """Load a generated file with the ETL, then from a snapshot, report both times."""
+    from services import etl_quiz, mongo  # noqa: PLC0415
+    from services.snapshot import ServiceSnapshot  # noqa: PLC0415
+
+    _connect(params["mongo_uri"])
+    os.chdir(params["workdir"])
+    csv_path = write_csv(
+        etl_quiz.DATA_IN / "questions.csv",
+        params["rows"],
+        subjects=params["subjects"],
+        seed=params["seed"],
+    )
+
+    start = time.perf_counter()
+    etl_quiz.process_and_export_csv(csv_path, author=None, chunksize=None)
+    etl_s = time.perf_counter() - start
+    questions = mongo.ServiceMongo.get_collection("questions").count_documents({})
+
+    start = time.perf_counter()
+    manifest = ServiceSnapshot.export(full=True)
+    export_s = time.perf_counter() - start
+
+    mongo.ServiceMongo.client.drop_database(DATABASE_NAME)
+    start = time.perf_counter()
+    counts = ServiceSnapshot.restore(manifest["id"])
+    restore_s = time.perf_counter() - start
+
+    queue.put(
+        {
+            "rows": params["rows"],
+            "questions": questions,
+            "restored": counts["questions"],
+            "etl_s": round(etl_s, 4),
+            "export_s": round(export_s, 4),
+            "restore_s": round(restore_s, 4),
+            "speedup": round(etl_s / restore_s, 1) if restore_s else None,
+            "files": len(manifest["files"]),
+        }
+    )
+
+
+def run(sizes: list[int], **params) -> list[dict]:
+    """Benchmark both loads on a synthetic file of each size in {sizes}."""
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+    for rows in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            queue = ctx.Queue()
+            proc = ctx.Process(
+                target=_measure, args=({**params, "rows": rows, "workdir": tmp}, queue)
+            )
+            proc.start()
+            results.append(queue.get())
+            proc.join()
+    return results
+
+
+def main() -> None:
+    """Parse arguments, run the benchmark, write JSON results."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--sizes", default=",".join(map(str, SIZES)))
+    parser.add_argument("--subjects", type=int, default=12)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--mongo-uri", default=None)
+    parser.add_argument("--output", type=Path, default=None, help="JSON file, stdout by default")
+    args = parser.parse_args()
+
+    params = {"subjects": args.subjects, "seed": args.seed, "mongo_uri": args.mongo_uri}
+    sizes = [int(n) for n in args.sizes.split(",")]
+    results = run(sizes, **params)
+    report = {"meta": metadata(params), "results": results}
+    for r in results:
+        sys.stderr.write(
+            f"{r['rows']:>9} rows  etl {r['etl_s']:>8.3f}s  restore {r['restore_s']:>8.3f}s"
+            f"  x{r['speedup']}\n"
+        )
+    if args.output is None:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
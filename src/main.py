@@ -6,11 +6,20 @@ from fastapi.responses import ORJSONResponse
 from prometheus_fastapi_instrumentator import Instrumentator
 
 from routers.etl_import import router as etl_router
+from routers.health import router as health_router
+from routers.live import router as live_router
 from routers.login import router as login_router
 from routers.question import router as questions_router
 from routers.quiz import router as quizs_router
+from routers.snapshot import router as snapshot_router
+from routers.taxonomy import router as taxonomy_router
+from services.attempt import ServiceAttempt
+from services.changes import ServiceChanges
+from services.etl_jobs import ServiceEtlJob
+from services.live import ServiceLive
 from services.log import ServiceLog
 from services.mongo import ServiceMongo
+from services.variant import ServiceVariant
 from services.db_users import main as create_db
 
 
@@ -20,8 +29,15 @@ async def lifespan(app: FastAPI):  # noqa: ANN201, ARG001
     create_db()
     ServiceMongo.connect()
     ServiceLog.setup()
+    ServiceVariant.start()
+    ServiceChanges.start()
+    ServiceEtlJob.start()
+    ServiceAttempt.start()
     ServiceLog.send_info("Backend started.")
     yield
+    ServiceLive.stop()
+    await ServiceAttempt.stop()
+    ServiceEtlJob.stop()
     ServiceMongo.disconnect()
     ServiceLog.send_info("Backend stopped.")
 
@@ -42,6 +58,10 @@ app.include_router(questions_router)
 app.include_router(quizs_router)
 app.include_router(login_router)
 app.include_router(etl_router)
+app.include_router(taxonomy_router)
+app.include_router(health_router)
+app.include_router(live_router)
+app.include_router(snapshot_router)
 
 
 @app.get("/", tags=["root"])
@@ -1,10 +1,73 @@
-from pydantic import BaseModel
+"""ETL API models based on BaseModel."""
+
+from datetime import datetime
+
+from pydantic import BaseModel, ConfigDict, Field
+
 
 class EtlStats(BaseModel):
+    """EtlStats."""
+
     accepted: int
     rejected: int
     total: int
+    skipped_unchanged: int = 0
+
 
 class EtlImportResponse(BaseModel):
+    """EtlImportResponse."""
+
     file: str
     stats: EtlStats
+
+
+class EtlJobProgress(BaseModel):
+    """EtlJobProgress."""
+
+    rows_read: int = 0
+    skipped_unchanged: int = 0
+    accepted: int = 0
+    rejected: int = 0
+    total: int = 0
+    fuzzy_corrections: int = 0
+    events: dict[str, int] = Field(default_factory=dict)
+    stage: str | None = None
+    stage_elapsed: float = 0.0
+    stages: dict[str, float] = Field(default_factory=dict)
+
+
+class EtlJob(BaseModel):
+    """EtlJob."""
+
+    id: str = Field(alias="_id")
+    state: str
+    filename: str
+    rapport: str
+    progress: EtlJobProgress
+    stats: EtlStats | None = None
+    error: str | None = None
+    date_creation: datetime
+    date_modification: datetime
+
+    model_config = ConfigDict(validate_by_name=True, validate_by_alias=True)
+
+
+class EtlReportEvent(BaseModel):
+    """EtlReportEvent."""
+
+    date: datetime
+    fichier: str
+    ligne: int | None = None
+    type_evenement: str
+    message: str
+
+
+class EtlReportPage(BaseModel):
+    """EtlReportPage."""
+
+    report: str
+    counts: dict[str, int]
+    total: int
+    page: int
+    page_size: int
+    events: list[EtlReportEvent]
@@ -0,0 +1,45 @@
+"""Attempt models based on BaseModel."""
+
+from datetime import datetime
+
+from pydantic import BaseModel, ConfigDict, Field
+
+from services.util import ObjectIdValidator
+
+MAX_BULK_ATTEMPTS = 5000
+
+
+class AttemptSubmission(BaseModel):
+    """AttemptSubmission."""
+
+    # per question, the indexes of the responses chosen by the student
+    answers: list[list[int]]
+    # answers given in the order of the student's variant (GET /quizs/{id}/variant)
+    variant: bool = False
+
+
+class BulkAttempt(AttemptSubmission):
+    """BulkAttempt."""
+
+    student: str = Field(min_length=1)
+
+
+class BulkAttemptSubmission(BaseModel):
+    """BulkAttemptSubmission."""
+
+    attempts: list[BulkAttempt] = Field(min_length=1, max_length=MAX_BULK_ATTEMPTS)
+
+
+class AttemptResult(BaseModel):
+    """AttemptResult."""
+
+    id: ObjectIdValidator | None = Field(default=None, alias="_id")  # noqa: FA102
+    quiz_id: ObjectIdValidator
+    student: str
+    score: int
+    total: int
+    correct: list[bool]
+    seed: int | None = None  # noqa: FA102
+    date_submission: datetime
+
+    model_config = ConfigDict(validate_by_name=True, validate_by_alias=True)
@@ -0,0 +1,17 @@
+"""Live session models based on BaseModel."""
+
+from pydantic import BaseModel
+
+
+class LiveSessionCreator(BaseModel):
+    """LiveSessionCreator."""
+
+    quiz_id: str
+
+
+class LiveAnswer(BaseModel):
+    """LiveAnswer."""
+
+    # index of the question answered, answers to a closed question are refused
+    index: int
+    answer: list[int]
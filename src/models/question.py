@@ -28,6 +28,7 @@ class QuestionModel(BaseModel):
     date_creation: datetime
     date_modification: datetime | None  # noqa: FA102
     active: bool = Field(default=True)
+    attachments: list[str] = Field(default_factory=list)  # ids in GridFS
 
     model_config = ConfigDict(validate_by_name=True, validate_by_alias=True)
 
@@ -45,6 +46,7 @@ class QuestionDict(TypedDict):
     date_creation: datetime
     date_modification: datetime | None  # noqa: FA102
     active: bool
+    attachments: list[str]
 
 
 class QuestionGetter(BaseModel):
@@ -1,7 +1,7 @@
 """Quiz model based on BaseModel."""
 
 from datetime import datetime
-from typing import TypedDict
+from typing import Literal, TypedDict
 
 from pydantic import BaseModel, ConfigDict, Field
 
@@ -20,10 +20,34 @@ class QuizModel(BaseModel):
     date_creation: datetime
     date_modification: datetime | None  # noqa: FA102
     active: bool = Field(default=True)
+    # per question, bit i is set when response i is correct (see ServiceQuiz.answer_key);
+    # left out of dumps, stored by ServiceQuiz.create only
+    answer_key: list[int] = Field(default_factory=list, exclude=True)
+    answer_counts: list[int] = Field(default_factory=list, exclude=True)
 
     model_config = ConfigDict(validate_by_name=True, validate_by_alias=True)
 
 
+class PaperQuestion(BaseModel):
+    """PaperQuestion."""
+
+    question: str
+    subject: str
+    use: str
+    responses: list[str]
+    # paths of GET /questions/{question}/attachments/{attachment}
+    attachments: list[str] = Field(default_factory=list)
+
+
+class QuizPaper(BaseModel):
+    """QuizPaper."""
+
+    # student version of a quiz: no correct flags, no remarks
+    subjects: list[str]
+    use: str
+    questions: list[PaperQuestion]
+
+
 class QuizDict(TypedDict):
     """QuizDict."""
 
@@ -35,6 +59,8 @@ class QuizDict(TypedDict):
     date_creation: datetime
     date_modification: datetime | None  # noqa: FA102
     active: bool
+    answer_key: list[int]
+    answer_counts: list[int]
 
     model_config = ConfigDict(validate_by_name=True, validate_by_alias=True)
 
@@ -45,3 +71,5 @@ class QuizGenerator(BaseModel):
     total_questions: int
     subjects: list[str]
     use: str
+    # usage: favour questions rarely and not recently drawn (see ServiceUsage)
+    sampling: Literal["uniform", "usage"] = "uniform"
@@ -0,0 +1,34 @@
+"""Taxonomy models based on BaseModel."""
+
+from typing import Literal
+
+from pydantic import BaseModel, Field
+
+TaxonomyField = Literal["subject", "use"]
+
+
+class TaxonomyAlias(BaseModel):
+    """TaxonomyAlias."""
+
+    alias: str
+    source: str
+
+
+class TaxonomyEntry(BaseModel):
+    """TaxonomyEntry."""
+
+    name: str
+    aliases: list[TaxonomyAlias] = Field(default_factory=list)
+
+
+class CanonicalCreator(BaseModel):
+    """CanonicalCreator."""
+
+    name: str = Field(min_length=1)
+
+
+class AliasCreator(BaseModel):
+    """AliasCreator."""
+
+    alias: str = Field(min_length=1)
+    canonical: str = Field(min_length=1)
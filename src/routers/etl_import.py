@@ -1,48 +1,71 @@
+import asyncio
+import time
 from pathlib import Path
+from urllib.parse import quote
 
-from fastapi import APIRouter, Depends, File, HTTPException, Request, UploadFile
-from fastapi.responses import FileResponse, ORJSONResponse
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, ORJSONResponse, Response, StreamingResponse
 
-from services.etl_adapter import run_etl_from_upload
+from models.api_etl import EtlJob, EtlReportPage
+from services.etl_adapter import submit_etl_from_request
+from services.etl_jobs import ServiceEtlJob
+from services.etl_report import ServiceEtlReport
 from services.secure import require_roles
+from services.upload import UploadError
 
 router = APIRouter(prefix="/etl", tags=["etl"])
 RequireTeacherOrAdmin = Depends(require_roles({"teacher", "admin"}))
 
-ALLOWED_CT = {"text/csv","application/vnd.ms-excel","application/csv"}
-
 DATA_LOG = Path("data/log").resolve()
 
+SSE_POLL_INTERVAL = 0.5  # seconds between two reads of the job document
+SSE_KEEPALIVE = 15.0  # seconds without change before a keep-alive comment
+
+REPORT_PAGE_SIZE = 100
+REPORT_MAX_PAGE_SIZE = 1000
+
 
 @router.post(
     "/import",
-    status_code=201,
-    summary="Import a CSV file of questions",
+    status_code=202,
+    summary="Import a CSV, Parquet or Excel/ODS file of questions",
     name="etl_import_apply",
-)
-async def import_csv(
-    request: Request,
-    file: UploadFile = File(..., description="CSV UTF-8"),
-    _user=RequireTeacherOrAdmin,
-) -> ORJSONResponse:
-    if file.content_type not in ALLOWED_CT:
-        return ORJSONResponse(
-            content={
-                "success": False,
-                "message": f"Type de fichier invalide ({file.content_type})",
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "required": ["file"],
+                        "properties": {
+                            "file": {
+                                "type": "string",
+                                "format": "binary",
+                                "description": "CSV UTF-8, Parquet, XLSX or ODS",
+                            }
+                        },
+                    }
+                }
             },
-            status_code=400,
-        )
-
+        }
+    },
+)
+async def import_csv(request: Request, _user=RequireTeacherOrAdmin) -> ORJSONResponse:
+    # The body is read as a stream rather than through UploadFile, so the file
+    # goes to disk chunk by chunk and a bad file is refused from its first bytes
     author = _user["username"]
     try:
-        filename = file.filename or "questions.csv"
-        data = await file.read()
-        stats, rapport_path = run_etl_from_upload(filename, data, author)
-        # Provide endpoint to download rapport
-        rapport_name = rapport_path.name if rapport_path else None
+        # The import runs in the background, poll /etl/jobs/{job_id} for its state
+        job_id = await submit_etl_from_request(request, "file", author)
+        return ORJSONResponse(
+            content={"success": True, "job_id": job_id}, status_code=202
+        )
+    except UploadError as ue:
         return ORJSONResponse(
-            content={"success": True, "file": rapport_name, "stats": stats}
+            content={"success": False, "message": str(ue)}, status_code=ue.status_code
         )
     except ValueError as ve:
         return ORJSONResponse(
@@ -54,9 +77,115 @@ async def import_csv(
         )
 
 
-@router.get("/rapport/{name}", name="etl_get_rapport")
-def etl_get_rapport(name: str, _user=RequireTeacherOrAdmin):
+@router.get("/jobs/{job_id}", name="etl_get_job")
+def etl_get_job(job_id: str, _user=RequireTeacherOrAdmin) -> ORJSONResponse:
+    job = ServiceEtlJob.get(job_id)
+    if job is None:
+        raise HTTPException(404, "Import introuvable")
+    return ORJSONResponse(content=EtlJob.model_validate(job).model_dump())
+
+
+@router.get("/jobs/{job_id}/events", name="etl_job_events")
+async def etl_job_events(
+    job_id: str, request: Request, _user=RequireTeacherOrAdmin
+) -> StreamingResponse:
+    """Stream the progress of an import as server-sent events.
+
+    Progress is read from the job document that the worker updates, so the
+    pipeline itself does no extra work for listeners.
+    """
+    if await run_in_threadpool(ServiceEtlJob.get, job_id) is None:
+        raise HTTPException(404, "Import introuvable")
+
+    async def stream():
+        last_change = None
+        last_sent = time.monotonic()
+        while not await request.is_disconnected():
+            job = EtlJob.model_validate(await run_in_threadpool(ServiceEtlJob.get, job_id))
+            if job.date_modification != last_change:
+                last_change = job.date_modification
+                last_sent = time.monotonic()
+                payload = orjson.dumps(job.model_dump()).decode()
+                yield f"event: progress\ndata: {payload}\n\n"
+                if job.state in {"done", "failed"}:
+                    yield f"event: end\ndata: {payload}\n\n"
+                    return
+            elif time.monotonic() - last_sent > SSE_KEEPALIVE:
+                last_sent = time.monotonic()
+                yield ": keep-alive\n\n"
+            await asyncio.sleep(SSE_POLL_INTERVAL)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _legacy_report(name: str) -> FileResponse:
+    """Serve report {name} written as a file before reports were stored in Mongo."""
     rapport_path = (DATA_LOG / name).resolve()
     if not str(rapport_path).startswith(str(DATA_LOG)) or not rapport_path.exists():
         raise HTTPException(404, "Rapport introuvable")
     return FileResponse(rapport_path, media_type="text/csv", filename=name)
+
+
+def _attachment(name: str) -> str:
+    """Content-Disposition of a download named {name}, quoted as FileResponse does."""
+    quoted = quote(name)
+    if quoted != name:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{name}"'
+
+
+def _report_query(
+    name: str,
+    types: list[str] | None = Query(
+        None, alias="type", description="Event types, e.g. QUESTION_REFUSEE"
+    ),
+    line_min: int | None = Query(None, ge=0, description="First source line"),
+    line_max: int | None = Query(None, ge=0, description="Last source line"),
+) -> dict:
+    return ServiceEtlReport.query(name, types, line_min, line_max)
+
+
+@router.get("/rapport/{name}", name="etl_get_rapport")
+def etl_get_rapport(
+    name: str,
+    query: dict = Depends(_report_query),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(REPORT_PAGE_SIZE, ge=1, le=REPORT_MAX_PAGE_SIZE),
+    _user=RequireTeacherOrAdmin,
+) -> Response:
+    """Get one page of the events of a report, filtered by type and line.
+
+    The counts per event type cover the whole report, whatever the filters.
+    Reports written as files before are served whole, as CSV.
+    """
+    counts = ServiceEtlReport.counts(name)
+    if not counts:
+        return _legacy_report(name)
+    total, events = ServiceEtlReport.page(query, page, page_size)
+    report = EtlReportPage(
+        report=name,
+        counts=counts,
+        total=total,
+        page=page,
+        page_size=page_size,
+        events=events,
+    )
+    return ORJSONResponse(content=report.model_dump())
+
+
+@router.get("/rapport/{name}/export", name="etl_export_rapport")
+def etl_export_rapport(
+    name: str, query: dict = Depends(_report_query), _user=RequireTeacherOrAdmin
+):
+    """Download the events of a report as CSV, with the filters of etl_get_rapport."""
+    if not ServiceEtlReport.exists(name):
+        return _legacy_report(name)
+    return StreamingResponse(
+        ServiceEtlReport.export_csv(query),
+        media_type="text/csv; charset=utf-8",
+        headers={"Content-Disposition": _attachment(name)},
+    )
@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import ORJSONResponse
+from pymongo.errors import PyMongoError
+
+from services.mongo import ServiceMongo
+from services.secure import require_roles
+
+router = APIRouter(prefix="/health", tags=["health"])
+RequireAdmin = Depends(require_roles({"admin"}))
+
+
+@router.get("/db", name="health_db")
+def health_db(_user=RequireAdmin) -> ORJSONResponse:
+    """Get the round-trip time to MongoDB and the connection pools of this worker."""
+    try:
+        health = ServiceMongo.health()
+    except PyMongoError as e:
+        return ORJSONResponse(
+            content={"status": "error", "message": str(e)}, status_code=503
+        )
+    return ORJSONResponse(content=health)
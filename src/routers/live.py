@@ -0,0 +1,85 @@
+from fastapi import APIRouter, Body, Depends, HTTPException, Request, WebSocket
+from fastapi.responses import ORJSONResponse
+
+from models.live import LiveSessionCreator
+from services.live import LiveClient, LiveError, LiveSession, ServiceLive
+from services.secure import require_roles, require_socket_roles, require_socket_user
+from services.util import handle_request_success
+
+router = APIRouter(
+    prefix="/live",
+)
+RequireTeacherOrAdmin = Depends(require_roles({"teacher", "admin"}))
+SocketTeacherOrAdmin = Depends(require_socket_roles({"teacher", "admin"}))
+
+
+def _get_session(session: str, owner: str | None = None) -> LiveSession:
+    try:
+        return ServiceLive.get(session, owner)
+    except LiveError as e:
+        raise HTTPException(e.status_code, str(e)) from e
+
+
+@router.post("/sessions", tags=["live"], name="create_live_session", status_code=201)
+async def create_session(
+    request: Request,
+    data: LiveSessionCreator = Body(...),
+    user=RequireTeacherOrAdmin,
+) -> ORJSONResponse:
+    try:
+        session = await ServiceLive.create(data.quiz_id, user["username"])
+    except LiveError as e:
+        raise HTTPException(e.status_code, str(e)) from e
+    return handle_request_success(request=request, data=session.state(), status_code=201)
+
+
+@router.get("/{session}", tags=["live"], name="live_session")
+async def get_session(
+    session: str, request: Request, user=RequireTeacherOrAdmin
+) -> ORJSONResponse:
+    return handle_request_success(
+        request=request, data=_get_session(session, user["username"]).state()
+    )
+
+
+@router.post("/{session}/next", tags=["live"], name="live_next_question")
+async def next_question(
+    session: str, request: Request, user=RequireTeacherOrAdmin
+) -> ORJSONResponse:
+    live = _get_session(session, user["username"])
+    try:
+        live.next()
+    except LiveError as e:
+        raise HTTPException(e.status_code, str(e)) from e
+    return handle_request_success(request=request, data=live.state())
+
+
+@router.post("/{session}/close", tags=["live"], name="close_live_session")
+async def close_session(
+    session: str, request: Request, user=RequireTeacherOrAdmin
+) -> ORJSONResponse:
+    try:
+        state = ServiceLive.close(session, user["username"])
+    except LiveError as e:
+        raise HTTPException(e.status_code, str(e)) from e
+    return handle_request_success(request=request, data=state)
+
+
+@router.websocket("/{session}/ws")
+async def student_socket(
+    session: str, websocket: WebSocket, user=Depends(require_socket_user)
+) -> None:
+    live = ServiceLive.sessions.get(session)
+    if live is None:
+        await websocket.close(code=1008, reason="Session introuvable")
+        return
+    await ServiceLive.serve(live, LiveClient(websocket, user["username"], "student"))
+
+
+@router.websocket("/{session}/teacher")
+async def teacher_socket(session: str, websocket: WebSocket, user=SocketTeacherOrAdmin) -> None:
+    live = ServiceLive.sessions.get(session)
+    if live is None or live.owner != user["username"]:
+        await websocket.close(code=1008, reason="Session introuvable")
+        return
+    await ServiceLive.serve(live, LiveClient(websocket, user["username"], "teacher"))
@@ -1,20 +1,51 @@
-from fastapi import APIRouter, Request, Body
-from fastapi.responses import ORJSONResponse
+from datetime import timezone
+from email.utils import format_datetime
+
+from fastapi import APIRouter, BackgroundTasks, Request, Body, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
 
 from models.question import QuestionModel, QuestionEditor, QuestionCreator
+from services.attachment import Attachment, AttachmentError, ServiceAttachment
 from services.question import ServiceQuestion
-from services.util import handle_request_success
+from services.secure import require_roles, require_session_user
+from services.upload import UploadError
+from services.stats import ServiceStats
+from services.util import handle_request_bytes, handle_request_success
 
 router = APIRouter(
     prefix="/questions",
 )
+RequireTeacherOrAdmin = Depends(require_roles({"teacher", "admin"}))
 
 
 @router.get("/", tags=["questions"], name="questions")
-async def get_questions(request: Request) -> ORJSONResponse:
-    questions = ServiceQuestion.list_all()
-    questions = [question.model_dump() for question in questions]
-    return handle_request_success(request=request, data={"questions": questions})
+def get_questions(
+    request: Request,
+    skip: int = Query(0, ge=0),
+    limit: int | None = Query(None, ge=1, le=5000),
+) -> Response:
+    return handle_request_bytes(
+        request=request, content=ServiceQuestion.list_all_json(skip, limit)
+    )
+
+
+@router.get("/changes", tags=["questions"], name="question_changes")
+def get_question_changes(
+    request: Request,
+    since: int = Query(0, ge=0),
+    limit: int = Query(1000, ge=1, le=5000),
+    _user=RequireTeacherOrAdmin,
+) -> ORJSONResponse:
+    questions, token, more = ServiceQuestion.changes(since, limit)
+    return handle_request_success(
+        request=request,
+        data={
+            "questions": [question.model_dump() for question in questions],
+            "token": token,
+            "more": more,
+        },
+    )
 
 
 @router.post("/create", tags=["questions"], name="create_question")
@@ -48,3 +79,144 @@ async def edit_question(
         request=request,
         data={"success": True, "message": "Question modifiée avec succès!"},
     )
+
+
+@router.get("/{question}/stats", tags=["questions"], name="question_stats")
+def get_question_stats(
+    question: str, request: Request, _user=RequireTeacherOrAdmin
+) -> ORJSONResponse:
+    stats = ServiceStats.question(question)
+    if stats is None:
+        raise HTTPException(404, "Aucune tentative pour cette question")
+    return handle_request_success(request=request, data=stats)
+
+
+@router.post(
+    "/{question}/attachments",
+    tags=["questions"],
+    name="add_attachment",
+    status_code=201,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "required": ["file"],
+                        "properties": {
+                            "file": {
+                                "type": "string",
+                                "format": "binary",
+                                "description": "PNG, JPEG, GIF, WebP, MP3, OGG, WAV, WebM or MP4 audio",
+                            }
+                        },
+                    }
+                }
+            },
+        }
+    },
+)
+async def add_attachment(
+    question: str,
+    request: Request,
+    background: BackgroundTasks,
+    _user=RequireTeacherOrAdmin,
+) -> ORJSONResponse:
+    # streamed to disk then to GridFS, the thumbnail is made after the response
+    try:
+        attachment = await ServiceAttachment.upload(request, "file", question)
+    except (UploadError, AttachmentError) as e:
+        raise HTTPException(e.status_code, str(e)) from e
+    background.add_task(ServiceAttachment.make_thumbnail, attachment)
+    return handle_request_success(
+        request=request,
+        data={"success": True, "attachment": attachment},
+        status_code=201,
+    )
+
+
+def _attachment_response(request: Request, attachment: Attachment) -> Response:
+    file = attachment.file
+    headers = {
+        "ETag": attachment.etag,
+        # an id always names the same bytes
+        "Cache-Control": "private, max-age=31536000, immutable",
+        "Last-Modified": format_datetime(
+            file.upload_date.replace(tzinfo=timezone.utc), usegmt=True
+        ),
+        "Accept-Ranges": "bytes",
+    }
+    if_none_match = request.headers.get("if-none-match", "")
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    if attachment.etag in tags or "*" in tags:
+        file.close()
+        return Response(status_code=304, headers=headers)
+    header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if if_range is not None and if_range != attachment.etag:
+        header = None  # the client holds other bytes, send it all
+    try:
+        byte_range = ServiceAttachment.parse_range(header, attachment.size)
+    except AttachmentError as e:
+        file.close()
+        return Response(
+            status_code=e.status_code,
+            headers={**headers, "Content-Range": f"bytes */{attachment.size}"},
+        )
+    status_code = 200
+    start, end = 0, attachment.size - 1
+    if byte_range is not None:
+        status_code = 206
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{attachment.size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        ServiceAttachment.read(file, start, end),
+        status_code=status_code,
+        media_type=attachment.content_type,
+        headers=headers,
+    )
+
+
+@router.get("/{question}/attachments/{attachment}", tags=["questions"], name="get_attachment")
+async def get_attachment(
+    question: str, attachment: str, request: Request, _user=Depends(require_session_user)
+) -> Response:
+    try:
+        opened = await run_in_threadpool(ServiceAttachment.open, question, attachment)
+    except AttachmentError as e:
+        raise HTTPException(e.status_code, str(e)) from e
+    return _attachment_response(request, opened)
+
+
+@router.get(
+    "/{question}/attachments/{attachment}/thumbnail",
+    tags=["questions"],
+    name="get_attachment_thumbnail",
+)
+async def get_attachment_thumbnail(
+    question: str, attachment: str, request: Request, _user=Depends(require_session_user)
+) -> Response:
+    # 404 until the thumbnail is made, or for files that have none
+    try:
+        opened = await run_in_threadpool(ServiceAttachment.open, question, attachment, True)
+    except AttachmentError as e:
+        raise HTTPException(e.status_code, str(e)) from e
+    return _attachment_response(request, opened)
+
+
+@router.delete(
+    "/{question}/attachments/{attachment}", tags=["questions"], name="delete_attachment"
+)
+def delete_attachment(
+    question: str, attachment: str, request: Request, _user=RequireTeacherOrAdmin
+) -> ORJSONResponse:
+    try:
+        ServiceAttachment.delete(question, attachment)
+    except AttachmentError as e:
+        raise HTTPException(e.status_code, str(e)) from e
+    return handle_request_success(
+        request=request,
+        data={"success": True, "message": "Pièce jointe supprimée"},
+    )
@@ -1,20 +1,43 @@
-from fastapi import APIRouter, Request
-from fastapi.responses import ORJSONResponse
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse, Response
 
+from models.attempt import AttemptResult, AttemptSubmission, BulkAttemptSubmission
 from models.quiz import QuizGenerator
-from services.quiz import ServiceQuiz
-from services.util import handle_request_success
+from services.attempt import AttemptError, ServiceAttempt
+from services.quiz import Paper, ServiceQuiz
+from services.secure import require_roles, require_session_user
+from services.stats import ServiceStats
+from services.variant import ServiceVariant
+from services.util import handle_request_bytes, handle_request_success
 
 router = APIRouter(
     prefix="/quizs",
 )
+RequireTeacherOrAdmin = Depends(require_roles({"teacher", "admin"}))
 
 
 @router.get("/", tags=["quizs"], name="quizs")
-async def get_quizs(request: Request) -> ORJSONResponse:
-    quizs = ServiceQuiz.list_all()
-    quizs = [quiz.model_dump() for quiz in quizs]
-    return handle_request_success(request=request, data={"quizs": quizs})
+def get_quizs(request: Request, _user=RequireTeacherOrAdmin) -> Response:
+    return handle_request_bytes(request=request, content=ServiceQuiz.list_all_json())
+
+
+@router.get("/changes", tags=["quizs"], name="quiz_changes")
+def get_quiz_changes(
+    request: Request,
+    since: int = Query(0, ge=0),
+    limit: int = Query(1000, ge=1, le=5000),
+    _user=RequireTeacherOrAdmin,
+) -> ORJSONResponse:
+    quizs, token, more = ServiceQuiz.changes(since, limit)
+    return handle_request_success(
+        request=request,
+        data={
+            "quizs": [quiz.model_dump() for quiz in quizs],
+            "token": token,
+            "more": more,
+        },
+    )
 
 
 @router.post("/generate", tags=["quizs"])
@@ -23,6 +46,7 @@ async def generate_quiz(params: QuizGenerator, request: Request) -> ORJSONRespon
         total_questions=params.total_questions,
         subjects=params.subjects,
         use=params.use,
+        sampling=params.sampling,
     )
     return handle_request_success(
         request=request,
@@ -30,10 +54,132 @@ async def generate_quiz(params: QuizGenerator, request: Request) -> ORJSONRespon
     )
 
 
+async def _get_paper(quiz: str) -> Paper:
+    # served from memory once read, Mongo is only hit by the first request of a worker
+    paper = ServiceQuiz.cached_paper(quiz) or await run_in_threadpool(ServiceQuiz.paper, quiz)
+    if paper is None:
+        raise HTTPException(404, "Quiz introuvable")
+    if not paper.active:
+        raise HTTPException(409, "Quiz archivé")
+    return paper
+
+
+def _paper_response(request: Request, content: bytes, etag: str) -> Response:
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    if etag in tags or "*" in tags:
+        return Response(status_code=304, headers=headers)
+    return handle_request_bytes(request=request, content=content, headers=headers)
+
+
+@router.get("/{quiz}/paper", tags=["quizs"], name="quiz_paper")
+async def get_quiz_paper(
+    quiz: str, request: Request, _user=Depends(require_session_user)
+) -> Response:
+    paper = await _get_paper(quiz)
+    return _paper_response(request, paper.content, paper.etag)
+
+
+@router.get("/{quiz}/variant", tags=["quizs"], name="quiz_variant")
+async def get_quiz_variant(
+    quiz: str, request: Request, user=Depends(require_session_user)
+) -> Response:
+    paper = await _get_paper(quiz)
+    seed = ServiceVariant.seed(quiz, user["username"])
+    variant = ServiceVariant.permute(
+        seed, tuple(len(q["responses"]) for q in paper.document["questions"])
+    )
+    return _paper_response(
+        request, ServiceVariant.paper(paper.document, variant), f'{paper.etag[:-1]}-{seed:x}"'
+    )
+
+
 @router.post("/{quiz}/archive", tags=["quizs"])
 async def archive_quiz(quiz: str, request: Request) -> ORJSONResponse:
     ServiceQuiz.archive(quiz_id=quiz)
+    ServiceAttempt.forget(quiz_id=quiz)
     return handle_request_success(
         request=request,
         data={"success": True, "message": f"Successfully archived quiz with id {quiz}"},
     )
+
+
+@router.post("/{quiz}/attempts", tags=["quizs"], name="submit_attempt", status_code=201)
+async def submit_attempt(
+    quiz: str,
+    request: Request,
+    data: AttemptSubmission = Body(...),
+    user=Depends(require_session_user),
+) -> ORJSONResponse:
+    try:
+        attempt = await ServiceAttempt.submit(
+            quiz, user["username"], data.answers, data.variant
+        )
+    except AttemptError as e:
+        raise HTTPException(e.status_code, str(e)) from e
+    return handle_request_success(
+        request=request,
+        data=AttemptResult.model_validate(attempt).model_dump(),
+        status_code=201,
+    )
+
+
+@router.post(
+    "/{quiz}/attempts/bulk", tags=["quizs"], name="submit_attempts", status_code=201
+)
+def submit_attempts(
+    quiz: str,
+    request: Request,
+    data: BulkAttemptSubmission = Body(...),
+    _user=RequireTeacherOrAdmin,
+) -> ORJSONResponse:
+    try:
+        attempts = ServiceAttempt.submit_many(
+            quiz, [(a.student, a.answers, a.variant) for a in data.attempts]
+        )
+    except AttemptError as e:
+        raise HTTPException(e.status_code, str(e)) from e
+    return handle_request_success(
+        request=request,
+        data={
+            "attempts": [
+                AttemptResult.model_validate(attempt).model_dump() for attempt in attempts
+            ]
+        },
+        status_code=201,
+    )
+
+
+@router.get("/{quiz}/attempts", tags=["quizs"], name="attempts")
+def get_attempts(
+    quiz: str,
+    request: Request,
+    limit: int = Query(100, ge=1, le=1000),
+    _user=RequireTeacherOrAdmin,
+) -> ORJSONResponse:
+    try:
+        attempts = ServiceAttempt.list_for_quiz(quiz, limit)
+    except AttemptError as e:
+        raise HTTPException(e.status_code, str(e)) from e
+    return handle_request_success(
+        request=request,
+        data={
+            "attempts": [
+                AttemptResult.model_validate(attempt).model_dump() for attempt in attempts
+            ]
+        },
+    )
+
+
+@router.get("/{quiz}/stats", tags=["quizs"], name="quiz_stats")
+def get_quiz_stats(
+    quiz: str, request: Request, _user=RequireTeacherOrAdmin
+) -> ORJSONResponse:
+    try:
+        key = ServiceAttempt.answer_key(quiz)
+    except AttemptError as e:
+        raise HTTPException(e.status_code, str(e)) from e
+    return handle_request_success(
+        request=request, data=ServiceStats.quiz(quiz, list(key.questions))
+    )
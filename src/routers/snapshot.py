@@ -0,0 +1,47 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, ORJSONResponse
+
+from services.secure import require_roles
+from services.snapshot import ServiceSnapshot, SnapshotError
+from services.util import handle_request_success
+
+router = APIRouter(
+    prefix="/snapshots",
+)
+RequireAdmin = Depends(require_roles({"admin"}))
+
+
+@router.post("/", tags=["snapshots"], name="create_snapshot", status_code=201)
+async def create_snapshot(
+    request: Request,
+    full: bool = Query(False),  # noqa: FBT001, FBT003
+    _user=RequireAdmin,
+) -> ORJSONResponse:
+    # changes since the last snapshot unless full, see ServiceSnapshot
+    manifest = await run_in_threadpool(ServiceSnapshot.export, full)
+    return handle_request_success(request=request, data=manifest, status_code=201)
+
+
+@router.get("/", tags=["snapshots"], name="snapshots")
+def get_snapshots(request: Request, _user=RequireAdmin) -> ORJSONResponse:
+    return handle_request_success(request=request, data={"snapshots": ServiceSnapshot.list_all()})
+
+
+@router.get("/{snapshot}", tags=["snapshots"], name="snapshot")
+def get_snapshot(snapshot: str, request: Request, _user=RequireAdmin) -> ORJSONResponse:
+    try:
+        manifest = ServiceSnapshot.get(snapshot)
+    except SnapshotError as e:
+        raise HTTPException(e.status_code, str(e)) from e
+    return handle_request_success(request=request, data=manifest)
+
+
+@router.get("/{snapshot}/files/{path:path}", tags=["snapshots"], name="snapshot_file")
+def get_snapshot_file(snapshot: str, path: str, _user=RequireAdmin) -> FileResponse:
+    # paths are the "files" of the manifest
+    try:
+        file = ServiceSnapshot.file(snapshot, path)
+    except SnapshotError as e:
+        raise HTTPException(e.status_code, str(e)) from e
+    return FileResponse(file, media_type="application/vnd.apache.parquet")
@@ -0,0 +1,65 @@
+from fastapi import APIRouter, Body, Depends, HTTPException, Request
+from fastapi.responses import ORJSONResponse
+
+from models.taxonomy import AliasCreator, CanonicalCreator, TaxonomyEntry, TaxonomyField
+from services.secure import require_roles
+from services.taxonomy import ServiceTaxonomy
+from services.util import handle_request_success
+
+router = APIRouter(prefix="/taxonomy", tags=["taxonomy"])
+RequireAdmin = Depends(require_roles({"admin"}))
+
+
+@router.get("/{field}", name="taxonomy")
+def get_taxonomy(
+    field: TaxonomyField, request: Request, _user=RequireAdmin
+) -> ORJSONResponse:
+    entries = [
+        TaxonomyEntry.model_validate(entry).model_dump()
+        for entry in ServiceTaxonomy.list_field(field)
+    ]
+    return handle_request_success(request=request, data={"entries": entries})
+
+
+@router.post("/{field}", name="create_canonical")
+def create_canonical(
+    field: TaxonomyField,
+    request: Request,
+    data: CanonicalCreator = Body(...),
+    _user=RequireAdmin,
+) -> ORJSONResponse:
+    ServiceTaxonomy.add_canonical(field, data.name.strip())
+    return handle_request_success(
+        request=request,
+        data={"success": True, "message": f"Valeur canonique '{data.name}' ajoutée"},
+    )
+
+
+@router.post("/{field}/aliases", name="create_alias")
+def create_alias(
+    field: TaxonomyField,
+    request: Request,
+    data: AliasCreator = Body(...),
+    _user=RequireAdmin,
+) -> ORJSONResponse:
+    alias, canonical = data.alias.strip(), data.canonical.strip()
+    if not ServiceTaxonomy.exists(field, canonical):
+        raise HTTPException(404, f"Valeur canonique '{canonical}' introuvable")
+    if ServiceTaxonomy.exists(field, alias):
+        raise HTTPException(409, f"'{alias}' est déjà une valeur canonique")
+    ServiceTaxonomy.set_alias(field, alias, canonical, "admin")
+    return handle_request_success(
+        request=request,
+        data={"success": True, "message": f"Alias '{data.alias}' -> '{canonical}'"},
+    )
+
+
+@router.delete("/{field}/aliases/{alias}", name="delete_alias")
+def delete_alias(
+    field: TaxonomyField, alias: str, request: Request, _user=RequireAdmin
+) -> ORJSONResponse:
+    if not ServiceTaxonomy.delete_alias(field, alias):
+        raise HTTPException(404, f"Alias '{alias}' introuvable")
+    return handle_request_success(
+        request=request, data={"success": True, "message": f"Alias '{alias}' supprimé"}
+    )
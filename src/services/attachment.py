@@ -0,0 +1,246 @@
+"""Service for handling media attachments of questions, stored in GridFS."""
+
+import hashlib
+import io
+import re
+import tempfile
+import uuid
+from collections.abc import Iterator
+from pathlib import Path
+from typing import NamedTuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+from gridfs import GridFSBucket, NoFile
+from gridfs.grid_file import GridOut
+
+from services.log import ServiceLog
+from services.mongo import ServiceMongo
+from services.question import ServiceQuestion
+from services.upload import StoredUpload, receive_upload
+from services.util import ServiceUtil
+
+BUCKET = "attachments"
+MAX_UPLOAD_MB = 20
+THUMBNAIL_SIZE = (320, 320)
+UPLOAD_DIR = Path(tempfile.gettempdir()) / "miskatonic-attachments"
+
+# accepted content types and the first bytes of their files
+SIGNATURES = {
+    "image/png": [b"\x89PNG\r\n\x1a\n"],
+    "image/jpeg": [b"\xff\xd8\xff"],
+    "image/gif": [b"GIF87a", b"GIF89a"],
+    "image/webp": [b"RIFF"],
+    "audio/mpeg": [b"ID3", b"\xff\xfb", b"\xff\xf3", b"\xff\xf2"],
+    "audio/ogg": [b"OggS"],
+    "audio/wav": [b"RIFF"],
+    "audio/webm": [b"\x1a\x45\xdf\xa3"],
+    "audio/mp4": [b"\x00\x00\x00"],
+}
+RANGE = re.compile(r"bytes=(\d*)-(\d*)")
+
+
+class AttachmentError(ValueError):
+    """Attachment request refused, {status_code} is the HTTP status to answer with."""
+
+    def __init__(self, message: str, status_code: int = 400) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class Attachment(NamedTuple):
+    """Attachment opened for reading, with what its response headers need."""
+
+    file: GridOut
+    content_type: str
+    etag: str
+    size: int
+
+
+class ServiceAttachment:
+    """Static class for handling attachments.
+
+    Files go to the GridFS bucket "attachments" with their question, content
+    type and sha256 in their metadata; questions only hold their ids. Files
+    never change once stored, so their sha256 is a strong ETag and clients
+    may keep them. Thumbnails of images are stored as files of their own,
+    referenced by metadata.thumbnail of their image.
+    """
+
+    @staticmethod
+    def get_bucket() -> GridFSBucket:
+        """Get the GridFS bucket of attachments."""
+        return GridFSBucket(ServiceMongo.get_database(), bucket_name=BUCKET)
+
+    @staticmethod
+    def check(filename: str, content_type: str, head: bytes) -> str | None:  # noqa: ARG004
+        """Check the content type and first bytes of an upload, return why it is
+        rejected or None.
+        """
+        signatures = SIGNATURES.get(content_type)
+        if signatures is None:
+            return f"Type de fichier non accepté: {content_type or 'inconnu'}"
+        if not any(head.startswith(signature) for signature in signatures):
+            return f"Contenu invalide pour un fichier {content_type}"
+        return None
+
+    @staticmethod
+    def upload_name(filename: str) -> str:
+        """Get the name of the temporary file of upload {filename}."""
+        return f"{uuid.uuid4().hex}{Path(filename).suffix.lower()}"
+
+    @classmethod
+    async def upload(cls, request: Request, field: str, question_id: str) -> str:
+        """Stream file {field} of {request} to GridFS and attach it to question
+        {question_id}, get its id.
+        """
+        if not ObjectId.is_valid(question_id):
+            raise AttachmentError("Question introuvable", 404)
+        max_mb = int(ServiceUtil.get_env("ATTACHMENT_MAX_MB", str(MAX_UPLOAD_MB)) or MAX_UPLOAD_MB)
+        upload = await receive_upload(
+            request,
+            field,
+            UPLOAD_DIR,
+            name_fn=cls.upload_name,
+            max_bytes=max_mb * 2**20,
+            check=cls.check,
+        )
+        attachment_id = await run_in_threadpool(cls.store, question_id, upload)
+        if not await run_in_threadpool(ServiceQuestion.attach, question_id, attachment_id):
+            await run_in_threadpool(cls.get_bucket().delete, ObjectId(attachment_id))
+            raise AttachmentError("Question introuvable", 404)
+        return attachment_id
+
+    @classmethod
+    def store(cls, question_id: str, upload: StoredUpload) -> str:
+        """Copy a received {upload} to GridFS for question {question_id}, get its id."""
+        try:
+            with upload.path.open("rb") as source:
+                file_id = cls.get_bucket().upload_from_stream(
+                    upload.filename,
+                    source,
+                    metadata={
+                        "question_id": question_id,
+                        "content_type": upload.content_type,
+                        "sha256": upload.sha256,
+                    },
+                )
+        finally:
+            upload.path.unlink(missing_ok=True)
+        return str(file_id)
+
+    @classmethod
+    def open(cls, question_id: str, attachment_id: str, thumbnail: bool = False) -> Attachment:  # noqa: FBT001, FBT002
+        """Open attachment {attachment_id} of question {question_id}, or its thumbnail."""
+        try:
+            file = cls.get_bucket().open_download_stream(ObjectId(attachment_id))
+        except (InvalidId, NoFile) as e:
+            raise AttachmentError("Pièce jointe introuvable", 404) from e
+        metadata = file.metadata or {}
+        if metadata.get("question_id") != question_id:
+            file.close()
+            raise AttachmentError("Pièce jointe introuvable", 404)
+        if thumbnail:
+            file.close()
+            if "thumbnail" not in metadata:
+                raise AttachmentError("Miniature indisponible", 404)
+            try:
+                file = cls.get_bucket().open_download_stream(metadata["thumbnail"])
+            except NoFile as e:
+                raise AttachmentError("Miniature indisponible", 404) from e
+            metadata = file.metadata or {}
+        return Attachment(
+            file=file,
+            content_type=metadata.get("content_type", "application/octet-stream"),
+            etag=f'"{metadata["sha256"][:32]}"',
+            size=file.length,
+        )
+
+    @staticmethod
+    def parse_range(header: str | None, size: int) -> tuple[int, int] | None:
+        """Get the first and last byte of a single Range {header}, None to send it all.
+
+        Several ranges are answered with the whole file, which is allowed.
+        """
+        if not header or "," in header:
+            return None
+        match = RANGE.fullmatch(header.strip())
+        if match is None or match.groups() == ("", ""):
+            return None
+        first, last = match.groups()
+        if first == "":
+            start, end = max(size - int(last), 0), size - 1
+        else:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+        if start > end or start >= size:
+            raise AttachmentError("Plage non satisfaisable", 416)
+        return start, end
+
+    @staticmethod
+    def read(file: GridOut, start: int, end: int) -> Iterator[bytes]:
+        """Read bytes {start} to {end} of {file}, one GridFS chunk at a time."""
+        file.seek(start)
+        remaining = end - start + 1
+        try:
+            while remaining > 0:
+                data = file.read(min(file.chunk_size, remaining))
+                if not data:
+                    break
+                remaining -= len(data)
+                yield data
+        finally:
+            file.close()
+
+    @classmethod
+    def delete(cls, question_id: str, attachment_id: str) -> None:
+        """Delete attachment {attachment_id} of question {question_id} and its thumbnail."""
+        attachment = cls.open(question_id, attachment_id)
+        thumbnail = (attachment.file.metadata or {}).get("thumbnail")
+        attachment.file.close()
+        ServiceQuestion.detach(question_id, attachment_id)
+        bucket = cls.get_bucket()
+        bucket.delete(ObjectId(attachment_id))
+        if thumbnail is not None:
+            bucket.delete(thumbnail)
+
+    @classmethod
+    def make_thumbnail(cls, attachment_id: str) -> None:
+        """Store the thumbnail of image {attachment_id}, run after its upload.
+
+        Needs Pillow; without it, or for other files, nothing is done.
+        """
+        try:
+            from PIL import Image  # noqa: PLC0415
+        except ImportError:
+            ServiceLog.send_info("Pillow absent, pas de miniature")
+            return
+        bucket = cls.get_bucket()
+        with bucket.open_download_stream(ObjectId(attachment_id)) as file:
+            metadata = file.metadata or {}
+            if not metadata.get("content_type", "").startswith("image/"):
+                return
+            try:
+                with Image.open(file) as image:
+                    image.thumbnail(THUMBNAIL_SIZE)
+                    out = io.BytesIO()
+                    image.save(out, format="PNG")
+            except OSError as e:
+                ServiceLog.send_exception(f"Miniature de {attachment_id} impossible", e)
+                return
+        content = out.getvalue()
+        thumbnail_id = bucket.upload_from_stream(
+            f"thumbnail_{file.filename}.png",
+            content,
+            metadata={
+                "question_id": metadata["question_id"],
+                "content_type": "image/png",
+                "sha256": hashlib.sha256(content).hexdigest(),
+                "thumbnail_of": file._id,
+            },
+        )
+        ServiceMongo.get_collection(f"{BUCKET}.files").update_one(
+            {"_id": file._id}, {"$set": {"metadata.thumbnail": thumbnail_id}}
+        )
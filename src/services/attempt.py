@@ -0,0 +1,308 @@
+"""Service for handling quiz attempts and their grading."""
+
+import asyncio
+import contextlib
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, NamedTuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi.concurrency import run_in_threadpool
+from pymongo import ASCENDING, DESCENDING
+
+from models.question import QuestionModel
+from services.cache import ServiceCache
+from services.changes import ServiceChanges
+from services.log import ServiceLog
+from services.mongo import ServiceMongo
+from services.quiz import ServiceQuiz
+from services.stats import ServiceStats
+from services.variant import ServiceVariant, VariantError
+
+if TYPE_CHECKING:
+    from pymongo.collection import Collection
+
+COLLECTION = "attempts"
+BATCH_SIZE = 500  # attempts written by one insert_many
+BATCH_DELAY = 0.002  # seconds an attempt waits for others before being written
+KEY_CACHE_SIZE = 1024
+
+
+class AttemptError(ValueError):
+    """Attempt refused, {status_code} is the HTTP status to answer with."""
+
+    def __init__(self, message: str, status_code: int = 400) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class AnswerKey(NamedTuple):
+    """Answer key of a quiz: per question, the mask of the correct responses,
+    the number of responses and the question id, and the cache version it was
+    read at. Archived quizzes are not active.
+    """
+
+    masks: tuple[int, ...]
+    counts: tuple[int, ...]
+    questions: tuple[str, ...]
+    active: bool
+    version: int
+
+
+class ServiceAttempt:
+    """Static class for handling attempts.
+
+    Answer keys are read once per quiz and kept in memory until the "quizs"
+    namespace of ServiceCache is bumped, e.g. when a quiz is archived. Attempts submitted one by one are queued and
+    written together with insert_many by a background task, and each request
+    returns once its batch is written.
+    """
+
+    keys: "OrderedDict[str, AnswerKey]" = OrderedDict()
+    queue: asyncio.Queue | None = None
+    writer: asyncio.Task | None = None
+
+    @staticmethod
+    def get_collection() -> "Collection":
+        """Get the collection of attempts."""
+        return ServiceMongo.get_collection(COLLECTION)
+
+    @classmethod
+    def start(cls) -> None:
+        """Create the indexes and start the task writing attempts."""
+        cls.get_collection().create_index(
+            [("quiz_id", ASCENDING), ("date_submission", DESCENDING)]
+        )
+        cls.get_collection().create_index([("student", ASCENDING)])
+        cls.queue = asyncio.Queue()
+        cls.writer = asyncio.create_task(cls._write_batches())
+
+    @classmethod
+    async def stop(cls) -> None:
+        """Write the queued attempts and stop the writer task."""
+        if cls.writer is None:
+            return
+        await cls.queue.join()
+        cls.writer.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await cls.writer
+        cls.writer = None
+
+    @classmethod
+    def cached_key(cls, quiz_id: str) -> AnswerKey | None:
+        """Get the answer key of quiz {quiz_id} if this worker holds it, still current."""
+        key = cls.keys.get(quiz_id)
+        if key is None or key.version != ServiceCache.version("quizs"):
+            return None
+        cls.keys.move_to_end(quiz_id)
+        return key
+
+    @classmethod
+    def answer_key(cls, quiz_id: str) -> AnswerKey:
+        """Get the answer key of quiz {quiz_id}, see AnswerKey.
+
+        Quizzes generated before answer keys existed get theirs computed and stored.
+        """
+        cached = cls.cached_key(quiz_id)
+        if cached is not None:
+            return cached
+        try:
+            oid = ObjectId(quiz_id)
+        except InvalidId as e:
+            raise AttemptError("Quiz introuvable", 404) from e
+        version = ServiceCache.version("quizs")
+        quizs = ServiceMongo.get_collection("quizs")
+        quiz = quizs.find_one(
+            {"_id": oid},
+            {
+                "answer_key": 1,
+                "answer_counts": 1,
+                "active": 1,
+                "questions.id": 1,
+                "questions._id": 1,
+            },
+        )
+        if quiz is None:
+            raise AttemptError("Quiz introuvable", 404)
+        if "answer_key" not in quiz:
+            questions = quizs.find_one({"_id": oid}, {"questions": 1})["questions"]
+            key, counts = ServiceQuiz.answer_key(
+                [QuestionModel.model_validate(q) for q in questions]
+            )
+            with ServiceChanges.stamping("quizs") as (stamp,):
+                quizs.update_one(
+                    {"_id": oid},
+                    {"$set": {"answer_key": key, "answer_counts": counts, **stamp}},
+                )
+            quiz.update(answer_key=key, answer_counts=counts)
+            ServiceCache.bump("quizs")
+        cached = AnswerKey(
+            masks=tuple(quiz["answer_key"]),
+            counts=tuple(quiz["answer_counts"]),
+            # questions sampled without an id are only known within their quiz
+            questions=tuple(
+                str(q.get("id") or q.get("_id") or f"{quiz_id}:{n}")
+                for n, q in enumerate(quiz.get("questions", []))
+            ),
+            active=quiz.get("active", True),
+            version=version,
+        )
+        cls.keys[quiz_id] = cached
+        if len(cls.keys) > KEY_CACHE_SIZE:
+            cls.keys.popitem(last=False)
+        return cached
+
+    @staticmethod
+    def grade(
+        key: tuple[int, ...], counts: tuple[int, ...], answers: list[list[int]]
+    ) -> tuple[list[int], list[bool]]:
+        """Get the bitmask of each answer and whether it matches the key."""
+        if len(answers) != len(key):
+            raise AttemptError(f"{len(key)} réponses attendues, {len(answers)} reçues")
+        masks = []
+        for n, (chosen, count) in enumerate(zip(answers, counts, strict=True)):
+            mask = 0
+            for i in chosen:
+                if not 0 <= i < count:
+                    raise AttemptError(f"Réponse {i} invalide pour la question {n + 1}")
+                mask |= 1 << i
+            masks.append(mask)
+        return masks, [mask == expected for mask, expected in zip(masks, key, strict=True)]
+
+    @classmethod
+    def forget(cls, quiz_id: str) -> None:
+        """Drop the answer key of quiz {quiz_id} cached by this worker, e.g. once
+        archived; the other workers drop theirs with the "quizs" version.
+        """
+        cls.keys.pop(quiz_id, None)
+
+    @classmethod
+    def build(
+        cls,
+        quiz_id: str,
+        key: AnswerKey,
+        student: str,
+        answers: list[list[int]],
+        variant: bool = False,  # noqa: FBT001, FBT002
+    ) -> dict:
+        """Grade the {answers} of {student} against {key}, get the attempt document.
+
+        With {variant}, answers follow the variant of the student and are put
+        back in the order of the quiz first; the document keeps its seed.
+        """
+        if not key.active:
+            raise AttemptError("Quiz archivé", 409)
+        seed = None
+        if variant:
+            seed = ServiceVariant.seed(quiz_id, student)
+            try:
+                answers = ServiceVariant.to_base(ServiceVariant.permute(seed, key.counts), answers)
+            except VariantError as e:
+                raise AttemptError(str(e)) from e
+        masks, correct = cls.grade(key.masks, key.counts, answers)
+        attempt = {
+            "quiz_id": ObjectId(quiz_id),
+            "student": student,
+            "answers": masks,
+            "correct": correct,
+            "score": sum(correct),
+            "total": len(correct),
+            "date_submission": datetime.now(tz=timezone.utc),
+        }
+        if seed is not None:
+            attempt["seed"] = seed
+        return attempt
+
+    @classmethod
+    async def submit(
+        cls,
+        quiz_id: str,
+        student: str,
+        answers: list[list[int]],
+        variant: bool = False,  # noqa: FBT001, FBT002
+    ) -> dict:
+        """Grade and store one attempt, written in a batch with the concurrent ones."""
+        key = cls.cached_key(quiz_id) or await run_in_threadpool(cls.answer_key, quiz_id)
+        attempt = cls.build(quiz_id, key, student, answers, variant)
+        if cls.queue is None:
+            await run_in_threadpool(cls.store, [attempt])
+            return attempt
+        written = asyncio.get_running_loop().create_future()
+        cls.queue.put_nowait((attempt, written))
+        await written
+        return attempt
+
+    @classmethod
+    def submit_many(
+        cls, quiz_id: str, attempts: list[tuple[str, list[list[int]], bool]]
+    ) -> list[dict]:
+        """Grade and store the (student, answers, variant) {attempts} of quiz {quiz_id} at once.
+
+        Nothing is stored if one of them is refused.
+        """
+        key = cls.answer_key(quiz_id)
+        docs = []
+        for n, (student, answers, variant) in enumerate(attempts, start=1):
+            try:
+                docs.append(cls.build(quiz_id, key, student, answers, variant))
+            except AttemptError as e:
+                raise AttemptError(f"Tentative {n} ({student}): {e}", e.status_code) from e
+        cls.store(docs)
+        return docs
+
+    @classmethod
+    def store(cls, attempts: list[dict]) -> None:
+        """Insert graded {attempts} and add them to the statistics.
+
+        A failure of the statistics does not lose the attempts, the rebuild
+        command of services/stats.py brings them back in line.
+        """
+        cls.get_collection().insert_many(attempts, ordered=False)
+        try:
+            keys = {str(a["quiz_id"]): cls.answer_key(str(a["quiz_id"])) for a in attempts}
+            ServiceStats.record(attempts, keys)
+        except Exception as e:  # noqa: BLE001
+            ServiceLog.send_exception("Statistiques des tentatives non mises à jour", e)
+
+    @classmethod
+    def list_for_quiz(cls, quiz_id: str, limit: int) -> list[dict]:
+        """Get the last {limit} attempts of quiz {quiz_id}."""
+        try:
+            oid = ObjectId(quiz_id)
+        except InvalidId as e:
+            raise AttemptError("Quiz introuvable", 404) from e
+        return list(
+            ServiceMongo.get_list_collection(COLLECTION)
+            .find({"quiz_id": oid}, {"answers": 0})
+            .sort("date_submission", DESCENDING)
+            .limit(limit)
+        )
+
+    @classmethod
+    async def _write_batches(cls) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await cls.queue.get()]
+            deadline = loop.time() + BATCH_DELAY
+            while len(batch) < BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(cls.queue.get(), timeout))
+                except TimeoutError:
+                    break
+            try:
+                await run_in_threadpool(cls.store, [attempt for attempt, _ in batch])
+            except Exception as e:  # noqa: BLE001
+                for _, written in batch:
+                    if not written.done():
+                        written.set_exception(e)
+            else:
+                for _, written in batch:
+                    if not written.done():
+                        written.set_result(None)
+            finally:
+                for _ in batch:
+                    cls.queue.task_done()
@@ -0,0 +1,173 @@
+"""Service for caching serialized responses in process and in Redis."""
+
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+
+from redis import Redis, RedisError
+
+from services.log import ServiceLog
+from services.metrics import CACHE_LOOKUPS
+from services.util import ServiceUtil
+
+REDIS_RETRY_S = 5
+
+
+class ServiceCache:
+    """Static class for the two-tier response cache.
+
+    Values are response bodies, already serialized. Each worker keeps an LRU
+    bounded in bytes with a short TTL, in front of Redis which is shared by
+    the workers. Keys embed the version of their namespace (e.g. questions):
+    write paths bump it with bump(), so every cached value of the namespace
+    is left behind at once and expires on its own. Workers read versions
+    from Redis at most every CACHE_VERSION_TTL seconds, which bounds how
+    long another worker may serve a stale value. Without REDIS_URL, or when
+    Redis is down, only the local tier is used and versions are per worker.
+    A version never goes back: bumps made while Redis was down are pushed to
+    it once it answers again.
+    """
+
+    local: "OrderedDict[str, tuple[float, bytes]]" = OrderedDict()
+    local_bytes = 0
+    versions: dict[str, tuple[float, int]] = {}
+    building: dict[str, threading.Lock] = {}
+    lock = threading.Lock()
+    redis: Redis | None = None
+    redis_retry_at = 0.0
+    settings: dict[str, float] | None = None
+
+    @classmethod
+    def configure(cls) -> dict[str, float]:
+        """Read the settings and connect to Redis, on first use."""
+        if cls.settings is None:
+            url = ServiceUtil.get_env("REDIS_URL")
+            cls.redis = (
+                Redis.from_url(url, socket_timeout=0.25, socket_connect_timeout=0.25)
+                if url
+                else None
+            )
+            cls.settings = {
+                "ttl": float(ServiceUtil.get_env("CACHE_TTL", "300")),
+                "local_ttl": float(ServiceUtil.get_env("CACHE_LOCAL_TTL", "30")),
+                "local_max_bytes": float(ServiceUtil.get_env("CACHE_LOCAL_MAX_MB", "64")) * 2**20,
+                "version_ttl": float(ServiceUtil.get_env("CACHE_VERSION_TTL", "1")),
+            }
+        return cls.settings
+
+    @classmethod
+    def _redis_call(cls, method: str, *args, **kwargs):  # noqa: ANN206, ANN002, ANN003
+        """Call Redis {method}, or get None when Redis is not configured or fails.
+
+        After a failure, Redis is left alone for REDIS_RETRY_S seconds.
+        """
+        if cls.redis is None or time.monotonic() < cls.redis_retry_at:
+            return None
+        try:
+            return getattr(cls.redis, method)(*args, **kwargs)
+        except RedisError as e:
+            cls.redis_retry_at = time.monotonic() + REDIS_RETRY_S
+            ServiceLog.send_info(f"Cache Redis indisponible: {e}")
+            return None
+
+    @classmethod
+    def version(cls, namespace: str) -> int:
+        """Get the current version of {namespace}."""
+        settings = cls.configure()
+        now = time.monotonic()
+        known = cls.versions.get(namespace)
+        if known is not None and known[0] > now:
+            return known[1]
+        local = known[1] if known else 0
+        stored = cls._redis_call("get", f"cache:version:{namespace}")
+        if stored is None and cls.redis is not None and time.monotonic() >= cls.redis_retry_at:
+            stored = 0  # not set yet, or lost by Redis
+        version = local if stored is None else cls._catch_up(namespace, int(stored), local)
+        cls.versions[namespace] = (now + settings["version_ttl"], version)
+        return version
+
+    @classmethod
+    def _catch_up(cls, namespace: str, stored: int, local: int) -> int:
+        """Get the version of {namespace} from the {stored} one and the {local}
+        one, raising the stored one when this worker bumped it while Redis was
+        down (or lost it).
+        """
+        if stored >= local:
+            return stored
+        raised = cls._redis_call("incrby", f"cache:version:{namespace}", local - stored)
+        return max(int(raised), local) if raised is not None else local
+
+    @classmethod
+    def bump(cls, namespace: str) -> None:
+        """Invalidate every cached value of {namespace}."""
+        settings = cls.configure()
+        known = cls.versions.get(namespace)
+        local = (known[1] if known else 0) + 1
+        stored = cls._redis_call("incr", f"cache:version:{namespace}")
+        version = local if stored is None else cls._catch_up(namespace, int(stored), local)
+        cls.versions[namespace] = (time.monotonic() + settings["version_ttl"], version)
+        prefix = f"cache:{namespace}:"
+        with cls.lock:
+            for key in [k for k in cls.local if k.startswith(prefix)]:
+                cls.local_bytes -= len(cls.local.pop(key)[1])
+
+    @classmethod
+    def get_or_build(
+        cls, namespace: str, key: str, build: Callable[[], bytes], ttl: float | None = None
+    ) -> bytes:
+        """Get the cached value of {key} in {namespace}, or build it with {build}.
+
+        A value missing from both tiers is built once per worker, concurrent
+        requests for it wait for that build.
+        """
+        settings = cls.configure()
+        full_key = f"cache:{namespace}:{cls.version(namespace)}:{key}"
+        value = cls._local_get(full_key)
+        if value is not None:
+            CACHE_LOOKUPS.labels(namespace=namespace, tier="local", result="hit").inc()
+            return value
+        CACHE_LOOKUPS.labels(namespace=namespace, tier="local", result="miss").inc()
+        with cls.lock:
+            building = cls.building.setdefault(full_key, threading.Lock())
+        with building:
+            value = cls._local_get(full_key)
+            if value is None:
+                value = cls._redis_call("get", full_key)
+                if cls.redis is not None and time.monotonic() >= cls.redis_retry_at:
+                    result = "hit" if value is not None else "miss"
+                    CACHE_LOOKUPS.labels(namespace=namespace, tier="redis", result=result).inc()
+                if value is None:
+                    value = build()
+                    cls._redis_call("set", full_key, value, ex=int(ttl or settings["ttl"]))
+                cls._local_set(full_key, value)
+        with cls.lock:
+            cls.building.pop(full_key, None)
+        return value
+
+    @classmethod
+    def _local_get(cls, key: str) -> bytes | None:
+        with cls.lock:
+            entry = cls.local.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                cls.local_bytes -= len(cls.local.pop(key)[1])
+                return None
+            cls.local.move_to_end(key)
+            return entry[1]
+
+    @classmethod
+    def _local_set(cls, key: str, value: bytes) -> None:
+        settings = cls.configure()
+        if len(value) > settings["local_max_bytes"]:
+            return
+        with cls.lock:
+            previous = cls.local.pop(key, None)
+            if previous is not None:
+                cls.local_bytes -= len(previous[1])
+            cls.local[key] = (time.monotonic() + settings["local_ttl"], value)
+            cls.local_bytes += len(value)
+            while cls.local_bytes > settings["local_max_bytes"]:
+                _, (_, evicted) = cls.local.popitem(last=False)
+                cls.local_bytes -= len(evicted)
@@ -0,0 +1,170 @@
+"""Service for the change sequence of questions and quizzes, read by delta sync.
+
+Usage (from src/), to number the documents written before change sequences:
+    python -m services.changes
+"""
+
+import uuid
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING
+
+from pymongo import ASCENDING
+from pymongo.errors import DuplicateKeyError
+
+from services.mongo import ServiceMongo
+from services.util import ServiceUtil
+
+if TYPE_CHECKING:
+    from pymongo.collection import Collection
+
+COUNTERS = "counters"
+COLLECTIONS = ("questions", "quizs")
+BACKFILL_BATCH = 1000
+
+
+class ServiceChanges:
+    """Static class for handling change sequences.
+
+    Every write of a question or quiz stamps the document with change_seq,
+    taken from a counter per collection, and change_date. A client keeps the
+    last change_seq it read as its token and asks for the documents stamped
+    after it, so syncing costs the number of changes, not the size of the
+    collection.
+
+    Numbers are taken before their write, so a higher number may land first.
+    Each reservation is listed as pending in the counter document, set in the
+    same update as the counter, until its write returns (see stamping); since
+    only serves the numbers below the lowest pending one, and a token never
+    goes past a write still in flight. A reservation left pending for longer
+    than CHANGES_PENDING_TTL_S (a worker killed mid-write) stops holding
+    readers back; a write slower than that could still be missed.
+    """
+
+    @staticmethod
+    def get_collection(name: str) -> "Collection":
+        """Get collection {name}."""
+        return ServiceMongo.get_collection(name)
+
+    @classmethod
+    def reserve(cls, name: str, count: int = 1) -> tuple[int, str]:
+        """Take {count} change sequence numbers of collection {name}, pending until
+        released, get the first and the id of the reservation.
+        """
+        counters = cls.get_collection(COUNTERS)
+        reservation = uuid.uuid4().hex
+        while True:
+            seq = (counters.find_one({"_id": name}, {"seq": 1}) or {}).get("seq", 0)
+            pending = {"id": reservation, "first": seq + 1, "date": datetime.now(tz=timezone.utc)}
+            try:
+                # applied only if no other worker took numbers since the read
+                result = counters.update_one(
+                    {"_id": name, "seq": seq},
+                    {"$set": {"seq": seq + count}, "$push": {"pending": pending}},
+                    upsert=seq == 0,
+                )
+            except DuplicateKeyError:
+                continue
+            if result.matched_count or result.upserted_id is not None:
+                return seq + 1, reservation
+
+    @classmethod
+    def release(cls, name: str, reservation: str) -> None:
+        """End reservation {reservation} of collection {name}, once its write returned."""
+        cls.get_collection(COUNTERS).update_one(
+            {"_id": name}, {"$pull": {"pending": {"id": reservation}}}
+        )
+
+    @classmethod
+    @contextmanager
+    def stamping(cls, name: str, count: int = 1) -> Iterator[list[dict]]:
+        """Get the change fields of {count} documents of collection {name}, to be
+        written inside the block.
+        """
+        if count == 0:
+            yield []
+            return
+        first, reservation = cls.reserve(name, count)
+        now = datetime.now(tz=timezone.utc)
+        try:
+            yield [{"change_seq": first + n, "change_date": now} for n in range(count)]
+        finally:
+            cls.release(name, reservation)
+
+    @classmethod
+    def since(cls, name: str, token: int, limit: int) -> tuple[list[dict], int, bool]:
+        """Get the documents of collection {name} changed after {token}, oldest first.
+
+        Returns at most {limit} documents, the token to ask for the next ones
+        and whether more changes are already waiting.
+        """
+        # read before the documents: every number below the bound is written
+        counter = cls.get_collection(COUNTERS).find_one({"_id": name}) or {}
+        ttl = float(ServiceUtil.get_env("CHANGES_PENDING_TTL_S", "600"))
+        expired = datetime.now(tz=timezone.utc).replace(tzinfo=None) - timedelta(seconds=ttl)
+        bound = min(
+            [
+                p["first"]
+                for p in counter.get("pending", [])
+                if p["date"].replace(tzinfo=None) > expired
+            ],
+            default=counter.get("seq", 0) + 1,
+        )
+        docs = list(
+            ServiceMongo.get_list_collection(name)
+            .find({"change_seq": {"$gt": token, "$lt": bound}}, {"paper": 0})
+            .sort("change_seq", ASCENDING)
+            .limit(limit + 1)
+        )
+        more = len(docs) > limit
+        docs = docs[:limit]
+        return docs, docs[-1]["change_seq"] if docs else token, more
+
+    @classmethod
+    def ensure_indexes(cls) -> None:
+        """Create the indexes read by delta sync."""
+        for name in COLLECTIONS:
+            cls.get_collection(name).create_index([("change_seq", ASCENDING)])
+
+    @classmethod
+    def backfill(cls) -> int:
+        """Stamp the documents written before change sequences, get their number."""
+        total = 0
+        for name in COLLECTIONS:
+            collection = cls.get_collection(name)
+            while True:
+                ids = [
+                    doc["_id"]
+                    for doc in collection.find({"change_seq": None}, {"_id": 1})
+                    .sort("_id", ASCENDING)
+                    .limit(BACKFILL_BATCH)
+                ]
+                if not ids:
+                    break
+                with cls.stamping(name, len(ids)) as stamps:
+                    for oid, s in zip(ids, stamps, strict=True):
+                        collection.update_one(
+                            {"_id": oid, "change_seq": None},
+                            {"$set": {**s, "change_date": oid.generation_time}},
+                        )
+                total += len(ids)
+        return total
+
+    @classmethod
+    def start(cls) -> None:
+        """Create the indexes, and stamp the documents written before change
+        sequences when there are any left.
+        """
+        cls.ensure_indexes()
+        unstamped = {"change_seq": None}
+        if any(cls.get_collection(name).find_one(unstamped) for name in COLLECTIONS):
+            cls.backfill()
+
+
+# -------------- main ------------------
+if __name__ == "__main__":
+    ServiceMongo.connect()
+    ServiceChanges.ensure_indexes()
+    print(f"{ServiceChanges.backfill()} document(s) stamped")
+    ServiceMongo.disconnect()
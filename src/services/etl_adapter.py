@@ -1,24 +1,63 @@
 from pathlib import Path
 from datetime import datetime
-from services.etl_quiz import process_and_export_csv
 
-DATA_IN = Path("data/in")
+from fastapi import Request
 
+from services.etl_jobs import ServiceEtlJob
+from services.etl_quiz import SUPPORTED_SUFFIXES, sniff_header
+from services.upload import receive_upload
+from services.util import ServiceUtil
 
-def _ts_name(name: str) -> str:
-    base = Path(name).stem
-    return f"{base}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-
+MAX_UPLOAD_MB = 50
 
-def save_file_to_data_in(filename: str, data: bytes) -> Path:
-    DATA_IN.mkdir(parents=True, exist_ok=True)
-    dst = DATA_IN / _ts_name(filename)
-    dst.write_bytes(data)  # writes the file for the ETL
-    return dst
+ALLOWED_CT = {
+    "text/csv",
+    "application/vnd.ms-excel",
+    "application/csv",
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "application/vnd.oasis.opendocument.spreadsheet",
+    "application/vnd.apache.parquet",
+    "application/x-parquet",
+    "application/octet-stream",
+}
 
 
-def run_etl_from_upload(filename: str, data: bytes, author: str | None):
-    csv_path = save_file_to_data_in(filename, data)
-    stats, log_path = process_and_export_csv(csv_path, author=author)
-
-    return stats, log_path
+def _ts_name(name: str, job_id: str = "") -> str:
+    base = Path(name).stem
+    suffix = f"_{job_id[:8]}" if job_id else ""
+    ext = Path(name).suffix.lower()
+    ext = ext if ext in SUPPORTED_SUFFIXES else ".csv"
+    return f"{base}_{datetime.now().strftime('%Y%m%d_%H%M%S')}{suffix}{ext}"
+
+
+def _check_upload(filename: str, content_type: str, head: bytes) -> str | None:
+    """Reason to refuse an upload from its name and first bytes, or None."""
+    if content_type not in ALLOWED_CT:
+        return f"Type de fichier invalide ({content_type})"
+    suffix = Path(filename).suffix.lower()
+    if suffix not in SUPPORTED_SUFFIXES:
+        return f"Extension de fichier invalide ({suffix or filename})"
+    return sniff_header(head, suffix)
+
+
+async def submit_etl_from_request(
+    request: Request, field: str, author: str | None
+) -> str:
+    """Stream the file {field} of {request} to a new job workspace and queue its import."""
+    job_id = ServiceEtlJob.new_id()
+    max_mb = int(ServiceUtil.get_env("ETL_MAX_UPLOAD_MB", str(MAX_UPLOAD_MB)) or MAX_UPLOAD_MB)
+    try:
+        upload = await receive_upload(
+            request,
+            field,
+            ServiceEtlJob.workspace(job_id),
+            name_fn=lambda filename: _ts_name(filename, job_id),
+            max_bytes=max_mb * 2**20,
+            check=_check_upload,
+        )
+    except BaseException:
+        ServiceEtlJob.remove_workspace(job_id)
+        raise
+    return ServiceEtlJob.submit(
+        job_id, upload.filename, upload.path, author, file_hash=upload.sha256
+    )
@@ -0,0 +1,269 @@
+"""Service for running ETL imports as background jobs."""
+
+import os
+import shutil
+import socket
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from services.cache import ServiceCache
+from services.etl_progress import EtlProgress
+from services.etl_quiz import process_and_export_csv
+from services.log import ServiceLog
+from services.metrics import ServiceMetrics, peak_rss_mb, reset_peak_rss
+from services.mongo import ServiceMongo
+from services.util import ServiceUtil
+
+if TYPE_CHECKING:
+    from pymongo.collection import Collection
+
+COLLECTION = "etl_jobs"
+DATA_WORK = Path("data/work")
+PENDING_STATES = ("queued", "running")
+
+
+def _alive(pid: int) -> bool:
+    """Tell whether process {pid} of this host is still running."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _init_worker() -> None:
+    """Open a dedicated MongoClient in each worker process."""
+    ServiceMongo.connect()
+
+
+def _run_job(  # noqa: PLR0913
+    job_id: str,
+    csv_path: str,
+    author: str | None,
+    chunksize: int,
+    engine: str,
+    sinks: list[str],
+    file_hash: str | None = None,
+) -> dict:
+    """Run one import in a worker process, record its outcome and return its measures."""
+    ServiceEtlJob.update(job_id, {"state": "running"})
+    progress = EtlProgress(
+        on_flush=lambda snapshot: ServiceEtlJob.update(job_id, {"progress": snapshot})
+    )
+    reset_peak_rss()
+    rss_before = peak_rss_mb()
+    state = "failed"
+    try:
+        stats, _ = process_and_export_csv(
+            Path(csv_path),
+            author=author,
+            chunksize=chunksize,
+            progress=progress,
+            engine=engine,
+            sinks=sinks,
+            file_hash=file_hash,
+        )
+    except ValueError as e:
+        ServiceEtlJob.update(job_id, {"state": state, "error": str(e)})
+    except Exception as e:  # noqa: BLE001
+        ServiceLog.send_exception(f"ETL job {job_id} failed", e)
+        ServiceEtlJob.update(job_id, {"state": state, "error": f"Erreur ETL: {e}"})
+    else:
+        state = "done"
+        ServiceEtlJob.update(
+            job_id,
+            {"state": state, "stats": stats, "progress": progress.snapshot()},
+        )
+    finally:
+        ServiceEtlJob.remove_workspace(job_id)
+    return {
+        "importer": ServiceMetrics.importer(csv_path, engine),
+        "sinks": sinks,
+        "state": state,
+        "progress": progress.snapshot(),
+        "peak_rss_delta_mb": peak_rss_mb() - rss_before,
+    }
+
+
+class ServiceEtlJob:
+    """Static class for handling ETL jobs.
+
+    Jobs run on a process pool so that the pandas stages never block the
+    event loop; their metadata lives in Mongo so it survives restarts.
+    Each job reads its upload from its own workspace (data/work/<job id>),
+    so concurrent imports never see each other's files.
+
+    A pending job is owned by the backend process ("host:pid") running it,
+    so that with several workers each job is resumed by a single one: jobs
+    are released on shutdown, and those of a process of this host that died
+    are claimed again; a job is only claimed with a compare-and-set on its
+    previous owner.
+    """
+
+    executor: ProcessPoolExecutor | None = None
+    owner: str | None = None
+
+    @classmethod
+    def start(cls) -> None:
+        """Create the worker pool and resume jobs left pending by a restart."""
+        max_workers = int(ServiceUtil.get_env("ETL_MAX_WORKERS", "0") or 0)
+        cls.executor = ProcessPoolExecutor(
+            max_workers=max_workers or os.cpu_count(), initializer=_init_worker
+        )
+        cls.resume()
+
+    @classmethod
+    def stop(cls) -> None:
+        """Shut the worker pool down, waiting for running jobs, and release the
+        jobs left queued.
+        """
+        if cls.executor is not None:
+            cls.executor.shutdown(wait=True, cancel_futures=True)
+            cls.executor = None
+        cls.get_collection().update_many(
+            {"owner": cls.owner, "state": {"$in": PENDING_STATES}}, {"$set": {"owner": None}}
+        )
+
+    @staticmethod
+    def get_collection() -> "Collection":
+        """Get the jobs collection."""
+        return ServiceMongo.get_collection(COLLECTION)
+
+    @staticmethod
+    def new_id() -> str:
+        """Get a new job id."""
+        return uuid.uuid4().hex
+
+    @staticmethod
+    def workspace(job_id: str) -> Path:
+        """Get the workspace folder of job {job_id}, create it if necessary."""
+        path = DATA_WORK / job_id
+        path.mkdir(parents=True, exist_ok=True)
+        return path
+
+    @staticmethod
+    def remove_workspace(job_id: str) -> None:
+        """Remove the workspace folder of job {job_id}."""
+        shutil.rmtree(DATA_WORK / job_id, ignore_errors=True)
+
+    @classmethod
+    def submit(
+        cls,
+        job_id: str,
+        filename: str,
+        csv_path: Path,
+        author: str | None,
+        file_hash: str | None = None,
+    ) -> str:
+        """Register job {job_id} for {csv_path} and queue it, return its id.
+
+        {file_hash} is the SHA-256 of the file when the upload computed it.
+        """
+        now = datetime.now(tz=timezone.utc)
+        cls.get_collection().insert_one(
+            {
+                "_id": job_id,
+                "state": "queued",
+                "owner": cls.owner,
+                "filename": filename,
+                "path": str(csv_path),
+                "author": author,
+                "sha256": file_hash,
+                "rapport": f"rapport_{csv_path.stem}.csv",
+                "progress": EtlProgress().snapshot(),
+                "stats": None,
+                "error": None,
+                "date_creation": now,
+                "date_modification": now,
+            }
+        )
+        cls._enqueue(job_id, str(csv_path), author, file_hash)
+        return job_id
+
+    @classmethod
+    def _enqueue(
+        cls, job_id: str, csv_path: str, author: str | None, file_hash: str | None
+    ) -> None:
+        """Hand a job over to the worker pool."""
+        chunksize = int(ServiceUtil.get_env("ETL_CHUNKSIZE", "0") or 0)
+        engine = ServiceUtil.get_env("ETL_ENGINE", "c")
+        sinks = ServiceUtil.get_env("ETL_SINKS", "mongo").split(",")
+        future = cls.executor.submit(
+            _run_job, job_id, csv_path, author, chunksize, engine, sinks, file_hash
+        )
+
+        def _done(f: Future) -> None:
+            # the worker records its own outcome, except when it dies
+            exc = f.exception() if not f.cancelled() else None
+            if exc is not None:
+                ServiceLog.send_exception(f"ETL job {job_id} crashed", exc)
+                cls.update(job_id, {"state": "failed", "error": f"Erreur ETL: {exc}"})
+            elif not f.cancelled():
+                ServiceMetrics.record_import(f.result())
+                # versions are per process without Redis, the worker bump is not seen here
+                ServiceCache.bump("questions")
+
+        future.add_done_callback(_done)
+
+    @classmethod
+    def claimable(cls) -> list[str | None]:
+        """Get the owners whose pending jobs this process may claim: none, itself
+        (a pid reused after a restart) and the processes of this host that died.
+        """
+        host = socket.gethostname()
+        owners: list[str | None] = [None, cls.owner]
+        for owner in cls.get_collection().distinct("owner", {"state": {"$in": PENDING_STATES}}):
+            if not owner or owner == cls.owner:
+                continue
+            owner_host, _, pid = owner.rpartition(":")
+            if owner_host == host and pid.isdigit() and not _alive(int(pid)):
+                owners.append(owner)
+        return owners
+
+    @classmethod
+    def resume(cls) -> None:
+        """Queue again the jobs that were pending when the backend stopped, once
+        claimed by this process.
+        """
+        cls.owner = f"{socket.gethostname()}:{os.getpid()}"
+        collection = cls.get_collection()
+        pending = collection.find(
+            {"state": {"$in": PENDING_STATES}, "owner": {"$in": cls.claimable()}},
+            {"owner": 1},
+        )
+        for candidate in list(pending):
+            job = collection.find_one_and_update(
+                {
+                    "_id": candidate["_id"],
+                    "state": {"$in": PENDING_STATES},
+                    "owner": candidate.get("owner"),
+                },
+                {"$set": {"owner": cls.owner, "date_modification": datetime.now(tz=timezone.utc)}},
+            )
+            if job is None:
+                # claimed by another worker in the meantime
+                continue
+            if Path(job["path"]).exists():
+                cls.update(job["_id"], {"state": "queued"})
+                cls._enqueue(job["_id"], job["path"], job.get("author"), job.get("sha256"))
+            else:
+                cls.update(
+                    job["_id"],
+                    {"state": "failed", "error": "Import interrompu par un redémarrage"},
+                )
+
+    @classmethod
+    def update(cls, job_id: str, fields: dict) -> None:
+        """Set {fields} on job {job_id}."""
+        fields["date_modification"] = datetime.now(tz=timezone.utc)
+        cls.get_collection().update_one({"_id": job_id}, {"$set": fields})
+
+    @classmethod
+    def get(cls, job_id: str) -> dict | None:
+        """Get job {job_id}."""
+        return cls.get_collection().find_one({"_id": job_id})
@@ -0,0 +1,114 @@
+"""Service for remembering what the ETL already imported."""
+
+import hashlib
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import pandas as pd
+from bson import Binary
+from pymongo.errors import BulkWriteError
+
+from services.mongo import ServiceMongo
+
+if TYPE_CHECKING:
+    from pymongo.collection import Collection
+
+FILES_COLLECTION = "etl_ledger_files"
+ROWS_COLLECTION = "etl_ledger_rows"
+# normalized content of a row, as read from the file (before fuzzy correction)
+ROW_COLUMNS = [
+    "question_key",
+    "subject",
+    "use",
+    "correct",
+    "responsea",
+    "responseb",
+    "responsec",
+    "responsed",
+    "remark",
+]
+BATCH_SIZE = 10_000
+HASH_CHUNK = 1 << 20
+DUPLICATE_KEY = 11000
+
+
+class ServiceEtlLedger:
+    """Static class for handling the import ledger.
+
+    The ledger keeps a SHA-256 per imported file and a 16-byte BLAKE2b digest
+    per imported row, so identical files and unchanged rows are skipped.
+    """
+
+    @staticmethod
+    def files() -> "Collection":
+        """Get the collection of imported files."""
+        return ServiceMongo.get_collection(FILES_COLLECTION)
+
+    @staticmethod
+    def rows() -> "Collection":
+        """Get the collection of imported rows."""
+        return ServiceMongo.get_collection(ROWS_COLLECTION)
+
+    @staticmethod
+    def file_hash(path: Path) -> str:
+        """Get the SHA-256 of the file at {path}."""
+        digest = hashlib.sha256()
+        with path.open("rb") as f:
+            while chunk := f.read(HASH_CHUNK):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @classmethod
+    def known_file(cls, file_hash: str) -> dict | None:
+        """Get the ledger entry of a file already imported with {file_hash}."""
+        return cls.files().find_one({"_id": file_hash})
+
+    @classmethod
+    def record_file(cls, file_hash: str, filename: str, rows: int, stats: dict) -> None:
+        """Remember that the file with {file_hash} and its {rows} rows were imported."""
+        cls.files().update_one(
+            {"_id": file_hash},
+            {
+                "$set": {
+                    "filename": filename,
+                    "rows": rows,
+                    "stats": stats,
+                    "date_creation": datetime.now(tz=timezone.utc),
+                }
+            },
+            upsert=True,
+        )
+
+    @staticmethod
+    def row_hashes(df: pd.DataFrame) -> pd.Series:
+        """Digest of the normalized content of each row of {df}."""
+        content = df[ROW_COLUMNS].astype(str).agg("\x1f".join, axis=1)
+        return content.map(
+            lambda s: hashlib.blake2b(s.encode("utf-8"), digest_size=16).digest()
+        )
+
+    @classmethod
+    def known_rows(cls, hashes: pd.Series) -> set[bytes]:
+        """Get the digests among {hashes} that were already imported."""
+        values = list(dict.fromkeys(hashes))
+        known: set[bytes] = set()
+        for i in range(0, len(values), BATCH_SIZE):
+            batch = [Binary(h) for h in values[i : i + BATCH_SIZE]]
+            found = cls.rows().find({"_id": {"$in": batch}}, {"_id": 1})
+            known.update(bytes(doc["_id"]) for doc in found)
+        return known
+
+    @classmethod
+    def record_rows(cls, hashes: list[bytes]) -> None:
+        """Remember the rows with {hashes} as imported."""
+        now = datetime.now(tz=timezone.utc)
+        values = list(dict.fromkeys(hashes))
+        for i in range(0, len(values), BATCH_SIZE):
+            docs = [{"_id": Binary(h), "date_creation": now} for h in values[i : i + BATCH_SIZE]]
+            try:
+                cls.rows().insert_many(docs, ordered=False)
+            except BulkWriteError as e:
+                # rows already known: unordered inserts still write the others
+                if any(err["code"] != DUPLICATE_KEY for err in e.details["writeErrors"]):
+                    raise
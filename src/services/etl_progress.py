@@ -0,0 +1,89 @@
+"""Progress tracking of one ETL import."""
+
+import time
+from collections import Counter
+from collections.abc import Callable
+from contextvars import ContextVar
+
+FLUSH_INTERVAL = 1.0  # seconds between two pushes of the progress counters
+FUZZY_EVENTS = {"SUJET_CORRIGE_AUTO", "AUTO_CORRECT_USE"}
+
+# tracker of the import running in the current context, fed by rapport_etl
+CURRENT_PROGRESS: ContextVar["EtlProgress | None"] = ContextVar(
+    "CURRENT_PROGRESS", default=None
+)
+
+
+class EtlProgress:
+    """Counters, report events and stage timings of one import.
+
+    The pipeline updates the counters in memory; they are pushed to {on_flush}
+    at most once every {interval} seconds, and on every stage change.
+    Recording an event is a single counter increment, it never flushes.
+    Without {on_flush}, tracking is a no-op apart from the counters.
+    """
+
+    def __init__(
+        self,
+        on_flush: Callable[[dict], None] | None = None,
+        interval: float = FLUSH_INTERVAL,
+    ) -> None:
+        self.counters = {
+            "rows_read": 0,
+            "skipped_unchanged": 0,
+            "accepted": 0,
+            "rejected": 0,
+            "total": 0,
+        }
+        self.events: Counter[str] = Counter()
+        self.stages: dict[str, float] = {}
+        self.current_stage: str | None = None
+        self.stage_started = time.monotonic()
+        self.on_flush = on_flush
+        self.interval = interval
+        self._last_flush = 0.0
+
+    def stage(self, name: str) -> None:
+        """Enter stage {name} (read, fuzzy, expand, export, done)."""
+        now = time.monotonic()
+        if self.current_stage is not None:
+            elapsed = now - self.stage_started
+            self.stages[self.current_stage] = self.stages.get(self.current_stage, 0.0) + elapsed
+        self.current_stage = name
+        self.stage_started = now
+        self.flush(force=True)
+
+    def split(self, name: str, seconds: float) -> None:
+        """Count {seconds} of the current stage as spent in sub-stage {name}."""
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+        self.stage_started += seconds
+
+    def add(self, **counters: int) -> None:
+        """Increment {counters}."""
+        for name, value in counters.items():
+            self.counters[name] = self.counters.get(name, 0) + value
+        self.flush()
+
+    def event(self, type_evenement: str) -> None:
+        """Count one report event."""
+        self.events[type_evenement] += 1
+
+    def snapshot(self) -> dict:
+        """Get a copy of the counters, events and stage timings."""
+        return {
+            **self.counters,
+            "fuzzy_corrections": sum(self.events[e] for e in FUZZY_EVENTS),
+            "events": dict(self.events),
+            "stage": self.current_stage,
+            "stage_elapsed": round(time.monotonic() - self.stage_started, 3),
+            "stages": {k: round(v, 3) for k, v in self.stages.items()},
+        }
+
+    def flush(self, force: bool = False) -> None:  # noqa: FBT001, FBT002
+        """Push the counters to {on_flush} if the interval has elapsed."""
+        if self.on_flush is None:
+            return
+        now = time.monotonic()
+        if force or now - self._last_flush >= self.interval:
+            self._last_flush = now
+            self.on_flush(self.snapshot())
@@ -2,22 +2,30 @@
 Handles extraction, transformation (including fuzzy correction), and loading into MongoDB.
 """
 
+import csv
+import errno
+import hashlib
+import io
+import os
 import shutil
+import time
+import zipfile
 from datetime import datetime, timezone
 from pathlib import Path
 
 import pandas as pd
 from rapidfuzz import fuzz
 
-from models.question import QuestionModel
-from services.mongo import ServiceMongo
-from services.question import ServiceQuestion
+from services.etl_ledger import ServiceEtlLedger
+from services.etl_progress import CURRENT_PROGRESS, EtlProgress
+from services.etl_report import ServiceEtlReport
+from services.etl_sinks import EtlSink, make_sinks
+from services.taxonomy import ServiceTaxonomy
 from services.util import ServiceUtil
 
 # ----- Folders -----
 DATA_IN = Path("data/in")
 DATA_TREATED = Path("data/treated")
-DATA_LOG = Path("data/log")
 
 # ----- Expected schema -----
 EXPECTED_COLUMNS = {
@@ -47,6 +55,25 @@ MAPPING_CSV_TO_CIBLE = {
 
 THRESHOLD_FUZZY = 90  # for typo detection
 
+CHUNKSIZE = 0  # rows per chunk in streaming mode, 0 = whole file at once
+SINKS = ["mongo"]  # see services/etl_sinks.py
+
+# ----- Readers -----
+ENGINES = {"c", "pyarrow"}  # "c": pandas default parser, "pyarrow": Arrow-backed
+ENGINE = "c"
+EXCEL_SUFFIXES = {".xlsx", ".xls", ".ods"}
+SUPPORTED_SUFFIXES = {".csv", ".parquet"} | EXCEL_SUFFIXES
+LOW_CARDINALITY_COLUMNS = ["subject", "use", "source_file"]  # stored as categories
+# pandas, pyarrow (ArrowInvalid is a ValueError) and Excel readers errors
+READ_ERRORS = (FileNotFoundError, ValueError, zipfile.BadZipFile)
+# first bytes of binary formats, checked before an upload is stored
+MAGIC_BYTES = {
+    ".parquet": b"PAR1",
+    ".xlsx": b"PK\x03\x04",
+    ".ods": b"PK\x03\x04",
+    ".xls": b"\xd0\xcf\x11\xe0",
+}
+
 # ----- Utilities -----
 
 
@@ -56,69 +83,178 @@ def clean_col(col):
 
 
 def move_file(src, dest_dir):
-    """Move a file into destination folder, create folder if necessary."""
-    shutil.move(src, dest_dir / src.name)
-
-
-def get_csv_files(folder):
-    """Return sorted list of CSV files in a folder."""
+    """Move a file into destination folder atomically, create folder if necessary."""
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    dest = dest_dir / src.name
+    try:
+        os.replace(src, dest)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        # other filesystem: copy next to the target, then rename in place
+        tmp = dest.with_name(f".{dest.name}.part")
+        shutil.copy2(src, tmp)
+        os.replace(tmp, dest)
+        src.unlink()
+
+
+def get_input_files(folder):
+    """Return sorted list of question files (CSV, Parquet, Excel/ODS) in a folder."""
     if not folder.exists():
         return []
-    return sorted(folder.glob("*.csv"))
-
-
-def rapport_etl(type_evenement, message, data_log=DATA_LOG, file="log", line=None):
-    """Append ETL events to a daily log CSV in data/log."""
-    now = datetime.now()
-    ts = now.strftime("%Y-%m-%d %H:%M:%S")
-    file_name = Path(file).stem
-    log_file = data_log / f"rapport_{file_name}.csv"
-    header = not log_file.exists()
-    row = pd.DataFrame(
-        [
-            {
-                "Date": ts,
-                "fichier": file,
-                "ligne": line,
-                "type_evenement": type_evenement,
-                "message": message,
-            }
-        ]
-    )
-    row.to_csv(
-        log_file, mode="a", index=False, header=header, sep=";", encoding="utf-8-sig"
-    )
+    return sorted(p for p in folder.iterdir() if p.suffix.lower() in SUPPORTED_SUFFIXES)
 
 
-def distinct_from_mongo(col, field: str) -> list[str]:
-    """Retourne la liste des valeurs distinctes pour un champ donné en base Mongo."""
-    return [v for v in col.distinct(field) if isinstance(v, str) and v.strip()]
+def rapport_etl(type_evenement, message, file="log", line=None):
+    """Add an ETL event to the report of {file} (see ServiceEtlReport)."""
+    progress = CURRENT_PROGRESS.get()
+    if progress is not None:
+        progress.event(type_evenement)
+    ServiceEtlReport.add(
+        ServiceEtlReport.name(file), datetime.now(), file, line, type_evenement, message
+    )
 
 
 # ------------------ Read + mapping + checks ------------------
-def read_csv(data_in, data_treated, data_log):
-    """Read and validate a CSV file for ETL processing."""
+def map_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Normalize column names and apply mapping to target schema."""
+    df.columns = [clean_col(col) for col in df.columns]
+    return df.rename(columns=MAPPING_CSV_TO_CIBLE)
+
+
+def sniff_header(head: bytes, suffix: str) -> str | None:
+    """Check the first bytes of a question file, return why it is rejected or None.
+
+    For a CSV, {head} must hold the whole header row, whose columns are mapped
+    and checked like read_csv does. Other formats only get their signature checked.
+    """
+    suffix = suffix.lower()
+    if suffix in MAGIC_BYTES:
+        if not head.startswith(MAGIC_BYTES[suffix]):
+            return f"Contenu invalide pour un fichier {suffix}"
+        return None
+    try:
+        first_line = head.decode("utf-8-sig").splitlines()[0] if head else ""
+    except UnicodeDecodeError:
+        return "Le fichier CSV doit être encodé en UTF-8"
+    header = next(csv.reader(io.StringIO(first_line)), [])
+    missing = EXPECTED_COLUMNS - set(map_columns(pd.DataFrame(columns=header)).columns)
+    if missing:
+        return f"Colonnes manquantes: {sorted(missing)}"
+    return None
+
+
+def text_columns(df: pd.DataFrame) -> list:
+    """Columns holding text, either as Python objects or as Arrow strings."""
+    return [
+        col
+        for col in df.columns
+        if df[col].dtype == object or pd.api.types.is_string_dtype(df[col].dtype)
+    ]
+
+
+def clean_frame(df: pd.DataFrame, file_name: str) -> pd.DataFrame:
+    """Clean content, add tracking columns and the normalized question key."""
+    # clean content (NaN -> "", strip strings)
+    obj_cols = text_columns(df)
+    df[obj_cols] = df[obj_cols].fillna("").apply(lambda s: s.str.strip())
+
+    # add tracking columns
+    df["source_idx"] = df.index + 1
+    df["source_file"] = file_name
+
+    # normalize question text
+    df["question_key"] = df["question"].apply(ServiceUtil.normalize_question)
+
+    # few distinct values repeated on every row: keep them as categories
+    df[LOW_CARDINALITY_COLUMNS] = df[LOW_CARDINALITY_COLUMNS].astype("category")
+    return df
+
+
+def read_frame(file_path: Path, engine: str = ENGINE) -> pd.DataFrame:
+    """Read a whole question file with the parser of {engine}."""
+    suffix = file_path.suffix.lower()
+    arrow = {"dtype_backend": "pyarrow"} if engine == "pyarrow" else {}
+    if suffix == ".parquet":
+        return pd.read_parquet(file_path, **arrow)
+    if suffix in EXCEL_SUFFIXES:
+        excel_engine = "odf" if suffix == ".ods" else None
+        return pd.read_excel(file_path, engine=excel_engine, **arrow)
+    if engine == "pyarrow":
+        return pd.read_csv(file_path, engine="pyarrow", **arrow)
+    return pd.read_csv(file_path)
+
+
+def _iter_arrow_csv(file_path: Path, chunksize: int):
+    """Yield DataFrames of about {chunksize} rows parsed by pyarrow's streaming reader."""
+    import pyarrow as pa  # noqa: PLC0415
+    from pyarrow import csv as pa_csv  # noqa: PLC0415
+
+    # all columns as text, otherwise types inferred on the first block may not fit the next ones
+    with file_path.open(encoding="utf-8-sig", newline="") as f:
+        header = next(csv.reader(f), [])
+    convert_options = pa_csv.ConvertOptions(
+        column_types=dict.fromkeys(header, pa.string())
+    )
+    batches, rows = [], 0
+    with pa_csv.open_csv(file_path, convert_options=convert_options) as reader:
+        for batch in reader:
+            batches.append(batch)
+            rows += batch.num_rows
+            if rows >= chunksize:
+                yield pa.Table.from_batches(batches).to_pandas(types_mapper=pd.ArrowDtype)
+                batches, rows = [], 0
+    if batches:
+        yield pa.Table.from_batches(batches).to_pandas(types_mapper=pd.ArrowDtype)
+
+
+def iter_frames(file_path: Path, chunksize: int, engine: str = ENGINE):
+    """Yield raw DataFrames of about {chunksize} rows from one question file.
+
+    The index keeps counting across chunks, so source_idx stays the file line.
+    Excel/ODS files cannot be streamed: they are read at once, then sliced.
+    """
+    suffix = file_path.suffix.lower()
+    if suffix == ".parquet":
+        import pyarrow.parquet as pq  # noqa: PLC0415
+
+        mapper = pd.ArrowDtype if engine == "pyarrow" else None
+        frames = (
+            batch.to_pandas(types_mapper=mapper)
+            for batch in pq.ParquetFile(file_path).iter_batches(batch_size=chunksize)
+        )
+    elif suffix in EXCEL_SUFFIXES:
+        df = read_frame(file_path, engine)
+        frames = (df.iloc[i : i + chunksize] for i in range(0, len(df), chunksize))
+    elif engine == "pyarrow":
+        frames = _iter_arrow_csv(file_path, chunksize)
+    else:
+        # text only, a chunk with an empty column would otherwise become float
+        frames = pd.read_csv(file_path, chunksize=chunksize, dtype=str)
+
+    start = 0
+    for frame in frames:
+        frame.index = pd.RangeIndex(start, start + len(frame))
+        start += len(frame)
+        yield frame
+
+
+def read_csv(data_in, data_treated, engine: str = ENGINE):
+    """Read and validate the question files of a folder for ETL processing."""
     all_rows = []
 
-    for file_path in get_csv_files(data_in):
+    for file_path in get_input_files(data_in):
         file_name = file_path.name
 
         # 1. raw read
         try:
-            df = pd.read_csv(file_path)
-        except (
-            FileNotFoundError,
-            pd.errors.EmptyDataError,
-            pd.errors.ParserError,
-        ) as e:
-            rapport_etl("read_csv", str(e), data_log, file=file_name)
+            df = read_frame(file_path, engine)
+        except READ_ERRORS as e:
+            rapport_etl("read_csv", str(e), file=file_name)
             move_file(file_path, data_treated)
             continue
-        # 2. normalize column names
-        df.columns = [clean_col(col) for col in df.columns]
-
-        # 3. apply mapping to target schema
-        df.rename(columns=MAPPING_CSV_TO_CIBLE, inplace=True)
+        # 2-3. normalize column names and map to target schema
+        df = map_columns(df)
 
         # 4. check expected columns
         missing = EXPECTED_COLUMNS - set(df.columns)
@@ -126,85 +262,201 @@ def read_csv(data_in, data_treated, data_log):
             rapport_etl(
                 "structure",
                 f"Colonnes manquantes: {sorted(missing)}",
-                data_log,
                 file=file_name,
             )
             move_file(file_path, data_treated)
             continue
 
-        # 5. clean content (NaN -> "", strip strings)
-        obj_cols = df.select_dtypes(include="object").columns
-        df[obj_cols] = df[obj_cols].fillna("").apply(lambda s: s.str.strip())
-
-        # 6. add tracking columns
-        df["source_idx"] = df.index + 1
-        df["source_file"] = file_name
-
-        # 7. normalize question text
-        df["question_key"] = df["question"].apply(ServiceUtil.normalize_question)
+        # 5-7. clean content, tracking columns, question key
+        df = clean_frame(df, file_name)
 
         # 8. log and move processed file
         all_rows.append(df)
-        rapport_etl("LECTURE_OK", f"{len(df)} lignes à traiter", data_log, file=file_name)
+        rapport_etl("LECTURE_OK", f"{len(df)} lignes à traiter", file=file_name)
         move_file(file_path, data_treated)
 
     return pd.concat(all_rows, ignore_index=True) if all_rows else pd.DataFrame()
 
 
-def fuzzy_value(
-    val: str, ref: list[str], _field: str, threshold: int = THRESHOLD_FUZZY
-) -> str:
-    """Retourne la valeur corrigée si proche d’une valeur existante, sinon garde telle quelle."""
-    if not ref:
-        ref.append(val)
-        return val
-    best = max(ref, key=lambda c: fuzz.ratio(val, c))
-    score = fuzz.ratio(val, best)
-    if score > threshold and best != val:
-        return best
-    ref.append(val)  # new value becomes reference
-    return val
+def read_csv_chunks(file_path: Path, chunksize: int, engine: str = ENGINE):
+    """Yield mapped and cleaned chunks of {chunksize} rows from one question file."""
+    file_name = file_path.name
+    try:
+        for n, chunk in enumerate(iter_frames(file_path, chunksize, engine)):
+            chunk = map_columns(chunk)
+            if n == 0:
+                missing = EXPECTED_COLUMNS - set(chunk.columns)
+                if missing:
+                    rapport_etl(
+                        "structure",
+                        f"Colonnes manquantes: {sorted(missing)}",
+                        file=file_name,
+                    )
+                    return
+            yield clean_frame(chunk, file_name)
+    except READ_ERRORS as e:
+        rapport_etl("read_csv", str(e), file=file_name)
+
+
+def regroup_chunks(chunks):
+    """Yield (chunk, rows read) from cleaned {chunks}, none of them splitting a question.
+
+    Rows are expected grouped by question: the rows ending a chunk with the
+    question of its last row are held back and put in front of the next one.
+    """
+    carry = None
+    for chunk in chunks:
+        read = len(chunk)
+        if carry is not None:
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+        start = 0
+        if len(chunk):
+            keys = chunk["question_key"].to_numpy()
+            other = (keys != keys[-1]).nonzero()[0]
+            start = int(other[-1]) + 1 if len(other) else 0
+        carry = chunk.iloc[start:]
+        # held back rows are counted as read now, exported with the next chunk
+        yield chunk.iloc[:start].copy(), read
+    if carry is not None and len(carry):
+        yield carry.copy(), 0
+
+
+class FuzzyRefs:
+    """Subject and use resolution of one import, backed by the taxonomy.
+
+    Known values and aliases resolve from the in-memory taxonomy (see
+    ServiceTaxonomy); fuzzy matching only runs on new strings, against the
+    canonical values loaded at the start. What the import learns is kept in
+    {learned} (fuzzy aliases) and {pending} (values new to the taxonomy, with
+    their number of rows), and only persisted by save(), once the questions
+    are loaded. New values are settled by settle(): a whole-file import does
+    it before writing any question, so its rows use the settled spelling; a
+    chunked import only when it is over, for the next imports.
+    """
+
+    def __init__(self) -> None:
+        self.learned: list[tuple[str, str, str, str]] = []
+        self.pending: dict[tuple[str, str], int] = {}
+
+    @classmethod
+    def from_mongo(cls) -> "FuzzyRefs":
+        """Load the taxonomy, with the edits made since the last import."""
+        ServiceTaxonomy.load()
+        return cls()
+
+    def correct(self, field: str, val: str, rows: int = 1) -> str:
+        """Return the canonical value of {field} for {val}, found on {rows} rows."""
+        canonical, how = ServiceTaxonomy.resolve(field, val, THRESHOLD_FUZZY)
+        if how == "fuzzy":
+            self.learned.append((field, val, canonical, how))
+        elif how == "new":
+            self.pending[(field, val)] = self.pending.get((field, val), 0) + rows
+        return canonical
+
+    def settle(self) -> dict[tuple[str, str], str]:
+        """Settle the pending new values (see ServiceTaxonomy.settle), get the
+        canonical value of each, by (field, value).
+        """
+        settled = ServiceTaxonomy.settle(self.pending, THRESHOLD_FUZZY)
+        self.learned += settled
+        self.pending = {}
+        return {(field, value): canonical for field, value, canonical, _ in settled}
+
+    def save(self) -> None:
+        """Settle the new values left and persist what the import learned."""
+        self.settle()
+        ServiceTaxonomy.save(self.learned)
+        self.learned = []
+
+
+def skip_unchanged(df: pd.DataFrame, src_name: str) -> tuple[pd.DataFrame, int]:
+    """Drop the question groups of {df} whose rows were all imported before.
+
+    Rows get a row_hash column, so the hashes of exported groups can be recorded.
+    Return the remaining rows and the number of rows skipped.
+    """
+    df["row_hash"] = ServiceEtlLedger.row_hashes(df)
+    known = ServiceEtlLedger.known_rows(df["row_hash"])
+    if not known:
+        return df, 0
+    # one changed row is enough to send its whole group through again
+    df["unchanged"] = df["row_hash"].isin(known)
+    unchanged = df.groupby(["question_key", "subject", "use"], observed=True, sort=False)[
+        "unchanged"
+    ].transform("all")
+    df = df.drop(columns="unchanged")
+    skipped = int(unchanged.sum())
+    if skipped:
+        rapport_etl("LIGNES_INCHANGEES", f"{skipped} lignes deja importees", file=src_name)
+    return df[~unchanged], skipped
+
+
+class StreamState:
+    """State shared by the chunks of one streamed import.
+
+    Question groups already exported are remembered as 8-byte digests of
+    (question_key, subject, use) instead of the full strings, so rows of a
+    question coming back after other questions are reported.
+    """
+
+    def __init__(self) -> None:
+        self.seen: set[bytes] = set()
+
+    @staticmethod
+    def key(question_key: str, subject: str, use: str) -> bytes:
+        """Compact digest of a question group."""
+        raw = "\x1f".join((question_key, subject, use)).encode("utf-8")
+        return hashlib.blake2b(raw, digest_size=8).digest()
 
 
 # ------------------ Transform ------------------
-def transform_fuzzy(df: pd.DataFrame, log_fn):
-    """Apply fuzzy string matching to clean subject and use fields."""
-    # collection retrieval in Mongo
-    col = ServiceMongo.get_collection("questions")
-
-    subjects_ref = distinct_from_mongo(col, "subject")
-    uses_ref = distinct_from_mongo(col, "use")
-
-    df["subject_input"] = df["subject"].fillna("").astype(str).str.strip()
-    df["use_input"] = df["use"].fillna("").astype(str).str.strip()
-    # loop for logging with line
-    for i, row in df.iterrows():
-        s_in, u_in = row["subject_input"], row["use_input"]
-
-        s_out = fuzzy_value(s_in, subjects_ref, "subject")
-        if s_out != s_in:
-            sc = fuzz.ratio(s_in, s_out)
-            if sc > THRESHOLD_FUZZY:
+def transform_fuzzy(
+    df: pd.DataFrame,
+    log_fn,
+    refs: FuzzyRefs | None = None,
+    settle: bool = False,  # noqa: FBT001, FBT002
+):
+    """Replace subject and use fields by their canonical values.
+
+    Each distinct value is resolved once (alias or fuzzy match, see FuzzyRefs);
+    only corrected rows are visited for logging. With {settle}, {df} holds
+    every row of the import and the values new to the taxonomy are settled
+    right away, so variants of a new value are corrected too.
+    """
+    # taxonomy from Mongo, unless shared across chunks by the caller
+    if refs is None:
+        refs = FuzzyRefs.from_mongo()
+
+    for field in ("subject", "use"):
+        values = df[field].astype(object).fillna("").astype(str).str.strip()
+        df[f"{field}_input"] = values
+        corrected = {v: refs.correct(field, v, n) for v, n in values.value_counts().items()}
+        if settle:
+            settled = refs.settle()
+            corrected = {v: settled.get((field, c), c) for v, c in corrected.items()}
+        df[field] = values.map(corrected).astype("category")
+
+        # loop for logging with line
+        for i in df.index[values != df[field].astype(object)]:
+            v_in, v_out = values.at[i], corrected[values.at[i]]
+            sc = fuzz.ratio(v_in, v_out)
+            line = int(df.at[i, "source_idx"])
+            source_file = df.at[i, "source_file"]
+            if field == "subject":
                 log_fn(
                     "SUJET_CORRIGE_AUTO",
-                    f"from='{s_in}' to='{s_out}'",
-                    file=row["source_file"],
-                    line=int(row["source_idx"]),
+                    f"from='{v_in}' to='{v_out}'",
+                    file=source_file,
+                    line=line,
                 )
-        df.at[i, "subject"] = s_out
-
-        u_out = fuzzy_value(u_in, uses_ref, "use")
-        if u_out != u_in:
-            sc = fuzz.ratio(u_in, u_out)
-            if sc > THRESHOLD_FUZZY:
+            else:
                 log_fn(
                     "AUTO_CORRECT_USE",
-                    f"line={int(row['source_idx'])} field=use from='{u_in}' to='{u_out}' "
-                    f"score={sc:.1f}, file='{row['source_file']}'",
-                    file=row["source_file"],
-                    line=int(row["source_idx"]),
+                    f"line={line} field=use from='{v_in}' to='{v_out}' "
+                    f"score={sc:.1f}, file='{source_file}'",
+                    file=source_file,
+                    line=line,
                 )
-        df.at[i, "use"] = u_out
 
     return df
 
@@ -260,6 +512,7 @@ def expand_responses_with_flags(df):
                     "response": answers,
                     "isCorrect": i in correct_indices,
                     "source_idx": int(row["source_idx"]),
+                    "row_hash": row.get("row_hash"),
                 }
             )
     return pd.DataFrame.from_records(records)
@@ -391,93 +644,345 @@ def build_question_object(question, subj, question_df, src_name, author, use):
     }
 
 
-def export_questions_to_mongo(src_name, responses_df, author=None):
+def export_questions(
+    src_name,
+    responses_df,
+    sinks: list[EtlSink],
+    author=None,
+    state: StreamState | None = None,
+    progress: EtlProgress | None = None,
+):
     """
-    GroupBy (question_key, subject, use) → build → exists() → create().
+    GroupBy (question_key, subject, use) → build → write to every sink.
+    The first sink decides what counts as accepted; each sink keeps its own stats.
+    With a {state}, groups already exported by a previous chunk are ignored and
+    logged as QUESTION_NON_GROUPEE: chunks never split the rows of a question
+    (see regroup_chunks), so these rows are apart from the others in the file.
+    Row hashes of each group are handed to the sinks keeping a ledger.
+    Time spent deduplicating and building is counted as the "build" stage.
     """
+    progress = progress or EtlProgress()
     accepted = rejected = 0
+    track = any(sink.ledger is not None for sink in sinks)
 
-    for (_, subj, use), question_df in responses_df.groupby(
+    for (qkey, subj, use), question_df in responses_df.groupby(
         ["question_key", "subject", "use"], sort=False
     ):
+        line = int(question_df["source_idx"].min())
+        if state is not None:
+            group_key = state.key(qkey, subj, use)
+            if group_key in state.seen:
+                rejected += 1
+                progress.add(rejected=1, total=1)
+                rapport_etl(
+                    "QUESTION_NON_GROUPEE",
+                    f"q='{qkey}' (lignes ignorees, separees des lignes deja exportees "
+                    "de la question; regrouper les lignes par question)",
+                    file=src_name,
+                    line=line,
+                )
+                continue
+            state.seen.add(group_key)
+
         # choose the longest statement
         question = question_df.loc[
             question_df["question"].str.len().idxmax(), "question"
         ]
 
+        started = time.perf_counter()
         obj = build_question_object(
             question, subj, question_df, src_name, author, use=use
         )
+        progress.split("build", time.perf_counter() - started)
         if obj is None:
             rejected += 1
+            progress.add(rejected=1, total=1)
             continue
 
-        qm = QuestionModel(**obj)
-
-        # Application-level check: no index, we compare the normalized question on the service side.
-        if ServiceQuestion.exists(qm.question, qm.subject, qm.use):
+        rows = (
+            tuple(h for h in question_df["row_hash"].unique() if h is not None) if track else ()
+        )
+        written = [sink.write(obj, line, rows) for sink in sinks]
+        if written[0]:
+            accepted += 1
+            progress.add(accepted=1, total=1)
+        else:
             rejected += 1
-            rapport_etl(
-                "DOUBLON_IGNORE",
-                f"q='{qm.question}'",
-                file=src_name,
-                line=int(question_df["source_idx"].min()),
-            )
-            continue
+            progress.add(rejected=1, total=1)
+
+    return {"accepted": accepted, "rejected": rejected, "total": accepted + rejected}
+
+
+def export_questions_to_mongo(src_name, responses_df, author=None):
+    """
+    GroupBy (question_key, subject, use) → build → exists() → create().
+    """
+    sinks = make_sinks(["mongo"], rapport_etl)
+    sinks[0].open(src_name)
+    try:
+        stats = export_questions(src_name, responses_df, sinks, author)
+    finally:
+        sinks[0].close()
+    rapport_summary(src_name, stats["accepted"], stats["rejected"])
+    return stats
 
-        # Insert in Mongo
-        ServiceQuestion.create(qm)
-        accepted += 1
-        rapport_etl(
-            "QUESTION_INSEREE",
-            f"nb_reponse={len(qm.responses)} nb_correct={sum((getattr(r, 'isCorrect', None) is True) or (isinstance(r, dict) and r.get('isCorrect') is True) for r in qm.responses)} q='{qm.question}'",
-            file=src_name,
-            line=int(question_df["source_idx"].min()),
-        )
 
+def rapport_summary(src_name, accepted, rejected, skipped=0):
+    """Log the final counts of an import."""
     total = accepted + rejected
     msg = f"Questions acceptees: {accepted} | rejetees: {rejected} | total: {total}"
+    if skipped:
+        msg += f" | lignes inchangees: {skipped}"
     rapport_etl("SUMMARY", file=src_name, message=msg)
-    return {"accepted": accepted, "rejected": rejected, "total": total}
 
 
-def process_and_export_csv(csv_path, author=None):
+def _finish(src_name, sinks: list[EtlSink], accepted, rejected, skipped=0, ledger=None):
+    """Close sinks, log the summary and build the stats of a run.
+
+    Once the sinks are flushed, the rows in {ledger} are recorded as imported.
     """
-    Process a CSV from data/in, insert into Mongo, and return statistics.
+    for sink in sinks:
+        sink.close()
+    if ledger:
+        ServiceEtlLedger.record_rows(ledger)
+    rapport_summary(src_name, accepted, rejected, skipped)
+    stats = {
+        "accepted": accepted,
+        "rejected": rejected,
+        "total": accepted + rejected,
+        "skipped_unchanged": skipped,
+    }
+    if len(sinks) > 1 or sinks[0].name != "mongo":
+        stats["sinks"] = {sink.name: sink.stats() for sink in sinks}
+    return stats, ServiceEtlReport.name(src_name)
+
+
+def process_and_export_csv_chunked(  # noqa: PLR0913
+    csv_path,
+    author=None,
+    chunksize=CHUNKSIZE,
+    progress: EtlProgress | None = None,
+    engine: str = ENGINE,
+    sinks: list[str] | None = None,
+    incremental: bool = False,  # noqa: FBT001, FBT002
+):
     """
-    # Ensure folders exist
-    for d in [DATA_IN, DATA_TREATED, DATA_LOG]:
-        d.mkdir(parents=True, exist_ok=True)
-
-    
+    Process one file by chunks of {chunksize} rows, write to {sinks}, and return statistics.
+    Peak memory depends on the chunk size, not on the file size. Rows must be
+    grouped by question: the rows of a question are never split between
+    chunks (see regroup_chunks), those found apart are reported and ignored.
+    When {incremental}, unchanged question groups are skipped (see skip_unchanged),
+    and the taxonomy keeps the subjects and uses learned by the import.
+    """
+    progress = progress or EtlProgress()
+    DATA_TREATED.mkdir(parents=True, exist_ok=True)
+
+    src_name = csv_path.name
+    ledger: list[bytes] | None = [] if incremental else None
+    outputs = make_sinks(sinks or SINKS, rapport_etl, ledger)
+    for sink in outputs:
+        sink.open(src_name)
+    refs = FuzzyRefs.from_mongo()
+    state = StreamState()
+    rows = accepted = rejected = skipped = 0
+    try:
+        progress.stage("read")
+        for chunk, read in regroup_chunks(read_csv_chunks(csv_path, chunksize, engine)):
+            rows += read
+            progress.add(rows_read=read)
+            if chunk.empty:
+                continue
+            if incremental:
+                chunk, n = skip_unchanged(chunk, src_name)
+                skipped += n
+                progress.add(skipped_unchanged=n)
+                if chunk.empty:
+                    continue
+            progress.stage("fuzzy")
+            chunk = transform_fuzzy(chunk, rapport_etl, refs=refs)
+            progress.stage("expand")
+            responses_df = expand_responses_with_flags(chunk)
+            if responses_df.empty:
+                progress.stage("read")
+                continue
+            progress.stage("export")
+            stats = export_questions(
+                src_name,
+                responses_df,
+                outputs,
+                author,
+                state=state,
+                progress=progress,
+            )
+            accepted += stats["accepted"]
+            rejected += stats["rejected"]
+            progress.stage("read")
+    finally:
+        move_file(csv_path, DATA_TREATED)
+
+    if not rows:
+        for sink in outputs:
+            sink.close()
+        raise ValueError("No valid data from uploaded CSV")
+    rapport_etl("LECTURE_OK", f"{rows} lignes traitees", file=src_name)
+    result = _finish(src_name, outputs, accepted, rejected, skipped, ledger)
+    if incremental:
+        refs.save()
+    progress.stage("done")
+    return result
+
+
+def process_and_export_file(  # noqa: PLR0913
+    csv_path,
+    author=None,
+    progress: EtlProgress | None = None,
+    engine: str = ENGINE,
+    sinks: list[str] | None = None,
+    incremental: bool = False,  # noqa: FBT001, FBT002
+):
+    """
+    Process the question files of the folder holding {csv_path} at once,
+    write them to {sinks}, and return statistics.
+    When {incremental}, unchanged question groups are skipped (see skip_unchanged),
+    and the taxonomy keeps the subjects and uses learned by the import.
+    """
+    progress = progress or EtlProgress()
+    # Ensure folder exists
+    DATA_TREATED.mkdir(parents=True, exist_ok=True)
+
+    src_name = csv_path.name
+    ledger: list[bytes] | None = [] if incremental else None
+    outputs = make_sinks(sinks or SINKS, rapport_etl, ledger)
+    for sink in outputs:
+        sink.open(src_name)
+    refs = FuzzyRefs.from_mongo()
+    stats = {"accepted": 0, "rejected": 0}
+    skipped = 0
     try:
         # Step 1: Read CSVs
-        df_all = read_csv(DATA_IN, DATA_TREATED, DATA_LOG)
+        progress.stage("read")
+        df_all = read_csv(Path(csv_path).parent, DATA_TREATED, engine)
         if df_all.empty:
             raise ValueError("No valid data from uploaded CSV")
-        # Step 2: Fuzzy transform
-        df = transform_fuzzy(df_all, rapport_etl)
+        progress.add(rows_read=len(df_all))
+        # Step 1b: Leave out what the previous imports already loaded
+        if incremental:
+            df_all, skipped = skip_unchanged(df_all, src_name)
+            progress.add(skipped_unchanged=skipped)
+        if not df_all.empty:
+            # Step 2: Fuzzy transform
+            progress.stage("fuzzy")
+            df = transform_fuzzy(df_all, rapport_etl, refs=refs, settle=True)
+
+            # Step 3: Expand responses to long format
+            progress.stage("expand")
+            responses_df = expand_responses_with_flags(df)
+
+            # Step 4: Build and write to every sink
+            progress.stage("export")
+            if not responses_df.empty:
+                stats = export_questions(
+                    src_name, responses_df, outputs, author, progress=progress
+                )
+    except Exception:
+        for sink in outputs:
+            sink.close()
+        raise
+    result = _finish(
+        src_name, outputs, stats["accepted"], stats["rejected"], skipped, ledger
+    )
+    if incremental:
+        refs.save()
+    progress.stage("done")
+    return result
 
-        # Step 3: Expand responses to long format
-        responses_df = expand_responses_with_flags(df)
 
-        # Step 4: Export to Mongo
-        src_name = csv_path.name
-        stats = export_questions_to_mongo(src_name, responses_df, author)
-        log_file_path = Path("data/log") / f"rapport_{Path(src_name).stem}.csv"
-        return stats, log_file_path
+def skip_unchanged_file(csv_path, file_hash: str, progress: EtlProgress):
+    """Short-circuit a file identical to one already imported, or return None."""
+    known = ServiceEtlLedger.known_file(file_hash)
+    if known is None:
+        return None
+    src_name = csv_path.name
+    rows = int(known.get("rows", 0))
+    rapport_etl(
+        "FICHIER_INCHANGE",
+        f"deja importe le {known['date_creation']:%Y-%m-%d %H:%M:%S} "
+        f"sous le nom '{known['filename']}'",
+        file=src_name,
+    )
+    move_file(csv_path, DATA_TREATED)
+    progress.add(skipped_unchanged=rows)
+    rapport_summary(src_name, 0, 0, rows)
+    stats = {"accepted": 0, "rejected": 0, "total": 0, "skipped_unchanged": rows}
+    progress.stage("done")
+    return stats, ServiceEtlReport.name(src_name)
+
+
+def process_and_export_csv(  # noqa: PLR0913
+    csv_path,
+    author=None,
+    chunksize=CHUNKSIZE,
+    progress: EtlProgress | None = None,
+    engine: str = ENGINE,
+    sinks: list[str] | None = None,
+    file_hash: str | None = None,
+):
+    """
+    Process a question file, write it to {sinks} (Mongo by default), and return statistics.
+    Every question file of the folder holding {csv_path} is read: uploads get a workspace
+    of their own (see ServiceEtlJob.workspace), so only theirs is picked up.
+    With a {chunksize}, the file is streamed (see process_and_export_csv_chunked).
+    {engine} selects the parser, "pyarrow" keeps text columns as Arrow strings.
+    Report events are counted in {progress} while the import runs, and stored
+    with the report of the file (see ServiceEtlReport).
+    When loading into Mongo, the import ledger (see ServiceEtlLedger) skips a file
+    identical to one already imported, and the rows that did not change.
+    {file_hash} is the SHA-256 of the file, when the caller already computed it.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown ETL engine: {engine}")
+    progress = progress or EtlProgress()
+    incremental = "mongo" in (sinks or SINKS)
+    token = CURRENT_PROGRESS.set(progress)
+    try:
+        if incremental and file_hash is None:
+            file_hash = ServiceEtlLedger.file_hash(csv_path)
+        if incremental:
+            result = skip_unchanged_file(csv_path, file_hash, progress)
+            if result is not None:
+                return result
+        if chunksize:
+            result = process_and_export_csv_chunked(
+                csv_path, author, chunksize, progress, engine, sinks, incremental
+            )
+        else:
+            result = process_and_export_file(
+                csv_path, author, progress, engine, sinks, incremental
+            )
+        if incremental:
+            ServiceEtlLedger.record_file(
+                file_hash, csv_path.name, progress.counters["rows_read"], result[0]
+            )
+        return result
     finally:
-        pass
+        ServiceEtlReport.flush()
+        CURRENT_PROGRESS.reset(token)
 
 
 # -------------- main ------------------
 if __name__ == "__main__":
-    files = list(Path("data/in").glob("*.csv"))
+    import sys
+
+    # python -m services.etl_quiz [sinks], e.g. "json" or "mongo,ndjson"
+    sink_names = sys.argv[1].split(",") if len(sys.argv) > 1 else SINKS
+    files = get_input_files(DATA_IN)
     if not files:
         print("No CSV file found in data/in")
     else:
         first_csv_path = files[0]
-        stats, log_file_path = process_and_export_csv(first_csv_path, author=None)
+        stats, report = process_and_export_csv(
+            first_csv_path, author=None, sinks=sink_names
+        )
         print(
             f"Questions accepted: {stats['accepted']} | rejected: {stats['rejected']} | total: {stats['total']}"
         )
\ No newline at end of file
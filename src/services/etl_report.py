@@ -0,0 +1,181 @@
+"""Service for storing and querying the ETL reports."""
+
+import csv
+import io
+import threading
+from collections.abc import Iterator
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from pymongo import ASCENDING
+
+from services.mongo import ServiceMongo
+
+if TYPE_CHECKING:
+    from pymongo.collection import Collection
+
+COLLECTION = "etl_reports"
+BATCH_SIZE = 1_000
+EXPORT_BATCH = 5_000
+CSV_COLUMNS = ["Date", "fichier", "ligne", "type_evenement", "message"]
+CSV_SEP = ";"
+
+
+class ServiceEtlReport:
+    """Static class for handling the ETL reports.
+
+    A report gathers the events of the imports of one file name, e.g.
+    rapport_questions.csv. Each event is one document (report, date, file,
+    line, event type, message), indexed by report, type and line so that
+    rejections can be listed without reading the whole report. Events are
+    buffered and written with insert_many, see add() and flush().
+    """
+
+    buffer: list[dict] = []
+    lock = threading.Lock()
+    indexed = False
+
+    @staticmethod
+    def get_collection() -> "Collection":
+        """Get the collection of report events."""
+        return ServiceMongo.get_collection(COLLECTION)
+
+    @staticmethod
+    def get_list_collection() -> "Collection":
+        """Get the collection of report events, for the report API."""
+        return ServiceMongo.get_list_collection(COLLECTION)
+
+    @staticmethod
+    def name(file: str) -> str:
+        """Get the name of the report of {file}."""
+        return f"rapport_{Path(file).stem}.csv"
+
+    @classmethod
+    def ensure_indexes(cls) -> None:
+        """Create the indexes used by the report API."""
+        col = cls.get_collection()
+        col.create_index([("report", ASCENDING), ("_id", ASCENDING)])
+        col.create_index(
+            [("report", ASCENDING), ("type_evenement", ASCENDING), ("ligne", ASCENDING)]
+        )
+        cls.indexed = True
+
+    @classmethod
+    def add(  # noqa: PLR0913
+        cls,
+        report: str,
+        date: datetime,
+        file: str,
+        line: int | None,
+        type_evenement: str,
+        message: str,
+    ) -> None:
+        """Buffer one event of {report}, written once BATCH_SIZE events are waiting."""
+        event = {
+            "report": report,
+            "date": date,
+            "fichier": file,
+            "ligne": line,
+            "type_evenement": type_evenement,
+            "message": message,
+        }
+        with cls.lock:
+            cls.buffer.append(event)
+            full = len(cls.buffer) >= BATCH_SIZE
+        if full:
+            cls.flush()
+
+    @classmethod
+    def flush(cls) -> None:
+        """Write the buffered events."""
+        with cls.lock:
+            events, cls.buffer = cls.buffer, []
+        if not events:
+            return
+        if not cls.indexed:
+            cls.ensure_indexes()
+        cls.get_collection().insert_many(events, ordered=True)
+
+    @staticmethod
+    def query(
+        report: str,
+        types: list[str] | None = None,
+        line_min: int | None = None,
+        line_max: int | None = None,
+    ) -> dict:
+        """Build the filter on the events of {report}."""
+        query: dict = {"report": report}
+        if types:
+            query["type_evenement"] = {"$in": types}
+        if line_min is not None or line_max is not None:
+            query["ligne"] = {}
+            if line_min is not None:
+                query["ligne"]["$gte"] = line_min
+            if line_max is not None:
+                query["ligne"]["$lte"] = line_max
+        return query
+
+    @classmethod
+    def exists(cls, report: str) -> bool:
+        """Tell whether {report} has events."""
+        return cls.get_list_collection().count_documents({"report": report}, limit=1) == 1
+
+    @classmethod
+    def counts(cls, report: str) -> dict[str, int]:
+        """Get the number of events of {report} per event type."""
+        pipeline = [
+            {"$match": {"report": report}},
+            {"$group": {"_id": "$type_evenement", "n": {"$sum": 1}}},
+            {"$sort": {"_id": 1}},
+        ]
+        return {doc["_id"]: doc["n"] for doc in cls.get_list_collection().aggregate(pipeline)}
+
+    @classmethod
+    def page(cls, query: dict, page: int, page_size: int) -> tuple[int, list[dict]]:
+        """Get the number of events matching {query} and those of page {page}."""
+        col = cls.get_list_collection()
+        total = col.count_documents(query)
+        cursor = (
+            col.find(query, {"_id": 0, "report": 0})
+            .sort("_id", ASCENDING)
+            .skip((page - 1) * page_size)
+            .limit(page_size)
+        )
+        return total, list(cursor)
+
+    @classmethod
+    def export_csv(cls, query: dict) -> Iterator[str]:
+        """Yield the events matching {query} as CSV, in the format of the former report files."""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, delimiter=CSV_SEP, lineterminator="\n")
+        writer.writerow(CSV_COLUMNS)
+        yield "\ufeff" + cls._drain(buffer)
+        cursor = (
+            cls.get_list_collection()
+            .find(query, {"_id": 0, "report": 0})
+            .sort("_id", ASCENDING)
+            .batch_size(EXPORT_BATCH)
+        )
+        rows = 0
+        for event in cursor:
+            writer.writerow(
+                [
+                    f"{event['date']:%Y-%m-%d %H:%M:%S}",
+                    event["fichier"],
+                    "" if event["ligne"] is None else event["ligne"],
+                    event["type_evenement"],
+                    event["message"],
+                ]
+            )
+            rows += 1
+            if rows % EXPORT_BATCH == 0:
+                yield cls._drain(buffer)
+        yield cls._drain(buffer)
+
+    @staticmethod
+    def _drain(buffer: io.StringIO) -> str:
+        data = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return data
@@ -0,0 +1,210 @@
+"""Sinks of the ETL pipeline: where built question objects are written.
+
+One pipeline run can fan out to several sinks, so a file is parsed once
+whether it is loaded into Mongo, exported as JSON, or both.
+"""
+
+from abc import ABC, abstractmethod
+from collections.abc import Callable
+from datetime import datetime
+from pathlib import Path
+
+import orjson
+
+from models.question import QuestionModel
+from services.question import ServiceQuestion
+
+DATA_JSON = Path("data/json")
+SINKS = {"mongo", "json", "ndjson", "dry-run"}
+
+
+class EtlSink(ABC):
+    """Base class of sinks.
+
+    write() returns True when the question is accepted. Only the sink with
+    {report} set logs its accepted questions, so a fan-out does not log
+    each question once per sink. A sink with a {ledger} appends the row
+    digests of each question to it once the question is written.
+    """
+
+    name = "sink"
+
+    def __init__(self, log_fn: Callable, report: bool = True) -> None:  # noqa: FBT001, FBT002
+        self.log_fn = log_fn
+        self.report = report
+        self.accepted = 0
+        self.rejected = 0
+        self.ledger: list[bytes] | None = None
+
+    def open(self, src_name: str) -> None:
+        """Prepare the sink for file {src_name}."""
+        self.src_name = src_name
+
+    @abstractmethod
+    def write(self, obj: dict, line: int | None, rows: tuple[bytes, ...] = ()) -> bool:
+        """Write question {obj} built from {line}, {rows} are its row digests."""
+
+    def close(self) -> None:
+        """Flush what is left."""
+
+    def stats(self) -> dict:
+        """Get counts of this sink."""
+        return {"accepted": self.accepted, "rejected": self.rejected}
+
+    def _accept(self, obj: dict, line: int | None) -> bool:
+        self.accepted += 1
+        if self.report:
+            self.log_fn(
+                "QUESTION_VALIDE",
+                f"nb_reponse={len(obj['responses'])} "
+                f"nb_correct={sum('isCorrect' in r for r in obj['responses'])} "
+                f"q='{obj['question']}'",
+                file=self.src_name,
+                line=line,
+            )
+        return True
+
+
+class MongoSink(EtlSink):
+    """Insert questions into Mongo by batches of {batch_size}, skipping existing ones.
+
+    Questions are only counted, logged and handed to the {ledger} once their
+    batch is inserted: when an insert fails, the import stops and none of
+    the questions of the batch are reported as imported.
+    """
+
+    name = "mongo"
+
+    def __init__(
+        self,
+        log_fn: Callable,
+        report: bool = True,  # noqa: FBT001, FBT002
+        batch_size: int = 500,
+        ledger: list[bytes] | None = None,
+    ) -> None:
+        super().__init__(log_fn, report)
+        self.batch_size = batch_size
+        self.ledger = ledger
+        self.buffer: list[tuple[QuestionModel, int | None, tuple[bytes, ...]]] = []
+
+    def write(self, obj: dict, line: int | None, rows: tuple[bytes, ...] = ()) -> bool:
+        """Queue {obj} for insertion unless the question already exists."""
+        qm = QuestionModel(**obj)
+
+        # Application-level check: no index, we compare the normalized question on the service side.
+        if ServiceQuestion.exists(qm.question, qm.subject, qm.use):
+            self.rejected += 1
+            self.log_fn("DOUBLON_IGNORE", f"q='{qm.question}'", file=self.src_name, line=line)
+            return False
+
+        self.buffer.append((qm, line, rows))
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+        return True
+
+    def flush(self) -> None:
+        """Insert the queued questions, then count and log them."""
+        if not self.buffer:
+            return
+        ServiceQuestion.create_all([qm for qm, _, _ in self.buffer])
+        for qm, line, rows in self.buffer:
+            self.accepted += 1
+            if self.ledger is not None:
+                self.ledger.extend(rows)
+            if self.report:
+                self.log_fn(
+                    "QUESTION_INSEREE",
+                    f"nb_reponse={len(qm.responses)} "
+                    f"nb_correct={sum(r.isCorrect for r in qm.responses)} q='{qm.question}'",
+                    file=self.src_name,
+                    line=line,
+                )
+        self.buffer = []
+
+    def close(self) -> None:
+        """Insert what is left."""
+        self.flush()
+
+
+class JsonSink(EtlSink):
+    """Stream questions to data/json, as a JSON array or as NDJSON (one per line).
+
+    Dates are written as Mongo extended JSON ({"$date": ...}) so the file can
+    be loaded with mongoimport.
+    """
+
+    name = "json"
+
+    def __init__(self, log_fn: Callable, report: bool = True, ndjson: bool = False) -> None:  # noqa: FBT001, FBT002
+        super().__init__(log_fn, report)
+        self.ndjson = ndjson
+        self.name = "ndjson" if ndjson else "json"
+        self.path: Path | None = None
+        self.file = None
+
+    def open(self, src_name: str) -> None:
+        """Open data/json/<src stem>.json (or .ndjson)."""
+        super().open(src_name)
+        DATA_JSON.mkdir(parents=True, exist_ok=True)
+        suffix = ".ndjson" if self.ndjson else ".json"
+        self.path = DATA_JSON / (Path(src_name).stem + suffix)
+        self.file = self.path.open("wb")
+        if not self.ndjson:
+            self.file.write(b"[")
+
+    def write(self, obj: dict, line: int | None, rows: tuple[bytes, ...] = ()) -> bool:  # noqa: ARG002
+        """Append {obj} to the file."""
+        doc = {
+            k: {"$date": v.isoformat()} if isinstance(v, datetime) else v
+            for k, v in obj.items()
+        }
+        if self.ndjson:
+            self.file.write(orjson.dumps(doc, option=orjson.OPT_APPEND_NEWLINE))
+        else:
+            self.file.write(b",\n" if self.accepted else b"\n")
+            self.file.write(orjson.dumps(doc))
+        return self._accept(obj, line)
+
+    def close(self) -> None:
+        """Terminate and close the file."""
+        if self.file is not None:
+            if not self.ndjson:
+                self.file.write(b"\n]\n")
+            self.file.close()
+            self.file = None
+
+    def stats(self) -> dict:
+        """Get counts and path of the file."""
+        return {**super().stats(), "json_path": str(self.path)}
+
+
+class DryRunSink(EtlSink):
+    """Only count questions: validate a file without writing anything."""
+
+    name = "dry-run"
+
+    def write(self, obj: dict, line: int | None, rows: tuple[bytes, ...] = ()) -> bool:  # noqa: ARG002
+        """Count {obj}."""
+        return self._accept(obj, line)
+
+
+def make_sinks(
+    names: list[str], log_fn: Callable, ledger: list[bytes] | None = None
+) -> list[EtlSink]:
+    """Build sinks from their {names}, the first one logs accepted questions.
+
+    Rows are added to {ledger} by the Mongo sink, once written.
+    """
+    unknown = set(names) - SINKS
+    if not names or unknown:
+        raise ValueError(f"Unknown ETL sinks: {sorted(unknown) or names}")
+    sinks: list[EtlSink] = []
+    for n, name in enumerate(names):
+        report = n == 0
+        if name == "mongo":
+            sinks.append(MongoSink(log_fn, report, ledger=ledger))
+        elif name in {"json", "ndjson"}:
+            sinks.append(JsonSink(log_fn, report, ndjson=name == "ndjson"))
+        else:
+            sinks.append(DryRunSink(log_fn, report))
+    return sinks
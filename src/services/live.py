@@ -0,0 +1,292 @@
+"""Service for live quiz sessions over websockets."""
+
+import asyncio
+import contextlib
+import secrets
+import time
+
+import orjson
+from fastapi import WebSocket
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+
+from models.live import LiveAnswer
+from services.metrics import LIVE_FRAMES, LIVE_SLOW_CLIENTS, LIVE_SOCKETS
+from services.quiz import ServiceQuiz
+from services.util import ServiceUtil
+
+QUEUE_SIZE = 32  # frames waiting for one student socket before it is dropped
+SEND_TIMEOUT = 5  # seconds a socket may take to accept one frame
+SESSION_TTL = 4 * 3600  # seconds before a forgotten session is closed
+
+
+class LiveError(ValueError):
+    """Live session action refused, {status_code} is the HTTP status to answer with."""
+
+    def __init__(self, message: str, status_code: int = 400) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class LiveClient:
+    """One socket of a session.
+
+    Frames are queued without waiting and sent by the task of the socket, so
+    a broadcast never waits for a slow socket. A student socket more than
+    QUEUE_SIZE frames behind is dropped; a teacher socket (latest_only) only
+    keeps the last frame, as each counts frame replaces the previous one.
+    """
+
+    def __init__(self, websocket: WebSocket, username: str, role: str) -> None:
+        self.websocket = websocket
+        self.username = username
+        self.role = role
+        self.latest_only = role == "teacher"
+        self.queue: asyncio.Queue[str | None] = asyncio.Queue()
+        self.sender: asyncio.Task | None = None
+        self.dropped = False
+
+    def push(self, frame: str) -> bool:
+        """Queue {frame}, False when the socket is too far behind."""
+        if self.queue.qsize() >= (1 if self.latest_only else QUEUE_SIZE):
+            if not self.latest_only:
+                return False
+            self.queue.get_nowait()
+        self.queue.put_nowait(frame)
+        return True
+
+    def finish(self, frame: str) -> None:
+        """Queue {frame} as the last one, the socket is closed once it is sent."""
+        if self.latest_only:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+        self.queue.put_nowait(frame)
+        self.queue.put_nowait(None)
+
+    def drop(self) -> None:
+        """Stop sending to a socket that cannot keep up."""
+        self.dropped = True
+        LIVE_SLOW_CLIENTS.inc()
+        if self.sender is not None:
+            self.sender.cancel()
+
+    async def send_frames(self) -> None:
+        """Send the queued frames until the last one, or until a send times out."""
+        try:
+            while (frame := await self.queue.get()) is not None:
+                await asyncio.wait_for(self.websocket.send_text(frame), SEND_TIMEOUT)
+        except TimeoutError:
+            self.dropped = True
+            LIVE_SLOW_CLIENTS.inc()
+
+
+class LiveSession:
+    """Live session on a quiz: the teacher pushes its questions one at a time.
+
+    A question is serialized once into a frame shared by every student socket.
+    Answers only update counters; every tick, if they changed, one counts
+    frame is built and sent to the teacher sockets.
+    """
+
+    def __init__(
+        self, session_id: str, quiz_id: str, owner: str, questions: list[dict], tick: float
+    ) -> None:
+        self.id = session_id
+        self.quiz_id = quiz_id
+        self.owner = owner
+        self.questions = questions
+        self.tick = tick
+        self.students: set[LiveClient] = set()
+        self.teachers: set[LiveClient] = set()
+        self.index = -1
+        self.frame: str | None = None
+        self.counts: list[int] = []
+        self.answers: dict[str, tuple[int, ...]] = {}
+        self.dirty = False
+        self.expires = time.monotonic() + SESSION_TTL
+        self.ticker = asyncio.create_task(self._send_counts())
+
+    def join(self, client: LiveClient) -> None:
+        """Add {client}, a student gets the current question."""
+        if client.role == "teacher":
+            self.teachers.add(client)
+        else:
+            self.students.add(client)
+            if self.frame is not None:
+                client.push(self.frame)
+        LIVE_SOCKETS.labels(role=client.role).inc()
+        self.dirty = True
+
+    def leave(self, client: LiveClient) -> None:
+        """Remove {client}."""
+        clients = self.teachers if client.role == "teacher" else self.students
+        if client in clients:
+            clients.discard(client)
+            LIVE_SOCKETS.labels(role=client.role).dec()
+            self.dirty = True
+
+    def broadcast(self, clients: set[LiveClient], frame: str, frame_type: str) -> None:
+        """Queue the same {frame} to {clients}, dropping those too far behind."""
+        for client in list(clients):
+            if not client.push(frame):
+                clients.discard(client)
+                LIVE_SOCKETS.labels(role=client.role).dec()
+                client.drop()
+        LIVE_FRAMES.labels(type=frame_type).inc(len(clients))
+
+    def next(self) -> int:
+        """Push the next question to the students, get its index."""
+        if self.index + 1 >= len(self.questions):
+            raise LiveError("Plus de question dans ce quiz", 409)
+        self.index += 1
+        question = self.questions[self.index]
+        self.frame = orjson.dumps(
+            {
+                "type": "question",
+                "index": self.index,
+                "total": len(self.questions),
+                "question": question,
+            }
+        ).decode()
+        self.counts = [0] * len(question["responses"])
+        self.answers = {}
+        self.broadcast(self.students, self.frame, "question")
+        self.dirty = True
+        return self.index
+
+    def answer(self, username: str, index: int, chosen: list[int]) -> None:
+        """Count the {chosen} responses of {username} to question {index}, replacing
+        a previous answer.
+        """
+        if index != self.index:
+            raise LiveError("Cette question n'est plus ouverte")
+        chosen = tuple(sorted(set(chosen)))
+        for i in chosen:
+            if not 0 <= i < len(self.counts):
+                raise LiveError(f"Réponse {i} invalide")
+        for i in self.answers.get(username, ()):
+            self.counts[i] -= 1
+        for i in chosen:
+            self.counts[i] += 1
+        self.answers[username] = chosen
+        self.dirty = True
+
+    def state(self) -> dict:
+        """Get the current question index, sockets and answer counts."""
+        return {
+            "type": "counts",
+            "session": self.id,
+            "quiz_id": self.quiz_id,
+            "index": self.index,
+            "total": len(self.questions),
+            "students": len(self.students),
+            "answered": len(self.answers),
+            "counts": self.counts,
+        }
+
+    def close(self) -> None:
+        """Send the end frame to every socket and stop the session."""
+        self.ticker.cancel()
+        frame = orjson.dumps({**self.state(), "type": "end"}).decode()
+        for client in self.students | self.teachers:
+            client.finish(frame)
+
+    async def _send_counts(self) -> None:
+        while True:
+            await asyncio.sleep(self.tick)
+            if time.monotonic() > self.expires:
+                ServiceLive.close(self.id, self.owner)
+                return
+            if self.dirty and self.teachers:
+                self.dirty = False
+                self.broadcast(self.teachers, orjson.dumps(self.state()).decode(), "counts")
+
+
+class ServiceLive:
+    """Static class for handling live sessions.
+
+    Sessions live in the memory of the worker that created them: with several
+    workers, requests and sockets of a session must reach the same one
+    (sticky routing on the session id).
+    """
+
+    sessions: dict[str, LiveSession] = {}
+
+    @classmethod
+    async def create(cls, quiz_id: str, owner: str) -> LiveSession:
+        """Open a session of {owner} on quiz {quiz_id}."""
+        paper = ServiceQuiz.cached_paper(quiz_id) or await run_in_threadpool(
+            ServiceQuiz.paper, quiz_id
+        )
+        if paper is None:
+            raise LiveError("Quiz introuvable", 404)
+        if not paper.active:
+            raise LiveError("Quiz archivé", 409)
+        session = LiveSession(
+            session_id=secrets.token_hex(4),
+            quiz_id=quiz_id,
+            owner=owner,
+            questions=paper.document["questions"],
+            tick=float(ServiceUtil.get_env("LIVE_TICK_MS", "200")) / 1000,
+        )
+        cls.sessions[session.id] = session
+        return session
+
+    @classmethod
+    def get(cls, session_id: str, owner: str | None = None) -> LiveSession:
+        """Get session {session_id}, checking it belongs to {owner} when given."""
+        session = cls.sessions.get(session_id)
+        if session is None:
+            raise LiveError("Session introuvable", 404)
+        if owner is not None and session.owner != owner:
+            raise LiveError("Session d'un autre enseignant", 403)
+        return session
+
+    @classmethod
+    def close(cls, session_id: str, owner: str) -> dict:
+        """Close session {session_id} of {owner}, get its last state."""
+        session = cls.get(session_id, owner)
+        del cls.sessions[session_id]
+        session.close()
+        return session.state()
+
+    @classmethod
+    def stop(cls) -> None:
+        """Close every session, on shutdown."""
+        for session in list(cls.sessions.values()):
+            cls.close(session.id, session.owner)
+
+    @staticmethod
+    async def serve(session: LiveSession, client: LiveClient) -> None:
+        """Serve the socket of {client} until it disconnects or the session ends.
+
+        Students send {"index": n, "answer": [i, ...]}, teachers only listen.
+        """
+        websocket = client.websocket
+        await websocket.accept()
+        session.join(client)
+        client.sender = asyncio.create_task(client.send_frames())
+        receiver = asyncio.create_task(ServiceLive._receive(session, client))
+        try:
+            await asyncio.wait({client.sender, receiver}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in (client.sender, receiver):
+                task.cancel()
+            await asyncio.gather(client.sender, receiver, return_exceptions=True)
+            session.leave(client)
+            # 1013: try again later, the socket could not keep up
+            with contextlib.suppress(Exception):
+                await websocket.close(code=1013 if client.dropped else 1000)
+
+    @staticmethod
+    async def _receive(session: LiveSession, client: LiveClient) -> None:
+        async for text in client.websocket.iter_text():
+            if client.role == "teacher":
+                continue
+            try:
+                answer = LiveAnswer.model_validate_json(text)
+                session.answer(client.username, answer.index, answer.answer)
+            except (ValidationError, LiveError) as e:
+                message = str(e) if isinstance(e, LiveError) else "Réponse mal formée"
+                if not client.push(orjson.dumps({"type": "error", "message": message}).decode()):
+                    client.drop()
@@ -0,0 +1,111 @@
+"""Service for exporting ETL and MongoDB metrics to Prometheus.
+
+Metrics live in the default registry, exposed on /metrics next to those of
+prometheus_fastapi_instrumentator. Imports run in worker processes (see
+ServiceEtlJob), so their metrics are recorded by the backend process from
+the outcome each job sends back.
+"""
+
+import resource
+from pathlib import Path
+
+from prometheus_client import Counter, Gauge, Histogram
+
+STAGES = ["read", "fuzzy", "expand", "build", "export"]
+LABELS = ["importer", "sink"]
+STAGE_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+ETL_STAGE_SECONDS = Histogram(
+    "etl_stage_duration_seconds",
+    "Time spent by one import in each pipeline stage.",
+    ["stage", *LABELS],
+    buckets=STAGE_BUCKETS,
+)
+ETL_IMPORTS = Counter("etl_imports", "Imports by final state.", ["state", *LABELS])
+ETL_ROWS_READ = Counter("etl_rows_read", "Rows read from imported files.", LABELS)
+ETL_ROWS_SKIPPED = Counter(
+    "etl_rows_skipped_unchanged", "Rows skipped as already imported.", LABELS
+)
+ETL_QUESTIONS_ACCEPTED = Counter(
+    "etl_questions_accepted", "Questions accepted by the first sink.", LABELS
+)
+ETL_QUESTIONS_REJECTED = Counter(
+    "etl_questions_rejected", "Questions rejected (rules, duplicates).", LABELS
+)
+ETL_FUZZY_CORRECTIONS = Counter(
+    "etl_fuzzy_corrections", "Subjects and uses corrected automatically.", LABELS
+)
+ETL_ROWS_PER_SECOND = Gauge(
+    "etl_rows_per_second", "Throughput of the last import.", LABELS
+)
+ETL_PEAK_MEMORY = Gauge(
+    "etl_peak_memory_delta_bytes",
+    "Growth of the peak RSS of the worker during the last import.",
+    LABELS,
+)
+MONGO_COMMAND_SECONDS = Histogram(
+    "mongo_command_duration_seconds",
+    "Latency of MongoDB commands (see services/mongo_monitor.py).",
+    ["collection", "command"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+CACHE_LOOKUPS = Counter(
+    "cache_lookups",
+    "Lookups of the response cache by tier (see services/cache.py).",
+    ["namespace", "tier", "result"],
+)
+LIVE_SOCKETS = Gauge("live_sockets", "Open sockets of live sessions.", ["role"])
+LIVE_FRAMES = Counter("live_frames", "Frames queued to live sockets.", ["type"])
+LIVE_SLOW_CLIENTS = Counter(
+    "live_slow_clients", "Live sockets closed because they could not keep up."
+)
+
+
+def reset_peak_rss() -> None:
+    """Reset the peak RSS of this process to its current RSS (Linux only)."""
+    clear_refs = Path("/proc/self/clear_refs")
+    if clear_refs.exists():
+        clear_refs.write_text("5")
+
+
+def peak_rss_mb() -> float:
+    """Peak RSS of this process in MiB."""
+    status = Path("/proc/self/status")
+    if status.exists():
+        for line in status.read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    # ru_maxrss is in KiB on Linux, but survives exec so it may come from the parent
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class ServiceMetrics:
+    """Static class for recording metrics."""
+
+    @staticmethod
+    def importer(path: str, engine: str) -> str:
+        """Label of the reader used for {path}, e.g. csv-c or parquet-pyarrow."""
+        return f"{Path(path).suffix.lstrip('.').lower()}-{engine}"
+
+    @staticmethod
+    def record_import(outcome: dict) -> None:
+        """Record the {outcome} of one import job.
+
+        {outcome} holds the importer, the sinks, the final state, the progress
+        snapshot and the peak memory delta in MiB.
+        """
+        labels = {"importer": outcome["importer"], "sink": ",".join(outcome["sinks"])}
+        progress = outcome["progress"]
+        ETL_IMPORTS.labels(state=outcome["state"], **labels).inc()
+        for stage, seconds in progress["stages"].items():
+            if stage in STAGES:
+                ETL_STAGE_SECONDS.labels(stage=stage, **labels).observe(seconds)
+        ETL_ROWS_READ.labels(**labels).inc(progress["rows_read"])
+        ETL_ROWS_SKIPPED.labels(**labels).inc(progress["skipped_unchanged"])
+        ETL_QUESTIONS_ACCEPTED.labels(**labels).inc(progress["accepted"])
+        ETL_QUESTIONS_REJECTED.labels(**labels).inc(progress["rejected"])
+        ETL_FUZZY_CORRECTIONS.labels(**labels).inc(progress["fuzzy_corrections"])
+        elapsed = sum(progress["stages"].values())
+        if outcome["state"] == "done" and elapsed > 0:
+            ETL_ROWS_PER_SECOND.labels(**labels).set(progress["rows_read"] / elapsed)
+        ETL_PEAK_MEMORY.labels(**labels).set(outcome["peak_rss_delta_mb"] * 2**20)
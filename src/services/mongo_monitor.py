@@ -0,0 +1,285 @@
+"""Monitoring of MongoDB: command latency, slow-query log and connection pools."""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+
+import orjson
+from pymongo import monitoring
+
+from services.log import ServiceLog
+from services.metrics import MONGO_COMMAND_SECONDS
+
+# commands that take a filter, and where to find it
+FILTER_FIELDS = {
+    "find": "filter",
+    "count": "query",
+    "distinct": "query",
+    "findAndModify": "query",
+}
+EXPLAINABLE = {*FILTER_FIELDS, "aggregate", "update", "delete"}
+IGNORED = {"explain", "hello", "isMaster", "ismaster", "ping", "endSessions"}
+# fields added by the driver, refused by explain
+DRIVER_FIELDS = {"lsid", "$db", "$clusterTime", "$readPreference", "txnNumber", "signature"}
+MAX_EXPLAINED_SHAPES = 1000
+
+
+def query_shape(value: Any) -> Any:  # noqa: ANN401
+    """Replace the values of a filter by "?", keeping fields and operators."""
+    if isinstance(value, dict):
+        return {k: query_shape(v) for k, v in value.items()}
+    if isinstance(value, list):
+        shapes = [query_shape(v) for v in value]
+        return shapes[:1] if all(s == "?" for s in shapes) else shapes
+    return "?"
+
+
+def command_shape(name: str, command: dict) -> Any:  # noqa: ANN401
+    """Shape of the filter(s) of {command}."""
+    if name in FILTER_FIELDS:
+        return query_shape(command.get(FILTER_FIELDS[name], {}))
+    if name == "aggregate":
+        return [query_shape(stage) for stage in command.get("pipeline", [])]
+    if name == "update":
+        return [query_shape(u.get("q", {})) for u in command.get("updates", [])[:1]]
+    if name == "delete":
+        return [query_shape(d.get("q", {})) for d in command.get("deletes", [])[:1]]
+    return None
+
+
+def winning_stages(plan: dict) -> list[str]:
+    """Stages of a winning plan, from the root, e.g. ["FETCH", "IXSCAN"]."""
+    stages = []
+    while plan:
+        stages.append(plan.get("stage", "?"))
+        plan = plan.get("inputStage") or (plan.get("inputStages") or [None])[0]
+    return stages
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Record the latency of every command per collection, log the slow ones.
+
+    Commands slower than {slow_ms} are written to mongo_slow.log with the
+    shape of their filter. With {explain}, the query plan of each new slow
+    shape is fetched in the background through {get_client}, and logged with
+    its stages, e.g. COLLSCAN.
+    """
+
+    def __init__(self, slow_ms: float, explain: bool, get_client) -> None:  # noqa: FBT001, ANN001
+        self.slow_s = slow_ms / 1000
+        self.explain = explain
+        self.get_client = get_client
+        self.pending: dict[tuple[int, int], tuple[str, str, dict | None]] = {}
+        self.explained: set[bytes] = set()
+        self.executor: ThreadPoolExecutor | None = None
+        self.lock = threading.Lock()
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        """Remember the collection (and the command if it can be explained)."""
+        name = event.command_name
+        target = event.command.get("collection" if name == "getMore" else name)
+        collection = target if isinstance(target, str) else ""
+        command = event.command if name in EXPLAINABLE else None
+        self.pending[(event.request_id, event.operation_id)] = (
+            event.database_name,
+            collection,
+            command,
+        )
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        """Record the latency of a command."""
+        self._finish(event)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        """Record the latency of a failed command."""
+        self._finish(event)
+
+    def _finish(self, event) -> None:  # noqa: ANN001
+        database, collection, command = self.pending.pop(
+            (event.request_id, event.operation_id), ("", "", None)
+        )
+        name = event.command_name
+        seconds = event.duration_micros / 1_000_000
+        MONGO_COMMAND_SECONDS.labels(collection=collection, command=name).observe(seconds)
+        if seconds >= self.slow_s and name not in IGNORED:
+            self._slow(database, collection, name, command, seconds)
+
+    def _slow(self, database, collection, name, command, seconds) -> None:  # noqa: ANN001
+        shape = command_shape(name, command) if command is not None else None
+        self._log(
+            {
+                "event": "slow_command",
+                "database": database,
+                "collection": collection,
+                "command": name,
+                "duration_ms": round(seconds * 1000, 1),
+                "shape": shape,
+            }
+        )
+        if not self.explain or command is None:
+            return
+        key = orjson.dumps([database, collection, name, shape], option=orjson.OPT_SORT_KEYS)
+        if key in self.explained or len(self.explained) >= MAX_EXPLAINED_SHAPES:
+            return
+        self.explained.add(key)
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="explain")
+        to_explain = {k: v for k, v in command.items() if k not in DRIVER_FIELDS}
+        self.executor.submit(self._explain, database, collection, name, shape, to_explain)
+
+    def _explain(self, database, collection, name, shape, command) -> None:  # noqa: ANN001
+        try:
+            result = self.get_client()[database].command(
+                {"explain": command, "verbosity": "queryPlanner"}
+            )
+        except Exception as e:  # noqa: BLE001
+            self._log({"event": "explain_failed", "collection": collection, "error": str(e)})
+            return
+        planner = result.get("queryPlanner") or {}
+        if not planner and result.get("stages"):
+            planner = result["stages"][0].get("$cursor", {}).get("queryPlanner", {})
+        self._log(
+            {
+                "event": "explain",
+                "database": database,
+                "collection": collection,
+                "command": name,
+                "shape": shape,
+                "stages": winning_stages(planner.get("winningPlan", {})),
+            }
+        )
+
+    def _log(self, record: dict) -> None:
+        logger = logging.getLogger("mongo.slow")
+        with self.lock:
+            if not logger.handlers:
+                Path(ServiceLog.dir).mkdir(parents=True, exist_ok=True)
+                handler = logging.FileHandler(f"{ServiceLog.dir}/mongo_slow.log")
+                handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+                logger.addHandler(handler)
+                logger.setLevel(logging.INFO)
+                logger.propagate = False
+        logger.info(orjson.dumps(record, default=str).decode())
+
+
+class PoolStats:
+    """Counters of the connection pool of one server."""
+
+    def __init__(self) -> None:
+        self.open = 0
+        self.in_use = 0
+        self.waiting = 0
+        self.created = 0
+        self.closed = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.cleared = 0
+
+    def snapshot(self) -> dict:
+        """Counters as a dict, with the average checkout wait."""
+        return {
+            "open": self.open,
+            "in_use": self.in_use,
+            "waiting": self.waiting,
+            "created": self.created,
+            "closed": self.closed,
+            "checkouts": self.checkouts,
+            "checkout_failures": self.checkout_failures,
+            "avg_wait_ms": round(self.wait_seconds / self.checkouts * 1000, 3)
+            if self.checkouts
+            else 0.0,
+            "max_wait_ms": round(self.max_wait_seconds * 1000, 3),
+            "cleared": self.cleared,
+        }
+
+
+class MongoPoolListener(monitoring.ConnectionPoolListener):
+    """Keep the state of the connection pools of this process, per server.
+
+    In use, waiting and checkout wait times tell whether maxPoolSize is too
+    small for the load of one worker; see /health/db.
+    """
+
+    def __init__(self) -> None:
+        self.pools: dict[str, PoolStats] = {}
+        self.lock = threading.Lock()
+
+    def stats(self) -> dict[str, dict]:
+        """Counters of every pool, by server address."""
+        with self.lock:
+            return {address: pool.snapshot() for address, pool in self.pools.items()}
+
+    def _pool(self, event) -> PoolStats:  # noqa: ANN001
+        address = "{}:{}".format(*event.address)
+        return self.pools.setdefault(address, PoolStats())
+
+    def pool_created(self, event: monitoring.PoolCreatedEvent) -> None:
+        """Start counting for a new pool."""
+        with self.lock:
+            self._pool(event)
+
+    def pool_ready(self, event: monitoring.PoolReadyEvent) -> None:
+        """Nothing to count."""
+
+    def pool_cleared(self, event: monitoring.PoolClearedEvent) -> None:
+        """Count a pool cleared after a network error."""
+        with self.lock:
+            self._pool(event).cleared += 1
+
+    def pool_closed(self, event: monitoring.PoolClosedEvent) -> None:
+        """Forget a closed pool."""
+        with self.lock:
+            self.pools.pop("{}:{}".format(*event.address), None)
+
+    def connection_created(self, event: monitoring.ConnectionCreatedEvent) -> None:
+        """Count a new connection."""
+        with self.lock:
+            pool = self._pool(event)
+            pool.open += 1
+            pool.created += 1
+
+    def connection_ready(self, event: monitoring.ConnectionReadyEvent) -> None:
+        """Nothing to count."""
+
+    def connection_closed(self, event: monitoring.ConnectionClosedEvent) -> None:
+        """Count a closed connection."""
+        with self.lock:
+            pool = self._pool(event)
+            pool.open -= 1
+            pool.closed += 1
+
+    def connection_check_out_started(
+        self, event: monitoring.ConnectionCheckOutStartedEvent
+    ) -> None:
+        """Count a request waiting for a connection."""
+        with self.lock:
+            self._pool(event).waiting += 1
+
+    def connection_check_out_failed(
+        self, event: monitoring.ConnectionCheckOutFailedEvent
+    ) -> None:
+        """Count a request that got no connection, e.g. after waitQueueTimeoutMS."""
+        with self.lock:
+            pool = self._pool(event)
+            pool.waiting -= 1
+            pool.checkout_failures += 1
+
+    def connection_checked_out(self, event: monitoring.ConnectionCheckedOutEvent) -> None:
+        """Count a connection handed to a request, and how long it waited."""
+        with self.lock:
+            pool = self._pool(event)
+            pool.waiting -= 1
+            pool.in_use += 1
+            pool.checkouts += 1
+            wait = event.duration or 0.0
+            pool.wait_seconds += wait
+            pool.max_wait_seconds = max(pool.max_wait_seconds, wait)
+
+    def connection_checked_in(self, event: monitoring.ConnectionCheckedInEvent) -> None:
+        """Count a connection given back to the pool."""
+        with self.lock:
+            self._pool(event).in_use -= 1
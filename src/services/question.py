@@ -1,11 +1,14 @@
 """Service for handling persistency of questions in MongoDB."""
 
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import TYPE_CHECKING
 
+import orjson
 from bson import ObjectId
 
 from models.question import QuestionCreator, QuestionDict, QuestionEditor, QuestionModel
+from services.cache import ServiceCache
+from services.changes import ServiceChanges
 from services.mongo import ServiceMongo
 from services.util import ServiceUtil
 
@@ -14,7 +17,11 @@ if TYPE_CHECKING:
 
 
 class ServiceQuestion:
-    """Static class for handling questions."""
+    """Static class for handling questions.
+
+    Write paths bump the "questions" namespace of ServiceCache and stamp
+    the documents with their change sequence (see ServiceChanges).
+    """
 
     @staticmethod
     def create(question: QuestionCreator) -> None:
@@ -26,27 +33,62 @@ class ServiceQuestion:
             responses=question.responses,
             remark=question.remark,
             metadata={},
-            date_creation=datetime.now(),
+            date_creation=datetime.now(tz=timezone.utc),
             date_modification=None,
         )
 
         collection: Collection[QuestionDict] = ServiceMongo.get_collection("questions")
-        collection.insert_one(new_question.model_dump())
+        with ServiceChanges.stamping("questions") as (stamp,):
+            collection.insert_one({**new_question.model_dump(), **stamp})
+        ServiceCache.bump("questions")
 
     @staticmethod
     def create_all(questions: list[QuestionModel]) -> None:
         """Insert new questions into MongoDB."""
         collection: Collection[QuestionDict] = ServiceMongo.get_collection("questions")
-        to_insert = [question.model_dump() for question in questions]
-        collection.insert_many(to_insert)
+        with ServiceChanges.stamping("questions", len(questions)) as stamps:
+            to_insert = [
+                {**question.model_dump(), **stamp}
+                for question, stamp in zip(questions, stamps, strict=True)
+            ]
+            collection.insert_many(to_insert)
+        ServiceCache.bump("questions")
 
     @staticmethod
-    def list_all() -> list[QuestionModel]:
-        """Get all questions from MongoDB."""
-        collection: Collection[QuestionDict] = ServiceMongo.get_collection("questions")
+    def list_all(skip: int = 0, limit: int | None = None) -> list[QuestionModel]:
+        """Get all questions from MongoDB, or {limit} of them after the first {skip}.
+
+        Pages are taken in _id order, so they do not overlap.
+        """
+        collection: Collection[QuestionDict] = ServiceMongo.get_list_collection("questions")
         found = collection.find()
+        if skip or limit is not None:
+            found = found.sort("_id").skip(skip).limit(limit or 0)
         return [QuestionModel.model_validate(question) for question in found]
 
+    @staticmethod
+    def list_all_json(skip: int = 0, limit: int | None = None) -> bytes:
+        """Get all questions from MongoDB, or a page of them (see list_all), serialized
+        for the listing, through ServiceCache.
+        """
+        key = "list" if not skip and limit is None else f"list:{skip}:{limit}"
+        return ServiceCache.get_or_build(
+            "questions",
+            key,
+            lambda: orjson.dumps(
+                {"questions": [q.model_dump() for q in ServiceQuestion.list_all(skip, limit)]},
+                option=orjson.OPT_NON_STR_KEYS,
+            ),
+        )
+
+    @staticmethod
+    def changes(since: int, limit: int) -> tuple[list[QuestionModel], int, bool]:
+        """Get the questions changed after token {since}, the next token and whether
+        more changes are waiting (see ServiceChanges.since).
+        """
+        found, token, more = ServiceChanges.since("questions", since, limit)
+        return [QuestionModel.model_validate(question) for question in found], token, more
+
     @staticmethod
     def list_some(subjects: list[str], use: str) -> list[QuestionModel]:
         """Get some questions from MongoDB."""
@@ -61,9 +103,11 @@ class ServiceQuestion:
         question_id = ObjectId(question_id)
         query_filter = {"_id": question_id}
         dump = question.model_dump()
-        dump["date_modification"] = datetime.now()  # noqa: DTZ005
-        update_operation = {"$set": dump}
-        collection.update_one(query_filter, update_operation, upsert=True)
+        dump["date_modification"] = datetime.now(tz=timezone.utc)
+        with ServiceChanges.stamping("questions") as (stamp,):
+            update_operation = {"$set": {**dump, **stamp}}
+            collection.update_one(query_filter, update_operation, upsert=True)
+        ServiceCache.bump("questions")
 
     @staticmethod
     def archive(question_id: str) -> None:
@@ -71,8 +115,47 @@ class ServiceQuestion:
         collection: Collection[QuestionDict] = ServiceMongo.get_collection("questions")
         question_id = ObjectId(question_id)
         query_filter = {"_id": question_id}
-        update_operation = {"$set": {"active": False}}
-        collection.update_one(query_filter, update_operation)
+        with ServiceChanges.stamping("questions") as (stamp,):
+            update_operation = {
+                "$set": {
+                    "active": False,
+                    "date_modification": datetime.now(tz=timezone.utc),
+                    **stamp,
+                }
+            }
+            collection.update_one(query_filter, update_operation)
+        ServiceCache.bump("questions")
+
+    @staticmethod
+    def attach(question_id: str, attachment_id: str) -> bool:
+        """Add attachment {attachment_id} to question {question_id}, False if there
+        is no such question.
+        """
+        collection: Collection[QuestionDict] = ServiceMongo.get_collection("questions")
+        with ServiceChanges.stamping("questions") as (stamp,):
+            result = collection.update_one(
+                {"_id": ObjectId(question_id)},
+                {
+                    "$push": {"attachments": attachment_id},
+                    "$set": {"date_modification": datetime.now(tz=timezone.utc), **stamp},
+                },
+            )
+        ServiceCache.bump("questions")
+        return result.matched_count > 0
+
+    @staticmethod
+    def detach(question_id: str, attachment_id: str) -> None:
+        """Remove attachment {attachment_id} from question {question_id}."""
+        collection: Collection[QuestionDict] = ServiceMongo.get_collection("questions")
+        with ServiceChanges.stamping("questions") as (stamp,):
+            collection.update_one(
+                {"_id": ObjectId(question_id)},
+                {
+                    "$pull": {"attachments": attachment_id},
+                    "$set": {"date_modification": datetime.now(tz=timezone.utc), **stamp},
+                },
+            )
+        ServiceCache.bump("questions")
 
     @staticmethod
     def get_all_subjects() -> list[str]:
@@ -1,55 +1,215 @@
 """Service for handling quiz generation."""
 
+import hashlib
 import random
+from collections import OrderedDict
 from datetime import datetime, timezone
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, NamedTuple
 
+import orjson
 from bson import ObjectId
+from bson.errors import InvalidId
 
-from models.quiz import QuizDict, QuizModel
+from models.question import QuestionModel
+from models.quiz import PaperQuestion, QuizDict, QuizModel, QuizPaper
+from services.cache import ServiceCache
+from services.changes import ServiceChanges
 from services.mongo import ServiceMongo
 from services.question import ServiceQuestion
+from services.usage import ServiceUsage
 
 if TYPE_CHECKING:
     from pymongo.collection import Collection
 
+PAPER_CACHE_SIZE = 256
+
+
+class Paper(NamedTuple):
+    """Student version of a quiz rendered to JSON, parsed in {document}, its ETag
+    and the cache version it was read at. Archived quizzes are not active.
+    """
+
+    content: bytes
+    document: dict
+    etag: str
+    active: bool
+    version: int
+
 
 class ServiceQuiz:
-    """Static class for handling quiz generation."""
+    """Static class for handling quiz generation.
+
+    Write paths bump the "quizs" namespace of ServiceCache and stamp the
+    documents with their change sequence (see ServiceChanges). The student
+    paper of a quiz is rendered once and stored with it (paper, paper_etag),
+    each worker keeps the papers it serves until the namespace is bumped.
+    """
+
+    papers: "OrderedDict[str, Paper]" = OrderedDict()
+
+    @staticmethod
+    def answer_key(questions: list[QuestionModel]) -> tuple[list[int], list[int]]:
+        """Get the answer key of {questions} and their number of responses.
+
+        The key of a question is a bitmask where bit i is set when response i
+        is correct, so grading an answer is one integer comparison.
+        """
+        key = [
+            sum(1 << i for i, response in enumerate(question.responses) if response.isCorrect)
+            for question in questions
+        ]
+        return key, [len(question.responses) for question in questions]
+
+    @staticmethod
+    def render_paper(quiz: QuizModel) -> tuple[bytes, str]:
+        """Get the student paper of {quiz} rendered to JSON and its strong ETag."""
+        paper = QuizPaper(
+            subjects=quiz.subjects,
+            use=quiz.use,
+            questions=[
+                PaperQuestion(
+                    question=q.question,
+                    subject=q.subject,
+                    use=q.use,
+                    responses=[r.answer for r in q.responses],
+                    attachments=[f"/questions/{q.id}/attachments/{a}" for a in q.attachments],
+                )
+                for q in quiz.questions
+            ],
+        )
+        content = orjson.dumps(paper.model_dump())
+        return content, f'"{hashlib.sha256(content).hexdigest()[:32]}"'
 
     @staticmethod
     def create(quiz: QuizModel) -> None:
-        """Insert a new quiz into MongoDB."""
+        """Insert a new quiz into MongoDB, with its answer key and student paper,
+        and count the use of its questions.
+        """
+        quiz.answer_key, quiz.answer_counts = ServiceQuiz.answer_key(quiz.questions)
+        content, etag = ServiceQuiz.render_paper(quiz)
         collection: Collection[QuizDict] = ServiceMongo.get_collection("quizs")
-        collection.insert_one(quiz.model_dump())
+        with ServiceChanges.stamping("quizs") as (stamp,):
+            collection.insert_one(
+                {
+                    **quiz.model_dump(),
+                    **stamp,
+                    "answer_key": quiz.answer_key,
+                    "answer_counts": quiz.answer_counts,
+                    "paper": content,
+                    "paper_etag": etag,
+                }
+            )
+        ServiceUsage.record([q.id for q in quiz.questions if q.id], quiz.date_creation)
+        ServiceCache.bump("quizs")
 
     @staticmethod
     def list_all() -> list[QuizModel]:
         """Get all quizs from MongoDB."""
-        collection: Collection[QuizDict] = ServiceMongo.get_collection("quizs")
-        found = collection.find()
+        collection: Collection[QuizDict] = ServiceMongo.get_list_collection("quizs")
+        found = collection.find({}, {"paper": 0})
         return [QuizModel.model_validate(quiz) for quiz in found]
 
+    @staticmethod
+    def list_all_json() -> bytes:
+        """Get all quizs from MongoDB, serialized for the listing, through ServiceCache."""
+        return ServiceCache.get_or_build(
+            "quizs",
+            "list",
+            lambda: orjson.dumps(
+                {"quizs": [q.model_dump() for q in ServiceQuiz.list_all()]},
+                option=orjson.OPT_NON_STR_KEYS,
+            ),
+        )
+
+    @staticmethod
+    def changes(since: int, limit: int) -> tuple[list[QuizModel], int, bool]:
+        """Get the quizs changed after token {since}, the next token and whether
+        more changes are waiting (see ServiceChanges.since).
+        """
+        found, token, more = ServiceChanges.since("quizs", since, limit)
+        return [QuizModel.model_validate(quiz) for quiz in found], token, more
+
+    @classmethod
+    def cached_paper(cls, quiz_id: str) -> Paper | None:
+        """Get the paper of quiz {quiz_id} if this worker holds it, still current."""
+        paper = cls.papers.get(quiz_id)
+        if paper is None or paper.version != ServiceCache.version("quizs"):
+            return None
+        cls.papers.move_to_end(quiz_id)
+        return paper
+
+    @classmethod
+    def paper(cls, quiz_id: str) -> Paper | None:
+        """Get the paper of quiz {quiz_id}, or None when there is no such quiz.
+
+        Quizzes generated before papers existed get theirs rendered and stored.
+        """
+        cached = cls.cached_paper(quiz_id)
+        if cached is not None:
+            return cached
+        try:
+            oid = ObjectId(quiz_id)
+        except InvalidId:
+            return None
+        version = ServiceCache.version("quizs")
+        collection: Collection[QuizDict] = ServiceMongo.get_collection("quizs")
+        doc = collection.find_one({"_id": oid}, {"paper": 1, "paper_etag": 1, "active": 1})
+        if doc is None:
+            return None
+        if "paper" not in doc:
+            quiz = QuizModel.model_validate(collection.find_one({"_id": oid}, {"paper": 0}))
+            content, etag = ServiceQuiz.render_paper(quiz)
+            collection.update_one(
+                {"_id": oid}, {"$set": {"paper": content, "paper_etag": etag}}
+            )
+            doc.update(paper=content, paper_etag=etag)
+        paper = Paper(
+            content=bytes(doc["paper"]),
+            document=orjson.loads(doc["paper"]),
+            etag=doc["paper_etag"],
+            active=doc.get("active", True),
+            version=version,
+        )
+        cls.papers[quiz_id] = paper
+        if len(cls.papers) > PAPER_CACHE_SIZE:
+            cls.papers.popitem(last=False)
+        return paper
+
     @staticmethod
     def archive(quiz_id: str) -> None:
         """Archive a quiz in MongoDB."""
         collection: Collection[QuizDict] = ServiceMongo.get_collection("quizs")
         query_filter = {"_id": ObjectId(quiz_id)}
-        update_operation = {"$set": {"active": False}}
-        collection.update_one(query_filter, update_operation)
+        with ServiceChanges.stamping("quizs") as (stamp,):
+            update_operation = {
+                "$set": {
+                    "active": False,
+                    "date_modification": datetime.now(tz=timezone.utc),
+                    **stamp,
+                }
+            }
+            collection.update_one(query_filter, update_operation)
+        ServiceCache.bump("quizs")
 
     @staticmethod
     def generate(
         total_questions: int,
         subjects: list[str],
         use: str,
+        sampling: str = "uniform",
     ) -> None:
-        """Generate a quiz with {total_questions} for said {subjects} and said {use}."""
-        questions = ServiceQuestion.list_some(subjects=subjects, use=use)
-        questions_sample = random.sample(
-            questions,
-            min(total_questions, len(questions)),
-        )
+        """Generate a quiz with {total_questions} for said {subjects} and said {use}.
+
+        With {sampling} "usage", questions are drawn by ServiceUsage.sample.
+        """
+        if sampling == "usage":
+            questions_sample = ServiceUsage.sample(subjects, use, total_questions)
+        else:
+            questions = ServiceQuestion.list_some(subjects=subjects, use=use)
+            questions_sample = random.sample(
+                questions,
+                min(total_questions, len(questions)),
+            )
         quiz = QuizModel(
             id=None,
             questions=questions_sample,
@@ -2,25 +2,31 @@
 
 from typing import Any, Iterable, Set
 
-from fastapi import Depends, HTTPException, Request, status
+from fastapi import Depends, HTTPException, Request, WebSocket, WebSocketException, status
+from starlette.requests import HTTPConnection
 
 from services.authentification import get_roles_for_user
 
 
-def require_session_user(request: Request) -> dict[str, Any]:
-    """Require session user."""
+def _session_user(connection: HTTPConnection) -> dict[str, Any] | None:
+    """Get session user of a request or websocket."""
     user = None
     try:
-        user = request.session.get("user") if hasattr(request, "session") else None
+        user = connection.session.get("user") if "session" in connection.scope else None
     except Exception:
         user = None
 
     if not user:
-        uid = request.headers.get("x-user-id")
-        uname = request.headers.get("x-username")
+        uid = connection.headers.get("x-user-id")
+        uname = connection.headers.get("x-username")
         if uid and uname:
             user = {"id": int(uid), "username": uname}
+    return user
 
+
+def require_session_user(request: Request) -> dict[str, Any]:
+    """Require session user."""
+    user = _session_user(request)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -45,3 +51,24 @@ def require_roles(roles: Iterable[str]) -> Any:  # noqa: ANN401
         return user
 
     return _dep
+
+
+def require_socket_user(websocket: WebSocket) -> dict[str, Any]:
+    """Require session user of a websocket."""
+    user = _session_user(websocket)
+    if not user:
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason="Not authenticated")
+    return user
+
+
+def require_socket_roles(roles: Iterable[str]) -> Any:  # noqa: ANN401
+    """Require roles of a websocket user."""
+    required: Set[str] = set(roles)
+
+    def _dep(user=Depends(require_socket_user)) -> Any:  # noqa: ANN001, ANN401, B008
+        """Depend."""
+        if not get_roles_for_user(int(user["id"])).intersection(required):
+            raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason="Forbidden")
+        return user
+
+    return _dep
@@ -0,0 +1,386 @@
+"""Service for Parquet snapshots of questions, quizzes and attempts.
+
+Usage (from src/):
+    python -m services.snapshot export            # changes since the last snapshot
+    python -m services.snapshot export --full
+    python -m services.snapshot restore ID [--replace]
+"""
+
+import argparse
+import json
+import shutil
+import threading
+import time
+from collections.abc import Iterator
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from bson import ObjectId
+from pymongo import ASCENDING
+
+from services.attempt import ServiceAttempt
+from services.cache import ServiceCache
+from services.changes import ServiceChanges
+from services.mongo import ServiceMongo
+from services.stats import ServiceStats
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+DATA_SNAPSHOTS = Path("data/snapshots")
+BATCH_SIZE = 5000  # documents per Arrow record batch and per insert_many
+COLLECTIONS = ("questions", "quizs", "attempts")
+# partition columns of each collection, in the order of the folders
+PARTITIONS = {"questions": ("subject", "use"), "quizs": ("use",), "attempts": ("month",)}
+# restored as null rather than left out, the models require them
+NULLABLE = {"remark", "date_modification"}
+# attempts are exported once their _id is this old (seconds); their ids are
+# taken just before insert_many, an insert slower than that would be missed
+ATTEMPTS_SETTLE = 60
+
+
+class SnapshotError(ValueError):
+    """Snapshot action refused, {status_code} is the HTTP status to answer with."""
+
+    def __init__(self, message: str, status_code: int = 400) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _schemas() -> dict[str, "pa.Schema"]:
+    import pyarrow as pa  # noqa: PLC0415
+
+    ts = pa.timestamp("ms", tz="UTC")  # precision of BSON dates
+    question = [
+        ("id", pa.string()),
+        ("question", pa.string()),
+        ("subject", pa.string()),
+        ("use", pa.string()),
+        (
+            "responses",
+            pa.list_(pa.struct([("answer", pa.string()), ("isCorrect", pa.bool_())])),
+        ),
+        ("remark", pa.string()),
+        ("metadata", pa.map_(pa.string(), pa.string())),
+        ("date_creation", ts),
+        ("date_modification", ts),
+        ("active", pa.bool_()),
+        ("attachments", pa.list_(pa.string())),
+    ]
+    changes = [("change_seq", pa.int64()), ("change_date", ts)]
+    return {
+        "questions": pa.schema(
+            [*question, ("usage_count", pa.int64()), ("last_used", ts), *changes]
+        ),
+        "quizs": pa.schema(
+            [
+                ("id", pa.string()),
+                ("questions", pa.list_(pa.struct(question))),
+                ("subjects", pa.list_(pa.string())),
+                ("use", pa.string()),
+                ("metadata", pa.map_(pa.string(), pa.string())),
+                ("date_creation", ts),
+                ("date_modification", ts),
+                ("active", pa.bool_()),
+                ("answer_key", pa.list_(pa.int64())),
+                ("answer_counts", pa.list_(pa.int64())),
+                *changes,
+            ]
+        ),
+        "attempts": pa.schema(
+            [
+                ("id", pa.string()),
+                ("quiz_id", pa.string()),
+                ("student", pa.string()),
+                ("answers", pa.list_(pa.int64())),
+                ("correct", pa.list_(pa.bool_())),
+                ("score", pa.int64()),
+                ("total", pa.int64()),
+                ("date_submission", ts),
+                ("seed", pa.int64()),
+                ("month", pa.string()),
+            ]
+        ),
+    }
+
+
+def _partitioning(name: str, schema: "pa.Schema") -> "pa.dataset.Partitioning":
+    import pyarrow as pa  # noqa: PLC0415
+    import pyarrow.dataset as ds  # noqa: PLC0415
+
+    fields = [schema.field(column) for column in PARTITIONS[name]]
+    return ds.partitioning(pa.schema(fields), flavor="hive")
+
+
+def _to_row(doc: dict) -> dict:
+    row = {**doc, "id": str(doc["_id"])}
+    if "quiz_id" in doc:
+        row["quiz_id"] = str(doc["quiz_id"])
+        row["month"] = doc["date_submission"].strftime("%Y-%m")
+    return row
+
+
+def _to_doc(row: dict) -> dict:
+    doc = {"_id": ObjectId(row.pop("id"))}
+    row.pop("month", None)
+    for key, value in row.items():
+        if value is None and key not in NULLABLE:
+            continue
+        if key == "quiz_id":
+            value = ObjectId(value)
+        elif key == "metadata":
+            value = dict(value)
+        elif key == "questions":
+            value = [{**q, "metadata": dict(q["metadata"] or [])} for q in value]
+        doc[key] = value
+    return doc
+
+
+class ServiceSnapshot:
+    """Static class for handling snapshots.
+
+    A snapshot is a folder of data/snapshots holding one Parquet dataset per
+    collection, partitioned hive-style: questions by subject and use, quizzes
+    by use, attempts by month of submission. Documents are read from Mongo
+    cursors and written as Arrow record batches of BATCH_SIZE, so memory does
+    not depend on the size of the bank. Papers are left out (rendered again
+    on demand) and attachments stay in GridFS, only their ids are kept.
+
+    A snapshot is incremental unless full: it only holds the questions and
+    quizzes changed since the previous one (by change sequence, see
+    ServiceChanges) and the attempts submitted since (attempts never change).
+    manifest.json records where each collection stopped and the snapshot it
+    follows; it is written last, so a folder without it is not a snapshot.
+    """
+
+    lock = threading.Lock()
+
+    @staticmethod
+    def list_all() -> list[dict]:
+        """Get the manifests of the snapshots, oldest first."""
+        if not DATA_SNAPSHOTS.exists():
+            return []
+        return [
+            json.loads(manifest.read_text())
+            for manifest in sorted(DATA_SNAPSHOTS.glob("*/manifest.json"))
+            if manifest.parent.suffix != ".partial"
+        ]
+
+    @staticmethod
+    def get(snapshot_id: str) -> dict:
+        """Get the manifest of snapshot {snapshot_id}."""
+        manifest = DATA_SNAPSHOTS / Path(snapshot_id).name / "manifest.json"
+        if not manifest.exists():
+            raise SnapshotError("Snapshot introuvable", 404)
+        return json.loads(manifest.read_text())
+
+    @staticmethod
+    def file(snapshot_id: str, path: str) -> Path:
+        """Get file {path} of snapshot {snapshot_id}."""
+        root = (DATA_SNAPSHOTS / Path(snapshot_id).name).resolve()
+        target = (root / path).resolve()
+        if not target.is_relative_to(root) or not target.is_file():
+            raise SnapshotError("Fichier introuvable", 404)
+        return target
+
+    @staticmethod
+    def _changed(name: str, token: int) -> Iterator[list[dict]]:
+        while True:
+            docs, token, more = ServiceChanges.since(name, token, BATCH_SIZE)
+            if docs:
+                yield docs
+            if not more:
+                return
+
+    @staticmethod
+    def _submitted(start: datetime | None, end: datetime) -> Iterator[list[dict]]:
+        # ObjectIds start with their second of creation: ranges of _id are
+        # ranges of time, read through the _id index
+        bounds = {"$lt": ObjectId.from_datetime(end)}
+        if start is not None:
+            bounds["$gte"] = ObjectId.from_datetime(start)
+        cursor = (
+            ServiceMongo.get_list_collection("attempts")
+            .find({"_id": bounds})
+            .sort("_id", ASCENDING)
+            .batch_size(BATCH_SIZE)
+        )
+        batch = []
+        for doc in cursor:
+            batch.append(doc)
+            if len(batch) == BATCH_SIZE:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    @staticmethod
+    def _write(name: str, batches: Iterator[list[dict]], folder: Path) -> tuple[int, int]:
+        """Write the documents of {batches} to the dataset {name} in {folder},
+        get their number and the last change sequence seen.
+        """
+        import pyarrow as pa  # noqa: PLC0415
+        import pyarrow.dataset as ds  # noqa: PLC0415
+
+        schema = _schemas()[name]
+        count = 0
+        last_seq = 0
+
+        def record_batches() -> Iterator[pa.RecordBatch]:
+            nonlocal count, last_seq
+            for docs in batches:
+                count += len(docs)
+                last_seq = docs[-1].get("change_seq", last_seq)
+                yield pa.RecordBatch.from_pylist([_to_row(doc) for doc in docs], schema=schema)
+
+        ds.write_dataset(
+            record_batches(),
+            folder / name,
+            schema=schema,
+            format="parquet",
+            partitioning=_partitioning(name, schema),
+            basename_template="part-{i}.parquet",
+        )
+        return count, last_seq
+
+    @classmethod
+    def export(cls, full: bool = False) -> dict:  # noqa: FBT001, FBT002
+        """Write a snapshot, of everything when {full} or when there is no
+        previous one, else of the changes since the last one; get its manifest.
+        """
+        with cls.lock:
+            started = time.perf_counter()
+            previous = None if full else next(reversed(cls.list_all()), None)
+            now = datetime.now(tz=timezone.utc)
+            snapshot_id = f"{now:%Y%m%dT%H%M%S%f}Z"
+            # attempts are cut at a whole second, the resolution of ObjectIds
+            cutoff = (now - timedelta(seconds=ATTEMPTS_SETTLE)).replace(microsecond=0)
+            since = previous["tokens"] if previous else {"questions": 0, "quizs": 0}
+            start = datetime.fromisoformat(since["attempts"]) if "attempts" in since else None
+
+            partial = DATA_SNAPSHOTS / f"{snapshot_id}.partial"
+            partial.mkdir(parents=True)
+            try:
+                counts, tokens = {}, {"attempts": cutoff.isoformat()}
+                for name in ("questions", "quizs"):
+                    counts[name], last_seq = cls._write(
+                        name, cls._changed(name, since[name]), partial
+                    )
+                    tokens[name] = last_seq or since[name]
+                counts["attempts"], _ = cls._write(
+                    "attempts", cls._submitted(start, cutoff), partial
+                )
+                manifest = {
+                    "id": snapshot_id,
+                    "base": previous["id"] if previous else None,
+                    "date": now.isoformat(),
+                    "since": since,
+                    "tokens": tokens,
+                    "counts": counts,
+                    "files": sorted(
+                        str(path.relative_to(partial)) for path in partial.rglob("*.parquet")
+                    ),
+                    "seconds": round(time.perf_counter() - started, 3),
+                }
+                (partial / "manifest.json").write_text(json.dumps(manifest, indent=2))
+            except BaseException:
+                shutil.rmtree(partial, ignore_errors=True)
+                raise
+            partial.rename(DATA_SNAPSHOTS / snapshot_id)
+            return manifest
+
+    @classmethod
+    def chain(cls, snapshot_id: str) -> list[dict]:
+        """Get the manifests needed to restore snapshot {snapshot_id}, newest first:
+        itself and those it follows, back to a full one.
+        """
+        manifests = [cls.get(snapshot_id)]
+        while manifests[-1]["base"] is not None:
+            manifests.append(cls.get(manifests[-1]["base"]))
+        return manifests
+
+    @staticmethod
+    def _read(name: str, snapshot_id: str) -> Iterator[list[dict]]:
+        import pyarrow.dataset as ds  # noqa: PLC0415
+
+        folder = DATA_SNAPSHOTS / snapshot_id / name
+        if not folder.exists():
+            return
+        schema = _schemas()[name]
+        dataset = ds.dataset(
+            folder, schema=schema, format="parquet", partitioning=_partitioning(name, schema)
+        )
+        for batch in dataset.to_batches(batch_size=BATCH_SIZE):
+            yield batch.to_pylist()
+
+    @classmethod
+    def restore(cls, snapshot_id: str, replace: bool = False) -> dict:  # noqa: FBT001, FBT002
+        """Load snapshot {snapshot_id} into Mongo, get the number of documents
+        restored per collection.
+
+        The collections must be empty unless {replace}, which empties them
+        first. Snapshots of the chain are read newest first and only the first
+        version of each document is kept, so every document is inserted once,
+        with insert_many, instead of going through the ETL. The statistics of
+        questions and quizzes are then recomputed from the restored attempts,
+        exactly as long as no attempt is submitted during the restore.
+        """
+        manifests = cls.chain(snapshot_id)
+        collections = {name: ServiceMongo.get_collection(name) for name in COLLECTIONS}
+        if not replace and any(c.find_one({}, {"_id": 1}) for c in collections.values()):
+            raise SnapshotError("Collections non vides, relancer avec replace", 409)
+        for collection in collections.values():
+            collection.delete_many({})
+
+        counts = {}
+        for name, collection in collections.items():
+            seen: set[str] = set()
+            counts[name] = 0
+            for manifest in manifests:
+                for rows in cls._read(name, manifest["id"]):
+                    docs = []
+                    for row in rows:
+                        if row["id"] in seen:
+                            continue
+                        seen.add(row["id"])
+                        docs.append(_to_doc(row))
+                    if docs:
+                        collection.insert_many(docs, ordered=False)
+                        counts[name] += len(docs)
+
+        # new writes go on numbering after the restored documents
+        counters = ServiceMongo.get_collection("counters")
+        for name in ("questions", "quizs"):
+            counters.update_one(
+                {"_id": name}, {"$max": {"seq": manifests[0]["tokens"][name]}}, upsert=True
+            )
+        ServiceChanges.ensure_indexes()
+        ServiceCache.bump("questions")
+        ServiceCache.bump("quizs")
+        ServiceStats.rebuild(ServiceAttempt.answer_key)
+        return counts
+
+
+# -------------- main ------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export")
+    export_parser.add_argument("--full", action="store_true")
+    restore_parser = commands.add_parser("restore")
+    restore_parser.add_argument("snapshot")
+    restore_parser.add_argument("--replace", action="store_true", help="empty the collections first")
+    args = parser.parse_args()
+
+    ServiceMongo.connect()
+    if args.command == "export":
+        manifest = ServiceSnapshot.export(full=args.full)
+        print(f"snapshot {manifest['id']}: {manifest['counts']} in {manifest['seconds']} s")
+    else:
+        started = time.perf_counter()
+        counts = ServiceSnapshot.restore(args.snapshot, replace=args.replace)
+        print(f"restored {counts} in {time.perf_counter() - started:.3f} s")
+    ServiceMongo.disconnect()
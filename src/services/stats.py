@@ -0,0 +1,256 @@
+"""Service for the statistics of questions and quizzes, kept up to date with the attempts.
+
+Usage (from src/), to rebuild them from every attempt:
+    python -m services.stats            rewrite the statistics
+    python -m services.stats --check    only report the differences
+"""
+
+import argparse
+import math
+from collections import Counter, defaultdict
+from collections.abc import Iterable, Mapping
+from typing import TYPE_CHECKING, Any
+
+from pymongo import UpdateOne
+
+from services.mongo import ServiceMongo
+
+if TYPE_CHECKING:
+    from pymongo.collection import Collection
+
+QUESTIONS = "question_stats"
+QUIZS = "quiz_stats"
+REBUILD_BATCH = 10_000
+
+
+def _bits(mask: int) -> Iterable[int]:
+    i = 0
+    while mask:
+        if mask & 1:
+            yield i
+        mask >>= 1
+        i += 1
+
+
+def _nest(flat: Mapping[str, Any]) -> dict:
+    """Turn dotted keys ("histogram.3") into nested documents, as $inc does."""
+    nested: dict = {}
+    for path, value in flat.items():
+        *parents, leaf = path.split(".")
+        node = nested
+        for parent in parents:
+            node = node.setdefault(parent, {})
+        node[leaf] = value
+    return nested
+
+
+class ServiceStats:
+    """Static class for handling statistics.
+
+    Statistics are sums, updated with $inc as attempts are stored, from
+    which the figures are derived when read. Per question: attempts, correct
+    answers, wrong responses chosen, and the sums giving the point-biserial
+    correlation between success on the question and the score ratio of the
+    attempt (discrimination). Per quiz: attempts, sum and sum of squares of
+    the scores, and the score histogram.
+    """
+
+    @staticmethod
+    def get_collection(name: str) -> "Collection":
+        """Get collection {name} of the statistics."""
+        return ServiceMongo.get_collection(name)
+
+    @staticmethod
+    def increments(attempts: Iterable[dict], keys: Mapping[str, Any]) -> tuple[dict, dict]:
+        """Get the increments of question and quiz statistics for {attempts}.
+
+        {keys} maps each quiz id to its AnswerKey (see ServiceAttempt.answer_key).
+        """
+        questions: dict[str, Counter] = defaultdict(Counter)
+        quizs: dict[str, Counter] = defaultdict(Counter)
+        for attempt in attempts:
+            quiz_id = str(attempt["quiz_id"])
+            key = keys[quiz_id]
+            score, total = attempt["score"], attempt["total"]
+            ratio = score / total if total else 0.0
+            quiz = quizs[quiz_id]
+            quiz["attempts"] += 1
+            quiz["score_sum"] += score
+            quiz["score_sq_sum"] += score * score
+            quiz[f"histogram.{score}"] += 1
+            for question_id, mask, expected, correct in zip(
+                key.questions, attempt["answers"], key.masks, attempt["correct"], strict=True
+            ):
+                question = questions[question_id]
+                question["attempts"] += 1
+                question["ratio_sum"] += ratio
+                question["ratio_sq_sum"] += ratio * ratio
+                if correct:
+                    question["correct"] += 1
+                    question["ratio_correct_sum"] += ratio
+                else:
+                    for i in _bits(mask & ~expected):
+                        question[f"wrong_choices.{i}"] += 1
+        return questions, quizs
+
+    @classmethod
+    def record(cls, attempts: list[dict], keys: Mapping[str, Any]) -> None:
+        """Add {attempts} to the statistics, one $inc per question and quiz."""
+        questions, quizs = cls.increments(attempts, keys)
+        for name, increments in ((QUESTIONS, questions), (QUIZS, quizs)):
+            if increments:
+                cls.get_collection(name).bulk_write(
+                    [
+                        UpdateOne({"_id": k}, {"$inc": dict(v)}, upsert=True)
+                        for k, v in increments.items()
+                    ],
+                    ordered=False,
+                )
+
+    @staticmethod
+    def question_figures(doc: dict) -> dict:
+        """Derive the figures of a question from its sums."""
+        n = doc.get("attempts", 0)
+        correct = doc.get("correct", 0)
+        wrong = {int(i): count for i, count in doc.get("wrong_choices", {}).items()}
+        most_wrong = max(wrong, key=wrong.get) if wrong else None
+        s = doc.get("ratio_sum", 0.0)
+        s2 = doc.get("ratio_sq_sum", 0.0)
+        xs = doc.get("ratio_correct_sum", 0.0)
+        denominator = (n * correct - correct * correct) * (n * s2 - s * s)
+        return {
+            "id": str(doc["_id"]),
+            "attempts": n,
+            "correct": correct,
+            "percent_correct": round(100 * correct / n, 2) if n else None,
+            "discrimination": round((n * xs - correct * s) / math.sqrt(denominator), 4)
+            if denominator > 0
+            else None,
+            "wrong_choices": dict(sorted(wrong.items())),
+            "most_chosen_wrong": most_wrong,
+        }
+
+    @staticmethod
+    def quiz_figures(doc: dict, total: int) -> dict:
+        """Derive the score distribution of a quiz of {total} questions from its sums."""
+        n = doc.get("attempts", 0)
+        mean = doc.get("score_sum", 0) / n if n else None
+        variance = doc.get("score_sq_sum", 0) / n - mean * mean if n else None
+        histogram = doc.get("histogram", {})
+        return {
+            "attempts": n,
+            "total": total,
+            "mean": round(mean, 3) if mean is not None else None,
+            "stddev": round(math.sqrt(max(variance, 0.0)), 3) if variance is not None else None,
+            "histogram": [histogram.get(str(score), 0) for score in range(total + 1)],
+        }
+
+    @classmethod
+    def question(cls, question_id: str) -> dict | None:
+        """Get the statistics of question {question_id}."""
+        doc = ServiceMongo.get_list_collection(QUESTIONS).find_one({"_id": question_id})
+        return cls.question_figures(doc) if doc is not None else None
+
+    @classmethod
+    def quiz(cls, quiz_id: str, question_ids: list[str]) -> dict:
+        """Get the statistics of quiz {quiz_id} and of its questions {question_ids}."""
+        doc = ServiceMongo.get_list_collection(QUIZS).find_one({"_id": quiz_id}) or {}
+        found = {
+            q["_id"]: q
+            for q in ServiceMongo.get_list_collection(QUESTIONS).find(
+                {"_id": {"$in": question_ids}}
+            )
+        }
+        return {
+            **cls.quiz_figures(doc, len(question_ids)),
+            "questions": [
+                cls.question_figures(found.get(question_id, {"_id": question_id}))
+                for question_id in question_ids
+            ],
+        }
+
+    @classmethod
+    def rebuild(cls, keys_for, check: bool = False) -> dict:  # noqa: FBT001, FBT002
+        """Recompute the statistics from every attempt, return the number of differences.
+
+        {keys_for}(quiz_id) gives the AnswerKey of a quiz, attempts of quizzes
+        it refuses (e.g. deleted) are left out. With {check}, the stored
+        statistics are only compared, not rewritten.
+
+        The statistics are written to a temporary collection renamed over the
+        stored one, so readers never see them half-written. They are only
+        exact when no attempts are written meanwhile: those counted by
+        record() after the attempts were read are lost.
+        """
+        questions: dict[str, Counter] = defaultdict(Counter)
+        quizs: dict[str, Counter] = defaultdict(Counter)
+        keys: dict[str, Any] = {}
+        batch: list[dict] = []
+
+        def flush() -> None:
+            for quiz_id in {str(a["quiz_id"]) for a in batch} - keys.keys():
+                try:
+                    keys[quiz_id] = keys_for(quiz_id)
+                except ValueError:
+                    keys[quiz_id] = None
+            batch_questions, batch_quizs = cls.increments(
+                (a for a in batch if keys[str(a["quiz_id"])] is not None), keys
+            )
+            for target, increments in ((questions, batch_questions), (quizs, batch_quizs)):
+                for k, v in increments.items():
+                    target[k].update(v)
+            batch.clear()
+
+        cursor = ServiceMongo.get_collection("attempts").find(
+            {}, {"quiz_id": 1, "answers": 1, "correct": 1, "score": 1, "total": 1}
+        )
+        for attempt in cursor.batch_size(REBUILD_BATCH):
+            batch.append(attempt)
+            if len(batch) >= REBUILD_BATCH:
+                flush()
+        flush()
+
+        result = {}
+        for name, computed in ((QUESTIONS, questions), (QUIZS, quizs)):
+            docs = {k: {"_id": k, **_nest(v)} for k, v in computed.items()}
+            col = cls.get_collection(name)
+            result[name] = cls._diff(docs, {d["_id"]: d for d in col.find()})
+            if check:
+                continue
+            if docs:
+                rebuilt = cls.get_collection(f"{name}_rebuild")
+                rebuilt.drop()
+                rebuilt.insert_many(list(docs.values()))
+                rebuilt.rename(name, dropTarget=True)
+            else:
+                col.drop()
+        return result
+
+    @staticmethod
+    def _diff(expected: dict[str, dict], stored: dict[str, dict]) -> int:
+        """Count the documents of {expected} and {stored} that differ."""
+
+        def same(a: Any, b: Any) -> bool:  # noqa: ANN401
+            if isinstance(a, dict) and isinstance(b, dict):
+                return a.keys() == b.keys() and all(same(a[k], b[k]) for k in a)
+            if isinstance(a, (int, float)) and isinstance(b, (int, float)):
+                return math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-9)
+            return a == b
+
+        return sum(
+            not same(expected.get(k), stored.get(k)) for k in expected.keys() | stored.keys()
+        )
+
+
+# -------------- main ------------------
+if __name__ == "__main__":
+    from services.attempt import ServiceAttempt
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--check", action="store_true", help="only report the differences")
+    args = parser.parse_args()
+    ServiceMongo.connect()
+    differences = ServiceStats.rebuild(ServiceAttempt.answer_key, check=args.check)
+    for name, count in differences.items():
+        print(f"{name}: {count} document(s) {'differ' if args.check else 'corrected'}")
+    ServiceMongo.disconnect()
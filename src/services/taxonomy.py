@@ -0,0 +1,179 @@
+"""Service for handling the canonical subjects and uses of questions."""
+
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING
+
+from rapidfuzz import fuzz, process
+
+from services.mongo import ServiceMongo
+
+if TYPE_CHECKING:
+    from pymongo.collection import Collection
+
+CANONICALS = "taxonomy"
+ALIASES = "taxonomy_aliases"
+FIELDS = ("subject", "use")
+
+
+class ServiceTaxonomy:
+    """Static class for handling the taxonomy.
+
+    Each field (subject, use) has a list of canonical values and an alias map
+    (variant -> canonical), learned from fuzzy corrections or set by admins.
+    Both are kept in an in-memory dict, so a known variant resolves in O(1)
+    and fuzzy matching only runs on new strings, against the canonical values
+    loaded before the import. Values new to the taxonomy are settled together
+    once every row of the import was read, which keeps corrections
+    independent of the order of the rows.
+    """
+
+    canonicals: dict[str, list[str]] = {}
+    variants: dict[str, dict[str, str]] = {}
+
+    @staticmethod
+    def get_collection(name: str) -> "Collection":
+        """Get collection {name} of the taxonomy."""
+        return ServiceMongo.get_collection(name)
+
+    @staticmethod
+    def _id(field: str, value: str) -> str:
+        return f"{field}:{value}"
+
+    @classmethod
+    def load(cls) -> None:
+        """Load the taxonomy into memory, seeded from the questions the first time."""
+        col = cls.get_collection(CANONICALS)
+        if col.estimated_document_count() == 0:
+            cls.seed()
+        cls.canonicals = {field: [] for field in FIELDS}
+        cls.variants = {field: {} for field in FIELDS}
+        for doc in col.find({}, {"field": 1, "name": 1}).sort("name", 1):
+            cls.canonicals[doc["field"]].append(doc["name"])
+            cls.variants[doc["field"]][doc["name"]] = doc["name"]
+        for doc in cls.get_collection(ALIASES).find({}, {"field": 1, "alias": 1, "canonical": 1}):
+            cls.variants[doc["field"]][doc["alias"]] = doc["canonical"]
+
+    @classmethod
+    def seed(cls) -> None:
+        """Register the values already used by questions as canonical values."""
+        questions = ServiceMongo.get_collection("questions")
+        for field in FIELDS:
+            for value in questions.distinct(field):
+                if isinstance(value, str) and value.strip():
+                    cls.add_canonical(field, value)
+
+    @classmethod
+    def resolve(cls, field: str, value: str, threshold: int) -> tuple[str, str]:
+        """Get the canonical value of {value} and how it was found.
+
+        How is "known" (canonical or alias), "fuzzy" (alias learned now, for a
+        canonical value closer than {threshold}) or "new" (no close canonical
+        value, {value} is kept as it is). Only the canonical values loaded
+        before the import are matched: new values are settled together, see
+        settle(). Nothing is persisted here, see save().
+        """
+        if not cls.variants:
+            cls.load()
+        if not value:
+            return value, "known"
+        known = cls.variants[field].get(value)
+        if known is not None:
+            return known, "known"
+        match = process.extractOne(value, cls.canonicals[field], scorer=fuzz.ratio)
+        if match is not None and match[1] > threshold:
+            cls.variants[field][value] = match[0]
+            return match[0], "fuzzy"
+        return value, "new"
+
+    @staticmethod
+    def settle(
+        pending: dict[tuple[str, str], int], threshold: int
+    ) -> list[tuple[str, str, str, str]]:
+        """Decide what the {pending} new values of an import become, counted by
+        (field, value): most frequent first, each one is an alias of a new value
+        already settled closer than {threshold}, or a new canonical value.
+        Returns them as learned (field, value, canonical, how), see save().
+        """
+        learned = []
+        settled: dict[str, list[str]] = {field: [] for field in FIELDS}
+        # ties broken by value, so the outcome does not depend on the rows order
+        for (field, value), _ in sorted(pending.items(), key=lambda item: (-item[1], item[0])):
+            match = process.extractOne(value, settled[field], scorer=fuzz.ratio)
+            if match is not None and match[1] > threshold:
+                learned.append((field, value, match[0], "fuzzy"))
+            else:
+                settled[field].append(value)
+                learned.append((field, value, value, "new"))
+        return learned
+
+    @classmethod
+    def add_canonical(cls, field: str, name: str) -> None:
+        """Register {name} as a canonical value of {field}."""
+        cls.get_collection(CANONICALS).update_one(
+            {"_id": cls._id(field, name)},
+            {
+                "$setOnInsert": {
+                    "field": field,
+                    "name": name,
+                    "date_creation": datetime.now(tz=timezone.utc),
+                }
+            },
+            upsert=True,
+        )
+        if cls.variants:
+            if name not in cls.variants[field]:
+                cls.canonicals[field].append(name)
+            cls.variants[field][name] = name
+
+    @classmethod
+    def set_alias(cls, field: str, alias: str, canonical: str, source: str) -> None:
+        """Map {alias} to {canonical}, {source} is "fuzzy" or "admin"."""
+        cls.get_collection(ALIASES).update_one(
+            {"_id": cls._id(field, alias)},
+            {
+                "$set": {"field": field, "alias": alias, "canonical": canonical, "source": source},
+                "$setOnInsert": {"date_creation": datetime.now(tz=timezone.utc)},
+            },
+            upsert=True,
+        )
+        if cls.variants:
+            cls.variants[field][alias] = canonical
+
+    @classmethod
+    def delete_alias(cls, field: str, alias: str) -> bool:
+        """Remove {alias}, return False if it does not exist."""
+        result = cls.get_collection(ALIASES).delete_one({"_id": cls._id(field, alias)})
+        if cls.variants:
+            cls.variants[field].pop(alias, None)
+        return result.deleted_count == 1
+
+    @classmethod
+    def save(cls, learned: list[tuple[str, str, str, str]]) -> None:
+        """Persist the {learned} (field, value, canonical, how) of an import."""
+        for field, value, canonical, how in learned:
+            if how == "new":
+                cls.add_canonical(field, value)
+            elif how == "fuzzy":
+                cls.set_alias(field, value, canonical, "fuzzy")
+
+    @classmethod
+    def list_field(cls, field: str) -> list[dict]:
+        """Get the canonical values of {field} with their aliases."""
+        aliases: dict[str, list[dict]] = {}
+        for doc in ServiceMongo.get_list_collection(ALIASES).find({"field": field}).sort("alias", 1):
+            aliases.setdefault(doc["canonical"], []).append(
+                {"alias": doc["alias"], "source": doc.get("source", "admin")}
+            )
+        return [
+            {"name": doc["name"], "aliases": aliases.get(doc["name"], [])}
+            for doc in ServiceMongo.get_list_collection(CANONICALS)
+            .find({"field": field})
+            .sort("name", 1)
+        ]
+
+    @classmethod
+    def exists(cls, field: str, name: str) -> bool:
+        """Tell whether {name} is a canonical value of {field}."""
+        return cls.get_collection(CANONICALS).count_documents(
+            {"_id": cls._id(field, name)}, limit=1
+        ) == 1
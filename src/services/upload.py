@@ -0,0 +1,173 @@
+"""Service for receiving file uploads as a stream."""
+
+import hashlib
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+SNIFF_BYTES = 64 * 1024  # bytes of the file read before checking its header
+MULTIPART_OVERHEAD = 16 * 1024  # boundaries and part headers around the file
+
+
+class UploadError(ValueError):
+    """Upload refused, {status_code} is the HTTP status to answer with."""
+
+    def __init__(self, message: str, status_code: int = 400) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+
+
+@dataclass
+class StoredUpload:
+    """File stored by receive_upload."""
+
+    filename: str
+    content_type: str
+    path: Path
+    size: int
+    sha256: str
+
+
+class _FilePart:
+    """State of the file part while the body is parsed."""
+
+    def __init__(self) -> None:
+        self.headers: dict[bytes, bytes] = {}
+        self.header_name = b""
+        self.header_value = b""
+        self.filename: str | None = None
+        self.content_type = ""
+        self.pending: list[bytes] = []
+        self.done = False
+
+
+async def receive_upload(  # noqa: C901, PLR0913
+    request: Request,
+    field: str,
+    dest_dir: Path,
+    name_fn: Callable[[str], str],
+    max_bytes: int,
+    check: Callable[[str, str, bytes], str | None],
+) -> StoredUpload:
+    """Stream file {field} of a multipart {request} to {dest_dir}, return what was stored.
+
+    The file is written chunk by chunk as it arrives and hashed on the way, so
+    memory does not depend on its size. It is named by {name_fn}(filename).
+    The upload is refused early when Content-Length already exceeds
+    {max_bytes}, as soon as the file goes over {max_bytes}, or when
+    {check}(filename, content type, first bytes) returns a reason, before
+    the rest of the body is read. Other form fields are ignored.
+    """
+    content_length = int(request.headers.get("content-length") or 0)
+    if content_length > max_bytes + MULTIPART_OVERHEAD:
+        raise UploadError(_too_large(max_bytes), 413)
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise UploadError("Formulaire multipart attendu")
+
+    part = _FilePart()
+    target: _FilePart | None = None  # the file part, once its headers are read
+
+    def on_part_begin() -> None:
+        nonlocal part
+        part = _FilePart()
+
+    def on_header_field(data: bytes, start: int, end: int) -> None:
+        part.header_name += data[start:end]
+
+    def on_header_value(data: bytes, start: int, end: int) -> None:
+        part.header_value += data[start:end]
+
+    def on_header_end() -> None:
+        part.headers[part.header_name.lower()] = part.header_value
+        part.header_name = part.header_value = b""
+
+    def on_headers_finished() -> None:
+        nonlocal target
+        _, options = parse_options_header(part.headers.get(b"content-disposition", b""))
+        if options.get(b"name", b"").decode() == field and b"filename" in options and target is None:
+            part.filename = options[b"filename"].decode("utf-8", "replace")
+            part.content_type = part.headers.get(b"content-type", b"").decode("latin-1")
+            target = part
+
+    def on_part_data(data: bytes, start: int, end: int) -> None:
+        if part is target:
+            part.pending.append(data[start:end])
+
+    def on_part_end() -> None:
+        if part is target:
+            part.done = True
+
+    parser = MultipartParser(
+        params[b"boundary"],
+        {
+            "on_part_begin": on_part_begin,
+            "on_header_field": on_header_field,
+            "on_header_value": on_header_value,
+            "on_header_end": on_header_end,
+            "on_headers_finished": on_headers_finished,
+            "on_part_data": on_part_data,
+            "on_part_end": on_part_end,
+        },
+    )
+
+    digest = hashlib.sha256()
+    head = b""
+    size = 0
+    out = None
+    path: Path | None = None
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            if target is None:
+                continue
+            data = b"".join(target.pending)
+            target.pending.clear()
+            size += len(data)
+            if size > max_bytes:
+                raise UploadError(_too_large(max_bytes), 413)
+            if out is None:
+                # hold the first bytes until the header can be checked
+                head += data
+                if len(head) < SNIFF_BYTES and b"\n" not in head and not target.done:
+                    continue
+                reason = check(target.filename, target.content_type, head)
+                if reason:
+                    raise UploadError(reason)
+                dest_dir.mkdir(parents=True, exist_ok=True)
+                path = dest_dir / name_fn(target.filename)
+                out = await run_in_threadpool(path.open, "wb")
+                data, head = head, b""
+            digest.update(data)
+            await run_in_threadpool(out.write, data)
+            if target.done:
+                break
+        parser.finalize()
+        if target is None or not target.done:
+            raise UploadError(f"Fichier '{field}' manquant")
+        if out is None:
+            reason = check(target.filename, target.content_type, head)
+            if reason:
+                raise UploadError(reason)
+            raise UploadError("Fichier vide")
+    except BaseException:
+        if out is not None:
+            out.close()
+            path.unlink(missing_ok=True)
+        raise
+    out.close()
+    return StoredUpload(
+        filename=target.filename,
+        content_type=target.content_type,
+        path=path,
+        size=size,
+        sha256=digest.hexdigest(),
+    )
+
+
+def _too_large(max_bytes: int) -> str:
+    return f"Fichier trop volumineux (maximum {max_bytes // 2**20} Mo)"
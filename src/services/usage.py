@@ -0,0 +1,150 @@
+"""Service for the usage of questions by quizzes, and the sampling that rotates them.
+
+Usage (from src/), to rebuild the usage of questions from every quiz:
+    python -m services.usage
+"""
+
+import heapq
+import math
+import random
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ASCENDING, UpdateOne
+
+from models.question import QuestionModel
+from services.mongo import ServiceMongo
+from services.util import ServiceUtil
+
+if TYPE_CHECKING:
+    from pymongo.collection import Collection
+
+POOL_FACTOR = 4  # candidates read per question drawn
+POOL_MIN = 50
+MIN_WEIGHT = 1e-6  # questions just used can still be drawn when nothing else is left
+
+
+def _object_ids(question_ids: list[str]) -> list[ObjectId]:
+    oids = []
+    for question_id in question_ids:
+        try:
+            oids.append(ObjectId(question_id))
+        except (InvalidId, TypeError):
+            continue
+    return oids
+
+
+class ServiceUsage:
+    """Static class for handling the usage of questions.
+
+    Each question keeps usage_count, the number of quizzes it was drawn in,
+    and last_used, the date of the last one; both are updated when a quiz is
+    created. Usage sampling only reads the least used candidates, through the
+    (use, subject, usage_count, last_used) index, and draws among them with
+    weights favouring questions rarely and not recently used.
+    """
+
+    indexed = False
+
+    @staticmethod
+    def get_collection() -> "Collection":
+        """Get the collection of questions."""
+        return ServiceMongo.get_collection("questions")
+
+    @classmethod
+    def ensure_indexes(cls) -> None:
+        """Create the index read by usage sampling."""
+        cls.get_collection().create_index(
+            [
+                ("use", ASCENDING),
+                ("subject", ASCENDING),
+                ("usage_count", ASCENDING),
+                ("last_used", ASCENDING),
+            ]
+        )
+        cls.indexed = True
+
+    @classmethod
+    def record(cls, question_ids: list[str], when: datetime) -> None:
+        """Count one more use of questions {question_ids}, by a quiz created {when}."""
+        oids = _object_ids(question_ids)
+        if oids:
+            cls.get_collection().update_many(
+                {"_id": {"$in": oids}},
+                {"$inc": {"usage_count": 1}, "$set": {"last_used": when}},
+            )
+
+    @staticmethod
+    def weight(doc: dict, now: datetime, half_life: float) -> float:
+        """Get the weight of question {doc}: halved by each use, and brought
+        close to 0 by a recent one, back to half after {half_life} seconds.
+        """
+        last_used = doc.get("last_used")
+        recency = 1.0
+        if last_used is not None:
+            age = (now - last_used.replace(tzinfo=None)).total_seconds()
+            recency = 1 - 0.5 ** (max(age, 0.0) / half_life)
+        return max(recency, MIN_WEIGHT) / (1 + doc.get("usage_count", 0))
+
+    @classmethod
+    def sample(
+        cls, subjects: list[str], use: str, k: int, rng: random.Random | None = None
+    ) -> list[QuestionModel]:
+        """Draw {k} questions of {subjects} and {use}, rarely used ones first."""
+        if not cls.indexed:
+            cls.ensure_indexes()
+        rng = rng or random.Random()  # noqa: S311
+        half_life = float(ServiceUtil.get_env("QUIZ_USAGE_HALF_LIFE_DAYS", "14")) * 86400
+        now = datetime.now(tz=timezone.utc).replace(tzinfo=None)
+        pool = (
+            cls.get_collection()
+            .find({"use": use, "subject": {"$in": subjects}})
+            .sort([("usage_count", ASCENDING), ("last_used", ASCENDING)])
+            .limit(max(k * POOL_FACTOR, POOL_MIN))
+        )
+        # weighted sampling without replacement (Efraimidis-Spirakis, keys u^(1/w) as logs)
+        drawn = heapq.nlargest(
+            k,
+            pool,
+            key=lambda doc: math.log(1.0 - rng.random()) / cls.weight(doc, now, half_life),
+        )
+        return [QuestionModel.model_validate(doc) for doc in drawn]
+
+    @classmethod
+    def rebuild(cls) -> int:
+        """Recompute the usage of every question from the quizzes, get the number used."""
+        usage = ServiceMongo.get_collection("quizs").aggregate(
+            [
+                {"$unwind": "$questions"},
+                {
+                    "$group": {
+                        "_id": "$questions.id",
+                        "count": {"$sum": 1},
+                        "last": {"$max": "$date_creation"},
+                    }
+                },
+            ]
+        )
+        updates = [
+            UpdateOne(
+                {"_id": oid},
+                {"$set": {"usage_count": doc["count"], "last_used": doc["last"]}},
+            )
+            for doc in usage
+            for oid in _object_ids([doc["_id"]])
+        ]
+        questions = cls.get_collection()
+        questions.update_many({}, {"$unset": {"usage_count": "", "last_used": ""}})
+        if updates:
+            questions.bulk_write(updates, ordered=False)
+        cls.ensure_indexes()
+        return len(updates)
+
+
+# -------------- main ------------------
+if __name__ == "__main__":
+    ServiceMongo.connect()
+    print(f"{ServiceUsage.rebuild()} question(s) used by quizzes")
+    ServiceMongo.disconnect()
@@ -7,7 +7,7 @@ from typing import Annotated, Any
 
 from dotenv import load_dotenv
 from fastapi import Request
-from fastapi.responses import ORJSONResponse
+from fastapi.responses import ORJSONResponse, Response
 from pydantic import BeforeValidator
 
 from services.log import ServiceLog
@@ -57,4 +57,20 @@ def handle_request_success(
     )
 
 
+def handle_request_bytes(
+    request: Request,
+    content: bytes,
+    status_code: int = 200,
+    headers: dict[str, str] | None = None,
+) -> Response:
+    """Standardize successful responses already serialized to JSON, with logging."""
+    ServiceLog.send_info(f"{request.url.path} -> {status_code}")
+    return Response(
+        content=content,
+        status_code=status_code,
+        headers=headers,
+        media_type="application/json",
+    )
+
+
 ObjectIdValidator = Annotated[str, BeforeValidator(ensure_str)]
@@ -0,0 +1,101 @@
+"""Service for per-student quiz variants, derived from seeds."""
+
+import hashlib
+import random
+from typing import NamedTuple
+
+import orjson
+
+from services.util import ServiceUtil
+
+
+class Variant(NamedTuple):
+    """Variant of a quiz: {order}[j] is the base index of the question shown
+    at position j, {responses}[j][i] the base index of its response shown at i.
+    """
+
+    seed: int
+    order: tuple[int, ...]
+    responses: tuple[tuple[int, ...], ...]
+
+
+class VariantError(ValueError):
+    """Answers that do not fit the variant they were given for."""
+
+
+class ServiceVariant:
+    """Static class for handling variants.
+
+    A variant is (quiz, seed): the seed of a student is derived from the quiz
+    id and the username, keyed with QUIZ_VARIANT_SECRET, and the permutations
+    from the seed and the number of responses of each question. Nothing is
+    stored but the seed of each attempt, papers and grading recompute them.
+    """
+
+    secret: bytes | None = None
+
+    @classmethod
+    def start(cls) -> None:
+        """Load QUIZ_VARIANT_SECRET, refuse to start without it: unkeyed seeds
+        could be computed by students from the quiz id and their username.
+        """
+        secret = ServiceUtil.get_env("QUIZ_VARIANT_SECRET")
+        if not secret:
+            raise RuntimeError("QUIZ_VARIANT_SECRET must be set")
+        cls.secret = secret.encode()
+
+    @classmethod
+    def seed(cls, quiz_id: str, student: str) -> int:
+        """Get the seed of the variant of quiz {quiz_id} given to {student}."""
+        if cls.secret is None:
+            cls.start()
+        digest = hashlib.blake2b(
+            f"{quiz_id}:{student}".encode(), key=cls.secret, digest_size=8
+        ).digest()
+        # 63 bits, stored as a BSON int64
+        return int.from_bytes(digest, "big") >> 1
+
+    @staticmethod
+    def permute(seed: int, counts: tuple[int, ...]) -> Variant:
+        """Get the variant of {seed} for questions of {counts} responses."""
+        rng = random.Random(seed)  # noqa: S311
+        order = list(range(len(counts)))
+        rng.shuffle(order)
+        responses = []
+        for question in order:
+            shown = list(range(counts[question]))
+            rng.shuffle(shown)
+            responses.append(tuple(shown))
+        return Variant(seed=seed, order=tuple(order), responses=tuple(responses))
+
+    @staticmethod
+    def paper(document: dict, variant: Variant) -> bytes:
+        """Get the student paper {document} of a quiz, as shown in {variant}."""
+        questions = document["questions"]
+        return orjson.dumps(
+            {
+                **document,
+                "questions": [
+                    {
+                        **questions[question],
+                        "responses": [questions[question]["responses"][i] for i in shown],
+                    }
+                    for question, shown in zip(variant.order, variant.responses, strict=True)
+                ],
+            }
+        )
+
+    @staticmethod
+    def to_base(variant: Variant, answers: list[list[int]]) -> list[list[int]]:
+        """Get {answers} given in {variant} in the order of the base quiz."""
+        if len(answers) != len(variant.order):
+            raise VariantError(f"{len(variant.order)} réponses attendues, {len(answers)} reçues")
+        base: list[list[int]] = [[] for _ in answers]
+        for n, (question, shown, chosen) in enumerate(
+            zip(variant.order, variant.responses, answers, strict=True), start=1
+        ):
+            for i in chosen:
+                if not 0 <= i < len(shown):
+                    raise VariantError(f"Réponse {i} invalide pour la question {n}")
+                base[question].append(shown[i])
+        return base